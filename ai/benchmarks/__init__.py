@@ -0,0 +1,4 @@
+"""
+Benchmarks for the AI service.
+Run from ai/, e.g. python -m benchmarks.sharded_search --help
+"""
@@ -0,0 +1,141 @@
+"""
+Search response serialization benchmark.
+Times the previous /search response path (a validated SearchResult per hit,
+FastAPI re-validating the list against response_model and JSONResponse
+encoding it with json.dumps) against the fast path (model_construct results,
+cached testCase fragments rendered with orjson), for several result counts,
+and reports p50/p99 milliseconds per response as JSON.
+
+Usage (from ai/):
+    python -m benchmarks.search_serialization --results 10,100,1000
+"""
+
+import argparse
+import json
+import logging
+import platform
+import time
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Callable
+
+import numpy as np
+from pydantic import TypeAdapter
+
+from models import SearchResult
+from services import serialization
+from services.ai_service import AIService
+from services.serialization import RowFragmentCache, trusted_search_result, render_search_results
+
+RESPONSE_ADAPTER = TypeAdapter(List[SearchResult])
+
+
+def index_rows(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Rows shaped like the resident index holds them (embedding column dropped)"""
+    rng = np.random.default_rng(seed)
+    started = datetime(2026, 1, 1)
+    rows = []
+    for i in range(count):
+        steps = [{'step': f"Step {s} of case {i}", 'expectedResult': f"Result {s}"} for s in range(int(rng.integers(2, 7)))]
+        rows.append({
+            'id': f"tc_bench_{i:08d}",
+            'name': f"Benchmark test case {i}",
+            'description': "Verify the behaviour of the feature under benchmark " * 3,
+            'type': 'positive' if i % 2 else 'negative',
+            'priority': ['high', 'medium', 'low'][i % 3],
+            'steps': json.dumps(steps),
+            'expectedResult': "The feature behaves as specified",
+            'tags': json.dumps(['benchmark', f"group-{i % 10}"]),
+            'createdAt': started + timedelta(seconds=i),
+            'updatedAt': started + timedelta(seconds=i, milliseconds=500),
+        })
+    return rows
+
+
+def previous_response(scored: List[tuple]) -> bytes:
+    results = [SearchResult(similarity=similarity, testCase=AIService._format_test_case(row)) for similarity, row in scored]
+    # FastAPI validates the returned list against response_model, then JSONResponse.render()
+    content = RESPONSE_ADAPTER.dump_python(RESPONSE_ADAPTER.validate_python(results), mode='json')
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')).encode('utf-8')
+
+
+def fast_response(scored: List[tuple], cache: RowFragmentCache) -> bytes:
+    results = []
+    for similarity, row in scored:
+        payload, fragment = cache.get(row, AIService._format_test_case)
+        results.append(trusted_search_result(similarity, payload, fragment))
+    return render_search_results(results)
+
+
+def time_path(render: Callable[[], bytes], repeats: int) -> Dict[str, Any]:
+    render()
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        render()
+        latencies.append(time.perf_counter() - started)
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 4),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 4),
+    }
+
+
+def run_benchmark(result_counts: List[int], repeats: int = 200, seed: int = 0) -> Dict[str, Any]:
+    results = []
+    for count in result_counts:
+        rng = np.random.default_rng(seed)
+        scored = list(zip(np.sort(rng.random(count))[::-1].tolist(), index_rows(count, seed)))
+        # Both paths must produce the same response
+        assert json.loads(previous_response(scored)) == json.loads(fast_response(scored, RowFragmentCache(count)))
+
+        # Filled by the warm-up render of time_path
+        warm = RowFragmentCache(count)
+        paths = {
+            'previous': time_path(lambda: previous_response(scored), repeats),
+            'fast_cold': time_path(lambda: fast_response(scored, RowFragmentCache(count)), repeats),
+            'fast_warm': time_path(lambda: fast_response(scored, warm), repeats),
+        }
+        for name, timing in paths.items():
+            results.append({
+                'results': count,
+                'path': name,
+                **timing,
+                'speedup_p50': round(paths['previous']['p50_ms'] / timing['p50_ms'], 2) if timing['p50_ms'] else None,
+            })
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'encoder': 'orjson' if serialization.orjson is not None else 'json',
+        },
+        'config': {'repeats': repeats, 'seed': seed},
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--results', default='10,100,1000', help='Comma-separated result counts per response')
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run_benchmark(
+        result_counts=[int(count) for count in args.results.split(',')],
+        repeats=args.repeats,
+        seed=args.seed,
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Sharded scoring benchmark for the resident embedding index.
+Scores synthetic corpora (100k+ rows) with different shard counts and reports
+p50/p99 latency, QPS and speedup over a single shard as JSON, so the effect
+of INDEX_SHARDS can be checked against the cores of the target node.
+
+NumPy's BLAS may itself use several threads per matmul; compare runs with
+OPENBLAS_NUM_THREADS=1 (or OMP_NUM_THREADS=1) to see the shard pool alone.
+
+Usage (from ai/):
+    python -m benchmarks.sharded_search --rows 100000,500000 --shards 1,2,4,8
+    python -m benchmarks.sharded_search --rows 200000 --mmap   # score from a snapshot file
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from services.embedding_index import EmbeddingIndex
+from services.index_snapshot import IndexSnapshot, write_snapshot
+
+
+def synthetic_vectors(rows: int, dimension: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, rows // 500), dimension)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=rows)]
+    vectors += 0.5 * rng.normal(size=(rows, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def default_shard_counts() -> List[int]:
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def time_shards(vectors: np.ndarray, queries: np.ndarray, shards: int, k: int, warmup: int = 3) -> Dict[str, Any]:
+    index = EmbeddingIndex()
+    index.shard_count = shards
+    # Force the requested shard count even for the smaller corpora
+    index.min_shard_rows = 1
+
+    for query in queries[:warmup]:
+        index._top_k(vectors, query, k)
+
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        _, positions = index._top_k(vectors, query, k)
+        latencies.append(time.perf_counter() - started)
+        results.append(positions)
+    if index._executor is not None:
+        index._executor.shutdown()
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'shards': shards,
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+        'mean_ms': round(float(latencies_ms.mean()), 3),
+        'qps': round(len(queries) / float(np.sum(latencies)), 1),
+        '_results': results,
+    }
+
+
+def run_benchmark(rows_list: List[int], shard_counts: List[int], queries: int = 100, k: int = 100,
+                  dimension: int = 384, seed: int = 0, use_mmap: bool = False) -> Dict[str, Any]:
+    results = []
+    query_vectors = synthetic_vectors(queries, dimension, seed + 1)
+
+    for rows in rows_list:
+        vectors = synthetic_vectors(rows, dimension, seed)
+        workdir: Optional[tempfile.TemporaryDirectory] = None
+        if use_mmap:
+            workdir = tempfile.TemporaryDirectory()
+            ids = [f"tc_bench_{i:08d}" for i in range(rows)]
+            name = write_snapshot(workdir.name, 1, ids, vectors, [{'id': tc_id} for tc_id in ids], {
+                'model_name': 'benchmark', 'embedding_dimension': dimension, 'watermark': None, 'synced_at': time.time(),
+            })
+            vectors = IndexSnapshot(os.path.join(workdir.name, name)).vectors
+
+        baseline = None
+        for shards in shard_counts:
+            result = time_shards(vectors, query_vectors, shards, k)
+            found = result.pop('_results')
+            if baseline is None:
+                baseline = (result['p50_ms'], found)
+            # Sharded top-k must be exactly the single-shard top-k
+            matches = sum(np.array_equal(a, b) for a, b in zip(found, baseline[1]))
+            results.append({
+                'rows': rows,
+                **result,
+                'speedup_p50': round(baseline[0] / result['p50_ms'], 2) if result['p50_ms'] else None,
+                'identical_top_k': matches / len(found),
+            })
+
+        del vectors
+        if workdir is not None:
+            workdir.cleanup()
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'blas_threads': os.getenv('OPENBLAS_NUM_THREADS') or os.getenv('OMP_NUM_THREADS') or 'default',
+        },
+        'config': {'queries': queries, 'k': k, 'dimension': dimension, 'seed': seed, 'mmap': use_mmap},
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='100000,500000', help='Comma-separated corpus sizes')
+    parser.add_argument('--shards', default=','.join(map(str, default_shard_counts())),
+                        help='Comma-separated shard counts (default: powers of two up to the core count)')
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--k', type=int, default=100)
+    parser.add_argument('--dimension', type=int, default=int(os.getenv('EMBEDDING_DIMENSION', '384')))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mmap', action='store_true', help='Score from a memory-mapped snapshot file')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run_benchmark(
+        rows_list=[int(rows) for rows in args.rows.split(',')],
+        shard_counts=[int(shards) for shards in args.shards.split(',')],
+        queries=args.queries,
+        k=args.k,
+        dimension=args.dimension,
+        seed=args.seed,
+        use_mmap=args.mmap,
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
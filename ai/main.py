@@ -8,31 +8,73 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response, HTTPException
 import logging
+import time
 
 # Import separated modules AFTER environment is loaded
 from models import (
     EmbeddingRequest, EmbeddingResponse,
-    SearchRequest, SearchResult,
+    SearchRequest, SearchResult, PartitionSearchRequest,
     GenerateTestCaseRequest, GenerateTestCaseResponse,
     TokenEstimateRequest, TokenEstimateResponse,
-    StatisticsResponse, TokenInfoResponse
+    StatisticsResponse, TokenInfoResponse,
+    ProfileRequest, ProfileStatusResponse
 )
-from services import ai_service, gemini_service, db
+from services import ai_service, gemini_service, db, embedding_index
+from services.metrics import (
+    observe_request, render_metrics, start_request_trace, stop_request_trace, server_timing_header,
+    mark_process_dead
+)
+from services.profiling import request_profiler, debug_enabled
+from services.serialization import search_response
 
 # Setup logging with environment variable
 log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
 logging.basicConfig(level=getattr(logging, log_level))
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Keep the resident embedding index in sync while the app is running"""
+    embedding_index.start()
+    yield
+    embedding_index.stop()
+    mark_process_dead()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Test Case AI Service",
     description="AI service for test case embeddings and semantic search",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record per-endpoint request counts, errors and latency"""
+    started = time.perf_counter()
+    status_code = 500
+    # Opt-in per-request stage timings, returned as a Server-Timing header
+    trace = start_request_trace() if debug_enabled() and request.headers.get('x-debug-timing') else None
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        if trace is not None:
+            response.headers['Server-Timing'] = server_timing_header(trace, time.perf_counter() - started)
+        return response
+    finally:
+        if trace is not None:
+            stop_request_trace()
+        route = request.scope.get('route')
+        observe_request(
+            request.method,
+            route.path if route else 'unmatched',
+            status_code,
+            time.perf_counter() - started
+        )
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -46,21 +88,33 @@ async def generate_embedding(request: EmbeddingRequest):
     return ai_service.generate_embedding(request)
 
 # Search endpoints
+# Sync handler: FastAPI runs it in the threadpool, so identical concurrent
+# searches can be coalesced instead of blocking the event loop one by one
 @app.post("/search", response_model=list[SearchResult])
-async def semantic_search(request: SearchRequest):
+@request_profiler.profiled('search')
+def semantic_search(request: SearchRequest):
     """Perform semantic search on test cases"""
-    return ai_service.semantic_search(request)
+    return search_response(ai_service.semantic_search(request))
+
+# Fan-out target of scatter-gather search in partitioned deployments
+@app.post("/partition/search", response_model=list[SearchResult])
+@request_profiler.profiled('partition_search')
+def partition_search(request: PartitionSearchRequest):
+    """Search only the test cases in this replica's partition"""
+    return search_response(ai_service.search_partition(request))
 
 # AI Generation endpoints
 @app.post("/generate-test-case", response_model=GenerateTestCaseResponse)
+@request_profiler.profiled('generate_test_case')
 async def generate_test_case_with_ai(request: GenerateTestCaseRequest):
     """Generate a test case using Gemini AI with optional RAG"""
     return await gemini_service.generate_test_case(request)
 
 # Statistics endpoints
 @app.get("/stats", response_model=StatisticsResponse)
-async def get_statistics():
-    """Get AI service statistics"""
+def get_statistics():
+    """Get AI service statistics (a plain def: the database reads and clustering
+    refresh run in the threadpool, not on the event loop)"""
     return ai_service.get_statistics()
 
 # Token estimation endpoints
@@ -75,6 +129,36 @@ async def get_token_info():
     """Get information about token usage and pricing"""
     return gemini_service.get_token_info()
 
+# Metrics endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics in text exposition format"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+# Debug endpoints (REQUEST_DEBUG_ENABLED=true)
+def _require_debug():
+    if not debug_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/debug/profile", response_model=ProfileStatusResponse, include_in_schema=False)
+async def get_profiling():
+    """Profiling budget left and the most recent profile files"""
+    _require_debug()
+    return request_profiler.get_status()
+
+@app.post("/debug/profile", response_model=ProfileStatusResponse, include_in_schema=False)
+async def start_profiling(request: ProfileRequest):
+    """Profile the next N sampled /search and /generate-test-case requests"""
+    _require_debug()
+    return request_profiler.arm(request.requests, request.sample_rate)
+
+@app.delete("/debug/profile", response_model=ProfileStatusResponse, include_in_schema=False)
+async def stop_profiling():
+    """Stop profiling before the budget is spent"""
+    _require_debug()
+    return request_profiler.disarm()
+
 # Main execution
 if __name__ == "__main__":
     import uvicorn
@@ -8,7 +8,7 @@ from .models import (
     EmbeddingRequest, EmbeddingResponse,
 
     # Search models
-    SearchRequest, SearchResult, SearchResponse,
+    SearchRequest, SearchResult, SearchResponse, PartitionSearchRequest,
 
     # AI Generation models
     TestStep, RAGReference, TokenUsage,
@@ -18,10 +18,14 @@ from .models import (
     TokenEstimateRequest, TokenEstimateResponse,
 
     # Statistics models
-    StatisticsResponse,
+    ClusterTestCase, ClusterSummary, RerankerStatistics,
+    CoalescingStatistics, IndexStatistics, ScatterGatherStatistics, StatisticsResponse,
 
     # Token info models
-    TokenPricingInfo, TokenLimitsInfo, TokenInfoResponse
+    TokenPricingInfo, TokenLimitsInfo, TokenInfoResponse,
+
+    # Debug models
+    ProfileRequest, ProfileStatusResponse
 )
 
 __all__ = [
@@ -29,7 +33,7 @@ __all__ = [
     'EmbeddingRequest', 'EmbeddingResponse',
 
     # Search models
-    'SearchRequest', 'SearchResult', 'SearchResponse',
+    'SearchRequest', 'SearchResult', 'SearchResponse', 'PartitionSearchRequest',
 
     # AI Generation models
     'TestStep', 'RAGReference', 'TokenUsage',
@@ -39,8 +43,12 @@ __all__ = [
     'TokenEstimateRequest', 'TokenEstimateResponse',
 
     # Statistics models
-    'StatisticsResponse',
+    'ClusterTestCase', 'ClusterSummary', 'RerankerStatistics',
+    'CoalescingStatistics', 'IndexStatistics', 'ScatterGatherStatistics', 'StatisticsResponse',
 
     # Token info models
-    'TokenPricingInfo', 'TokenLimitsInfo', 'TokenInfoResponse'
+    'TokenPricingInfo', 'TokenLimitsInfo', 'TokenInfoResponse',
+
+    # Debug models
+    'ProfileRequest', 'ProfileStatusResponse'
 ]
\ No newline at end of file
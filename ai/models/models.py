@@ -3,8 +3,8 @@ Pydantic models for AI service requests and responses.
 Separated from main.py for better organization and maintainability.
 """
 
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr
+from typing import List, Dict, Optional
 
 
 # Embedding Models
@@ -20,10 +20,22 @@ class SearchRequest(BaseModel):
     query: str
     min_similarity: float = Field(default=0.7, ge=0.0, le=1.0)
     limit: int = Field(default=10, ge=1, le=100)
+    # Second-stage cross-encoder rerank (None = service default, RERANKER_ENABLED)
+    rerank: Optional[bool] = None
+
+class PartitionSearchRequest(BaseModel):
+    query: str
+    min_similarity: float = Field(default=0.7, ge=0.0, le=1.0)
+    limit: int = Field(default=10, ge=1, le=1000)
+    # Encoded once by the coordinating replica so partitions skip the model
+    query_embedding: Optional[List[float]] = None
 
 class SearchResult(BaseModel):
     similarity: float
     testCase: dict
+    rerankScore: Optional[float] = None
+    # Pre-serialized testCase JSON for results built from index rows
+    _fragment: Optional[bytes] = PrivateAttr(default=None)
 
 class SearchResponse(BaseModel):
     results: List[SearchResult]
@@ -94,6 +106,65 @@ class TokenEstimateResponse(BaseModel):
 
 
 # Statistics Models
+class ClusterTestCase(BaseModel):
+    id: str
+    name: str
+    similarity: float
+
+class ClusterSummary(BaseModel):
+    cluster_id: int
+    size: int
+    share: float  # percentage of embedded test cases in this cluster
+    nearest_test_cases: List[ClusterTestCase]
+    tag_histogram: Dict[str, int]
+
+class RerankerStatistics(BaseModel):
+    enabled: bool
+    backend: str
+    requests: int
+    reranked: int
+    skipped_budget: int
+    cache_hits: int
+    cache_misses: int
+    cache_entries: int
+    cache_hit_ratio: float
+    total_added_latency_ms: float
+    last_added_latency_ms: float
+    avg_added_latency_ms: float
+    pair_cost_ms: Optional[float] = None
+
+class CoalescingStatistics(BaseModel):
+    calls: int
+    executions: int
+    coalesced: int
+    in_flight: int
+
+class IndexStatistics(BaseModel):
+    index_size: int
+    lag_seconds: Optional[float] = None  # None until the first successful sync
+    max_staleness_seconds: float
+    watermark: Optional[str] = None
+    role: str  # "standalone" | "writer" | "reader" (shared snapshots)
+    snapshot_version: Optional[int] = None
+    syncs: int
+    sync_errors: int
+    upserts: int
+    deletions: int
+    last_sync_ms: float
+    snapshots_published: int
+    snapshot_swaps: int
+
+class ScatterGatherStatistics(BaseModel):
+    enabled: bool
+    partition_count: int
+    partition_index: int
+    deadline_ms: float
+    searches: int
+    partial_results: int
+    partition_timeouts: int
+    partition_errors: int
+    last_latency_ms: Dict[str, float] = {}
+
 class StatisticsResponse(BaseModel):
     model_config = ConfigDict(protected_namespaces=())
 
@@ -102,6 +173,12 @@ class StatisticsResponse(BaseModel):
     embedding_coverage: float
     model_name: str
     embedding_dimension: int
+    # Coverage map (k-means clusters over the embeddings)
+    clusters: List[ClusterSummary] = []
+    reranker: Optional[RerankerStatistics] = None
+    search_coalescing: Optional[CoalescingStatistics] = None
+    index: Optional[IndexStatistics] = None
+    scatter_gather: Optional[ScatterGatherStatistics] = None
 
 
 # Token Info Models
@@ -119,4 +196,18 @@ class TokenInfoResponse(BaseModel):
     pricing: TokenPricingInfo
     limits: TokenLimitsInfo
     estimation_method: str
-    note: str
\ No newline at end of file
+    note: str
+
+
+# Debug Models
+class ProfileRequest(BaseModel):
+    requests: int = Field(default=10, ge=1, le=1000, description="Number of requests to profile")
+    sample_rate: float = Field(default=1.0, gt=0.0, le=1.0, description="Fraction of requests profiled until the budget is spent")
+
+class ProfileStatusResponse(BaseModel):
+    remaining: int
+    sample_rate: float
+    output_dir: str
+    recent_files: List[str]
+    profiled: int
+    skipped_busy: int
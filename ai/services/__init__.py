@@ -6,9 +6,17 @@ Contains database, AI, and Gemini service modules.
 from .database import db, DatabaseConnection
 from .ai_service import ai_service, AIService
 from .gemini_service import gemini_service, GeminiService
+from .clustering import clustering_engine, ClusteringEngine
+from .embedding_index import embedding_index, EmbeddingIndex
+from .scatter_gather import scatter_gather, ScatterGather
+from .reranker import reranker_service, RerankerService, Reranker
 
 __all__ = [
     'db', 'DatabaseConnection',
     'ai_service', 'AIService',
-    'gemini_service', 'GeminiService'
+    'gemini_service', 'GeminiService',
+    'clustering_engine', 'ClusteringEngine',
+    'embedding_index', 'EmbeddingIndex',
+    'scatter_gather', 'ScatterGather',
+    'reranker_service', 'RerankerService', 'Reranker'
 ]
\ No newline at end of file
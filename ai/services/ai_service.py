@@ -6,18 +6,33 @@ Separated from main.py for better organization and maintainability.
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import json
 import logging
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Iterable, Optional
 from fastapi import HTTPException
 
-from models import EmbeddingRequest, EmbeddingResponse, SearchRequest, SearchResult
+from models import EmbeddingRequest, EmbeddingResponse, SearchRequest, SearchResult, PartitionSearchRequest
 from services.database import db
+from services.clustering import clustering_engine
+from services.embedding_index import embedding_index
+from services.scatter_gather import scatter_gather
+from services.reranker import reranker_service
+from services.singleflight import SingleFlight
+from services.serialization import row_fragments, trusted_search_result
+from services.metrics import stage_timer, stats_collector
 
 logger = logging.getLogger(__name__)
 
+# Coalesces identical in-flight searches (including RAG retrievals)
+search_flight = SingleFlight()
+
+stats_collector.register('search', search_flight.get_stats)
+stats_collector.register('rerank', reranker_service.get_stats)
+stats_collector.register('clusters', lambda: {'index_size': clustering_engine.get_index_size()})
+stats_collector.register('embeddings', embedding_index.get_stats)
+stats_collector.register('row_fragments', row_fragments.get_stats)
+
 
 class AIService:
     """Handles AI/ML operations for embeddings and semantic search"""
@@ -31,6 +46,8 @@ class AIService:
         # Store model configuration
         self.model_name = model_name
         self.embedding_dimension = int(os.getenv('EMBEDDING_DIMENSION', '384'))
+        # Largest result window any caller needs: SearchRequest.limit (<= 100) or rerank candidates
+        self.max_candidates = max(100, reranker_service.top_n)
 
     def generate_embedding(self, request: EmbeddingRequest) -> EmbeddingResponse:
         """Generate embedding for given text"""
@@ -52,68 +69,116 @@ class AIService:
     def semantic_search(self, request: SearchRequest) -> List[SearchResult]:
         """Perform semantic search on test cases"""
         try:
-            # Generate embedding for search query
-            query_embedding = self.model.encode(request.query)
+            # With reranking, gather a wider bi-encoder candidate window first
+            rerank = request.rerank if request.rerank is not None else reranker_service.enabled
+            min_similarity, limit = request.min_similarity, request.limit
+            if rerank:
+                min_similarity, limit = reranker_service.candidate_window(min_similarity, limit)
+
+            if scatter_gather.enabled:
+                # Partitioned deployment: this replica only holds a slice of the corpus
+                results = search_flight.do(
+                    ('scatter', request.query, min_similarity, limit),
+                    lambda: self._scatter_search(request.query, min_similarity, limit)
+                )
+            else:
+                results = self._local_results(request.query, min_similarity, limit)
+
+            if rerank:
+                with stage_timer('search', 'rerank'):
+                    results = self._rerank(request, results)
 
-            # Get all test cases from database
-            test_cases = db.get_test_cases_for_embedding()
+            logger.info(f"Found {len(results)} similar test cases for query: {request.query}")
 
-            if not test_cases:
-                return []
+            return results
 
-            # Calculate similarities
-            results = []
+        except Exception as e:
+            logger.error(f"Search error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to perform semantic search")
 
-            for test_case in test_cases:
+    def search_partition(self, request: PartitionSearchRequest) -> List[SearchResult]:
+        """Search only the test cases this replica indexes (scatter-gather fan-out target)"""
+        try:
+            return self._local_results(request.query, request.min_similarity, request.limit, request.query_embedding)
+        except Exception as e:
+            logger.error(f"Partition search error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to search partition")
+
+    def _scatter_search(self, query: str, min_similarity: float, limit: int) -> List[SearchResult]:
+        # Encode once here instead of once per partition
+        with stage_timer('search', 'encode'):
+            query_embedding = self.model.encode(query).tolist()
+        with stage_timer('search', 'scatter_gather'):
+            return scatter_gather.search(query, query_embedding, min_similarity, limit, self._local_results)
+
+    def _local_results(self, query: str, min_similarity: float, limit: int,
+                       query_embedding: Optional[List[float]] = None) -> List[SearchResult]:
+        """Search the resident index of this replica"""
+        # Identical concurrent queries share one encode + corpus scan;
+        # min_similarity and limit are applied per request afterwards
+        scored = search_flight.do(query, lambda: self._score_corpus(query, query_embedding))
+
+        results = []
+        with stage_timer('search', 'format'):
+            for similarity, test_case in scored:
+                if similarity < min_similarity or len(results) >= limit:
+                    break
                 try:
-                    # Parse stored embedding
-                    stored_embedding = json.loads(test_case['embedding'])
-
-                    if not stored_embedding:
-                        continue
-
-                    # Calculate cosine similarity
-                    similarity = cosine_similarity(
-                        [query_embedding],
-                        [stored_embedding]
-                    )[0][0]
-
-                    # Filter by minimum similarity
-                    if similarity >= request.min_similarity:
-                        # Convert test case data
-                        test_case_data = {
-                            'id': test_case['id'],
-                            'name': test_case['name'],
-                            'description': test_case['description'],
-                            'type': test_case['type'],
-                            'priority': test_case['priority'],
-                            'steps': json.loads(test_case['steps']) if test_case['steps'] else [],
-                            'expectedResult': test_case['expectedResult'],
-                            'tags': json.loads(test_case['tags']) if test_case['tags'] else [],
-                            'createdAt': test_case['createdAt'].isoformat() if test_case['createdAt'] else None,
-                            'updatedAt': test_case['updatedAt'].isoformat() if test_case['updatedAt'] else None,
-                        }
-
-                        results.append(SearchResult(
-                            similarity=float(similarity),
-                            testCase=test_case_data
-                        ))
-
+                    # Index rows are trusted: skip validation and reuse their serialized JSON
+                    payload, fragment = row_fragments.get(test_case, self._format_test_case)
+                    results.append(trusted_search_result(similarity, payload, fragment))
                 except (json.JSONDecodeError, KeyError) as e:
-                    logger.warning(f"Skipping test case {test_case.get('id', 'unknown')} due to invalid embedding: {e}")
+                    logger.warning(f"Skipping test case {test_case.get('id', 'unknown')} due to invalid data: {e}")
                     continue
+        return results
+
+    def _score_corpus(self, query: str, query_embedding: Optional[List[float]] = None) -> Iterable[Tuple[float, Dict[str, Any]]]:
+        """Score embedded test cases against the query; the best max_candidates, highest first"""
+        # Generate embedding for search query
+        if query_embedding is None:
+            with stage_timer('search', 'encode'):
+                query_embedding = self.model.encode(query)
+
+        # Normally a no-op: the background loop keeps the resident index within
+        # the staleness bound, this only syncs inline when it fell behind
+        with stage_timer('search', 'index_sync'):
+            embedding_index.ensure_fresh()
+
+        with stage_timer('search', 'similarity'):
+            return embedding_index.search(query_embedding, self.max_candidates)
+
+    @staticmethod
+    def _format_test_case(test_case: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a test case row into the search result payload"""
+        return {
+            'id': test_case['id'],
+            'name': test_case['name'],
+            'description': test_case['description'],
+            'type': test_case['type'],
+            'priority': test_case['priority'],
+            'steps': json.loads(test_case['steps']) if test_case['steps'] else [],
+            'expectedResult': test_case['expectedResult'],
+            'tags': json.loads(test_case['tags']) if test_case['tags'] else [],
+            'createdAt': test_case['createdAt'].isoformat() if test_case['createdAt'] else None,
+            'updatedAt': test_case['updatedAt'].isoformat() if test_case['updatedAt'] else None,
+        }
+
+    def _rerank(self, request: SearchRequest, candidates: List[SearchResult]) -> List[SearchResult]:
+        """Apply the second-stage reranker, falling back to bi-encoder ranking when skipped"""
+        try:
+            ranked = reranker_service.rerank(request.query, candidates)
+        except Exception as e:
+            logger.warning(f"Rerank failed, using bi-encoder ranking: {e}")
+            ranked = None
 
-            # Sort by similarity (highest first) and limit results
-            results.sort(key=lambda x: x.similarity, reverse=True)
-            results = results[:request.limit]
+        if ranked is None:
+            return [c for c in candidates if c.similarity >= request.min_similarity][:request.limit]
 
-            logger.info(f"Found {len(results)} similar test cases for query: {request.query}")
-
-            return results
-
-        except Exception as e:
-            logger.error(f"Search error: {e}")
-            raise HTTPException(status_code=500, detail="Failed to perform semantic search")
+        return [
+            candidate.model_copy(update={'rerankScore': score})
+            for candidate, score in ranked
+            if score >= reranker_service.min_score
+        ][:request.limit]
 
     def get_statistics(self) -> Dict[str, Any]:
         """Get AI service statistics"""
@@ -126,7 +191,12 @@ class AIService:
                 "embedded_test_cases": embedded_count,
                 "embedding_coverage": (embedded_count / total_count * 100) if total_count > 0 else 0,
                 "model_name": self.model_name,
-                "embedding_dimension": self.embedding_dimension
+                "embedding_dimension": self.embedding_dimension,
+                "clusters": clustering_engine.get_cluster_summaries(),
+                "reranker": reranker_service.get_stats(),
+                "search_coalescing": search_flight.get_stats(),
+                "index": embedding_index.get_stats(),
+                "scatter_gather": scatter_gather.get_stats()
             }
 
         except Exception as e:
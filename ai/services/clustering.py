@@ -0,0 +1,212 @@
+"""
+Clustering engine for the test case corpus.
+Runs mini-batch k-means (vectorized NumPy) over stored embeddings and keeps
+cluster assignments incrementally up to date as rows are added or changed,
+producing a coverage map of over- and under-tested feature areas.
+
+Vectors are read from the resident embedding index (services/embedding_index.py)
+rather than kept a second time; only labels, versions, names and tags are held
+here. In a partitioned deployment the clusters cover this replica's partition.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from services.database import db
+from services.embedding_index import embedding_index
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so dot products are cosine similarities"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _parse_tags(tags) -> List[str]:
+    """Tags are stored as a JSON column; accept both decoded and raw values"""
+    if isinstance(tags, (bytes, str)):
+        try:
+            tags = json.loads(tags)
+        except json.JSONDecodeError:
+            return []
+    return [str(tag) for tag in tags] if isinstance(tags, list) else []
+
+
+class ClusteringEngine:
+    """Mini-batch k-means over test case embeddings with incremental assignment"""
+
+    def __init__(self):
+        # 0 means "derive from corpus size" (sqrt(n / 2))
+        self.cluster_count = int(os.getenv('CLUSTER_COUNT', '0'))
+        self.batch_size = int(os.getenv('CLUSTER_BATCH_SIZE', '256'))
+        self.max_iterations = int(os.getenv('CLUSTER_MAX_ITERATIONS', '100'))
+        self.refresh_interval = float(os.getenv('CLUSTER_REFRESH_SECONDS', '300'))
+        self.top_tags = int(os.getenv('CLUSTER_TOP_TAGS', '10'))
+        self.nearest_count = int(os.getenv('CLUSTER_NEAREST_TEST_CASES', '3'))
+
+        self._rng = np.random.default_rng(42)
+        self._lock = threading.Lock()
+        self._centroids: Optional[np.ndarray] = None
+        self._counts: Optional[np.ndarray] = None
+        self._fitted_size = 0
+        self._last_refresh = 0.0
+
+        # Per-row state, keyed by test case id
+        self._versions: Dict[str, Any] = {}
+        self._labels: Dict[str, int] = {}
+        self._meta: Dict[str, Dict[str, Any]] = {}
+
+    # ==================== K-MEANS ====================
+
+    def _k_for(self, n: int) -> int:
+        k = self.cluster_count or int(math.sqrt(n / 2))
+        return max(1, min(k, n))
+
+    def _nearest(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self._centroids.T, axis=1)
+
+    def _init_centroids(self, vectors: np.ndarray, k: int) -> np.ndarray:
+        """k-means++ seeding (on a sample for large corpora)"""
+        sample = vectors
+        if len(vectors) > 20 * self.batch_size:
+            sample = vectors[self._rng.choice(len(vectors), 20 * self.batch_size, replace=False)]
+
+        centroids = [sample[self._rng.integers(len(sample))]]
+        distances = 1.0 - sample @ centroids[0]
+        for _ in range(1, k):
+            weights = np.clip(distances, 0, None) ** 2
+            total = weights.sum()
+            index = self._rng.choice(len(sample), p=weights / total) if total > 0 else self._rng.integers(len(sample))
+            centroids.append(sample[index])
+            distances = np.minimum(distances, 1.0 - sample @ sample[index])
+        return np.array(centroids, dtype=np.float32)
+
+    def _partial_fit(self, vectors: np.ndarray, labels: np.ndarray):
+        """Mini-batch centroid update with per-centroid learning rates"""
+        k = len(self._centroids)
+        batch_counts = np.bincount(labels, minlength=k).astype(np.float32)
+        sums = np.zeros_like(self._centroids)
+        np.add.at(sums, labels, vectors)
+
+        touched = batch_counts > 0
+        self._counts[touched] += batch_counts[touched]
+        step = (sums[touched] - batch_counts[touched, None] * self._centroids[touched]) / self._counts[touched, None]
+        self._centroids[touched] = _normalize(self._centroids[touched] + step)
+
+    def _fit(self, vectors: np.ndarray):
+        k = self._k_for(len(vectors))
+        self._centroids = self._init_centroids(vectors, k)
+        self._counts = np.zeros(k, dtype=np.float32)
+
+        batch_size = min(self.batch_size, len(vectors))
+        for _ in range(self.max_iterations):
+            batch = vectors[self._rng.choice(len(vectors), batch_size, replace=False)]
+            self._partial_fit(batch, self._nearest(batch))
+
+        self._fitted_size = len(vectors)
+        logger.info(f"Fitted {k} clusters over {len(vectors)} test cases")
+
+    # ==================== SYNC ====================
+
+    def refresh(self, force: bool = False):
+        """Bring assignments up to date with the database"""
+        with self._lock:
+            if not force and self._centroids is not None and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return
+
+            versions = {row['id']: row['updatedAt'] for row in db.get_embedding_versions()}
+
+            for removed in set(self._versions) - set(versions):
+                for state in (self._versions, self._labels, self._meta):
+                    state.pop(removed, None)
+
+            # Rows the index does not hold (yet) stay unversioned and are retried next time;
+            # the index's own updatedAt is kept so rows it served stale are picked up again
+            changed = [tc_id for tc_id, version in versions.items() if self._versions.get(tc_id) != version]
+            changed_ids, vectors, rows = embedding_index.get_vectors(changed, with_rows=True)
+            for row in rows:
+                self._versions[row['id']] = row['updatedAt']
+                self._meta[row['id']] = {'name': row['name'], 'tags': _parse_tags(row['tags'])}
+
+            if self._versions and (self._centroids is None or len(self._versions) > 2 * self._fitted_size):
+                # First run, or the corpus doubled: refit so k follows the corpus size
+                ids, vectors, _ = embedding_index.get_vectors(list(self._versions))
+                if ids:
+                    vectors = _normalize(vectors)
+                    self._fit(vectors)
+                    self._labels = dict(zip(ids, self._nearest(vectors).tolist()))
+            elif changed_ids:
+                # Assign new/changed rows to the nearest centroid and nudge the centroids
+                vectors = _normalize(vectors)
+                labels = self._nearest(vectors)
+                self._partial_fit(vectors, labels)
+                self._labels.update(zip(changed_ids, labels.tolist()))
+
+            self._last_refresh = time.monotonic()
+
+    def get_index_size(self) -> int:
+        """Number of test cases currently assigned to a cluster"""
+        return len(self._labels)
+
+    # ==================== SUMMARIES ====================
+
+    def get_cluster_summaries(self) -> List[Dict[str, Any]]:
+        """Size, centroid-nearest test cases and tag histogram per cluster"""
+        self.refresh()
+
+        with self._lock:
+            if self._centroids is None or not self._labels:
+                return []
+
+            indexed_ids, vectors, _ = embedding_index.get_vectors(list(self._labels))
+            if not indexed_ids:
+                return []
+            labels = np.fromiter((self._labels[tc_id] for tc_id in indexed_ids), dtype=np.int64, count=len(indexed_ids))
+            # Similarity of every row to its own centroid
+            centroid_similarities = np.einsum('ij,ij->i', _normalize(vectors), self._centroids[labels])
+
+            members: Dict[int, List[int]] = {}
+            for position, label in enumerate(labels.tolist()):
+                members.setdefault(label, []).append(position)
+
+            total = len(indexed_ids)
+            summaries = []
+            for label, positions in members.items():
+                ids = [indexed_ids[position] for position in positions]
+                similarities = centroid_similarities[positions]
+                nearest = np.argsort(-similarities)[:self.nearest_count]
+
+                tags = Counter(tag for tc_id in ids for tag in self._meta[tc_id]['tags'])
+
+                summaries.append({
+                    'cluster_id': int(label),
+                    'size': len(ids),
+                    'share': len(ids) / total * 100,
+                    'nearest_test_cases': [
+                        {
+                            'id': ids[i],
+                            'name': self._meta[ids[i]]['name'],
+                            'similarity': float(similarities[i]),
+                        }
+                        for i in nearest
+                    ],
+                    'tag_histogram': dict(tags.most_common(self.top_tags)),
+                })
+
+            summaries.sort(key=lambda summary: summary['size'], reverse=True)
+            return summaries
+
+
+# Global clustering engine instance
+clustering_engine = ClusteringEngine()
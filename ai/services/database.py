@@ -8,7 +8,7 @@ import mysql.connector
 from mysql.connector import Error
 import os
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator
 from fastapi import HTTPException
 
 logger = logging.getLogger(__name__)
@@ -39,10 +39,12 @@ class DatabaseConnection:
             logger.error(f"Database connection error: {e}")
             raise HTTPException(status_code=500, detail="Database connection failed")
 
-    def get_test_cases_for_embedding(self) -> List[Dict[str, Any]]:
-        """Get all test cases that have embeddings for semantic search"""
+    def get_test_cases_for_embedding(self, chunk_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Stream all test cases that have embeddings for semantic search.
+        Uses an unbuffered cursor and fetches chunk_size rows at a time, so the
+        result set is never materialized client-side."""
         connection = self.get_connection()
-        cursor = connection.cursor(dictionary=True)
+        cursor = connection.cursor(dictionary=True, buffered=False)
 
         query = """
         SELECT id, name, description, type, priority, steps, expectedResult, tags, embedding, createdAt, updatedAt
@@ -50,13 +52,78 @@ class DatabaseConnection:
         WHERE embedding IS NOT NULL AND embedding != ''
         """
 
+        exhausted = False
         try:
             cursor.execute(query)
-            test_cases = cursor.fetchall()
-            return test_cases
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    exhausted = True
+                    break
+                yield from rows
         except Error as e:
             logger.error(f"Database query error: {e}")
             raise HTTPException(status_code=500, detail="Failed to fetch test cases")
+        finally:
+            if not exhausted:
+                # An unbuffered result must be read off the wire before the cursor can close
+                try:
+                    connection.consume_results()
+                except Error:
+                    pass
+            cursor.close()
+            connection.close()
+
+    def get_embedding_versions(self) -> List[Dict[str, Any]]:
+        """Get id and updatedAt of every embedded test case (cheap change detection)"""
+        connection = self.get_connection()
+        cursor = connection.cursor(dictionary=True)
+
+        try:
+            cursor.execute("SELECT id, updatedAt FROM testcases WHERE embedding IS NOT NULL AND embedding != ''")
+            return cursor.fetchall()
+        except Error as e:
+            logger.error(f"Database query error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to fetch test case versions")
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_test_cases_changed_since(self, updated_at, last_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Get test cases after the (updatedAt, id) watermark, oldest first.
+        Rows whose embedding was cleared are included so the caller can drop them."""
+        connection = self.get_connection()
+        cursor = connection.cursor(dictionary=True)
+
+        query = """
+        SELECT id, name, description, type, priority, steps, expectedResult, tags, embedding, createdAt, updatedAt
+        FROM testcases
+        WHERE updatedAt > %s OR (updatedAt = %s AND id > %s)
+        ORDER BY updatedAt, id
+        LIMIT %s
+        """
+
+        try:
+            cursor.execute(query, (updated_at, updated_at, last_id, limit))
+            return cursor.fetchall()
+        except Error as e:
+            logger.error(f"Database query error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to fetch changed test cases")
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_embedded_test_case_ids(self) -> List[str]:
+        """Get the ids of every embedded test case (deletion detection)"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("SELECT id FROM testcases WHERE embedding IS NOT NULL AND embedding != ''")
+            return [row[0] for row in cursor.fetchall()]
+        except Error as e:
+            logger.error(f"Database query error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to fetch test case ids")
         finally:
             cursor.close()
             connection.close()
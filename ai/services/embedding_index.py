@@ -0,0 +1,486 @@
+"""
+Resident embedding index for semantic search.
+Keeps a normalized float32 matrix of every embedded test case in memory and
+syncs it incrementally from MySQL. The NestJS backend owns the table and never
+notifies this service, so a background loop polls an (updatedAt, id)
+watermark for new and modified rows and detects deletions with id-set diffs.
+
+With INDEX_SNAPSHOT_DIR set, only one worker per pod syncs (the writer) and
+publishes snapshots there; the other workers mmap the latest snapshot and
+swap to newer ones as they appear (see services/index_snapshot.py). In a
+partitioned deployment only this replica's hash partition is indexed
+(see services/scatter_gather.py).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Sequence
+
+import numpy as np
+
+from services.database import db
+from services.index_snapshot import IndexSnapshot, WriterLock, write_snapshot, prune_snapshots, current_snapshot_name
+from services.scatter_gather import scatter_gather
+
+logger = logging.getLogger(__name__)
+
+# Watermark before any row; Prisma's @updatedAt never produces anything older
+EPOCH = datetime(1970, 1, 1)
+
+
+class RankedRows:
+    """Top scored rows in descending similarity order, materialized lazily while iterating"""
+
+    def __init__(self, scores: np.ndarray, positions: np.ndarray, rows: Sequence[Dict[str, Any]]):
+        self._scores = scores
+        self._positions = positions
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __iter__(self):
+        for score, position in zip(self._scores, self._positions):
+            yield float(score), self._rows[position]
+
+
+def _shard_top_k(vectors: np.ndarray, query: np.ndarray, k: int, offset: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Unordered top-k (scores, positions) of one shard; the matmul releases the GIL"""
+    scores = vectors @ query
+    if len(scores) > k:
+        top = np.argpartition(scores, -k)[-k:]
+        return scores[top], top + offset
+    return scores, np.arange(offset, offset + len(scores))
+
+
+class EmbeddingIndex:
+    """In-memory embedding matrix kept in sync with the testcases table"""
+
+    def __init__(self):
+        self.model_name = os.getenv('MODEL_NAME', 'all-MiniLM-L6-v2')
+        self.embedding_dimension = int(os.getenv('EMBEDDING_DIMENSION', '384'))
+        self.sync_interval = float(os.getenv('INDEX_SYNC_INTERVAL_SECONDS', '5'))
+        # Searches sync inline when the last successful sync is older than this
+        self.max_staleness = float(os.getenv('INDEX_MAX_STALENESS_SECONDS', '30'))
+        self.batch_size = int(os.getenv('INDEX_SYNC_BATCH_SIZE', '1000'))
+        self.deletion_check_interval = float(os.getenv('INDEX_DELETION_CHECK_SECONDS', '60'))
+        # Re-read this far behind the watermark so rows committed late with an
+        # older updatedAt are not skipped; unchanged rows are ignored cheaply
+        self.watermark_overlap = float(os.getenv('INDEX_WATERMARK_OVERLAP_SECONDS', '2'))
+        # Shared snapshots across workers (empty = every worker keeps its own index)
+        self.snapshot_dir = os.getenv('INDEX_SNAPSHOT_DIR', '')
+        self.snapshot_interval = float(os.getenv('INDEX_SNAPSHOT_INTERVAL_SECONDS', '10'))
+        self.snapshot_keep = int(os.getenv('INDEX_SNAPSHOT_KEEP', '3'))
+        # Parallel scoring: 0 = one shard per core; corpora below
+        # INDEX_MIN_SHARD_ROWS per shard use fewer shards (threads cost more than they save)
+        self.shard_count = int(os.getenv('INDEX_SHARDS', '0')) or os.cpu_count() or 1
+        self.min_shard_rows = int(os.getenv('INDEX_MIN_SHARD_ROWS', '16384'))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._reset()
+
+        self._role = 'standalone'
+        self._writer_lock = WriterLock(self.snapshot_dir) if self.snapshot_dir else None
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._published_version = 0
+        self._published_at = 0.0
+        self._published_changes = -1
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            'syncs': 0,
+            'sync_errors': 0,
+            'upserts': 0,
+            'deletions': 0,
+            'last_sync_ms': 0.0,
+            'snapshots_published': 0,
+            'snapshot_swaps': 0,
+        }
+
+    def _reset(self):
+        """Drop the private index (a reader serving from a snapshot does not need it)"""
+        self._matrix = np.zeros((0, self.embedding_dimension), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._rows: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self._versions: Dict[str, Any] = {}
+        self._watermark: Optional[Tuple[datetime, str]] = None
+        self._synced_at: Optional[float] = None
+        self._last_deletion_check = 0.0
+
+    # ==================== MATRIX ====================
+
+    def _upsert(self, tc_id: str, vector: np.ndarray, row: Dict[str, Any]):
+        position = self._positions.get(tc_id)
+        if position is None:
+            if self._size == len(self._matrix):
+                grown = np.zeros((max(1024, 2 * len(self._matrix)), self.embedding_dimension), dtype=np.float32)
+                grown[:self._size] = self._matrix[:self._size]
+                self._matrix = grown
+            position = self._size
+            self._size += 1
+            self._ids.append(tc_id)
+            self._rows.append(row)
+            self._positions[tc_id] = position
+        else:
+            self._rows[position] = row
+        self._matrix[position] = vector
+
+    def _remove(self, tc_id: str):
+        """Swap the last row into the freed slot so the matrix stays dense"""
+        position = self._positions.pop(tc_id, None)
+        self._versions.pop(tc_id, None)
+        if position is None:
+            return
+        last = self._size - 1
+        if position != last:
+            moved = self._ids[last]
+            self._matrix[position] = self._matrix[last]
+            self._ids[position] = moved
+            self._rows[position] = self._rows[last]
+            self._positions[moved] = position
+        self._ids.pop()
+        self._rows.pop()
+        self._size -= 1
+        self._stats['deletions'] += 1
+
+    def _apply(self, row: Dict[str, Any]):
+        tc_id = row['id']
+        if tc_id in self._versions and self._versions[tc_id] == row['updatedAt']:
+            return
+
+        try:
+            owned = row['embedding'] and scatter_gather.owns(tc_id)
+            vector = np.asarray(json.loads(row['embedding']), dtype=np.float32) if owned else None
+        except (json.JSONDecodeError, TypeError, ValueError) as e:
+            logger.warning(f"Skipping test case {tc_id} due to invalid embedding: {e}")
+            vector = None
+
+        if vector is None or vector.shape != (self.embedding_dimension,):
+            # Embedding cleared, corrupt, from another model or owned by another partition
+            self._remove(tc_id)
+            return
+
+        norm = np.linalg.norm(vector)
+        self._upsert(tc_id, vector / norm if norm else vector, {k: v for k, v in row.items() if k != 'embedding'})
+        self._versions[tc_id] = row['updatedAt']
+        self._stats['upserts'] += 1
+
+    # ==================== SYNC ====================
+
+    def sync(self):
+        """Apply every change after the watermark, then check for deletions"""
+        with self._sync_lock:
+            started = time.time()
+            try:
+                newest = self._watermark if self._watermark is not None else self._bulk_load()
+                # Pick up rows committed during the bulk load (or late with an older updatedAt)
+                cursor = (newest[0] - timedelta(seconds=self.watermark_overlap), '') if newest else (EPOCH, '')
+
+                while True:
+                    rows = db.get_test_cases_changed_since(cursor[0], cursor[1], self.batch_size)
+                    if rows:
+                        with self._lock:
+                            for row in rows:
+                                self._apply(row)
+                        cursor = (rows[-1]['updatedAt'], rows[-1]['id'])
+                        newest = max(newest, cursor) if newest else cursor
+                    if len(rows) < self.batch_size:
+                        break
+
+                self._watermark = newest
+                self._detect_deletions()
+            except Exception:
+                self._stats['sync_errors'] += 1
+                raise
+
+            self._synced_at = started
+            self._stats['syncs'] += 1
+            self._stats['last_sync_ms'] = (time.time() - started) * 1000
+
+    def _bulk_load(self) -> Optional[Tuple[datetime, str]]:
+        """Initial build: stream every embedded row from one unbuffered query into a
+        matrix preallocated to the row count (np.zeros pages stay unresident until
+        written, so partitions only pay for the rows they own). Returns the newest
+        (updatedAt, id) seen."""
+        capacity = db.get_embedded_test_case_count()
+        with self._lock:
+            if self._size == 0 and len(self._matrix) < capacity:
+                self._matrix = np.zeros((capacity, self.embedding_dimension), dtype=np.float32)
+
+        newest = None
+        chunk = []
+        for row in db.get_test_cases_for_embedding(self.batch_size):
+            chunk.append(row)
+            if len(chunk) == self.batch_size:
+                newest = self._apply_chunk(chunk, newest)
+                chunk = []
+        if chunk:
+            newest = self._apply_chunk(chunk, newest)
+        return newest
+
+    def _apply_chunk(self, rows: List[Dict[str, Any]], newest: Optional[Tuple[datetime, str]]):
+        with self._lock:
+            for row in rows:
+                self._apply(row)
+        chunk_newest = max((row['updatedAt'], row['id']) for row in rows)
+        return max(newest, chunk_newest) if newest else chunk_newest
+
+    def _detect_deletions(self):
+        """Diff id sets when the row count shows a gap, and periodically regardless
+        (an insert and a delete between two syncs leave the count unchanged)"""
+        due = time.monotonic() - self._last_deletion_check >= self.deletion_check_interval
+        if not due and db.get_embedded_test_case_count() >= self._size:
+            return
+
+        live_ids = set(db.get_embedded_test_case_ids())
+        self._last_deletion_check = time.monotonic()
+        with self._lock:
+            for tc_id in [tc_id for tc_id in self._positions if tc_id not in live_ids]:
+                self._remove(tc_id)
+
+    def ensure_fresh(self):
+        """Enforce the staleness bound before serving a search"""
+        if self.get_lag() <= self.max_staleness:
+            return
+        if self._role == 'reader':
+            self._refresh_snapshot()
+            if self.get_lag() <= self.max_staleness:
+                return
+            # No fresh snapshot (writer down or still loading): serve from a private index
+            if self._snapshot is not None:
+                logger.warning(f"Snapshot {self._snapshot.name} is stale, syncing this worker directly")
+                self._snapshot = None
+        self.sync()
+
+    def get_lag(self) -> float:
+        """Seconds since the served data was last confirmed against the database (inf before that)"""
+        snapshot = self._snapshot
+        synced_at = snapshot.synced_at if snapshot is not None else self._synced_at
+        return max(0.0, time.time() - synced_at) if synced_at is not None else float('inf')
+
+    # ==================== SNAPSHOTS ====================
+
+    def _compatible(self, snapshot: IndexSnapshot) -> bool:
+        return (snapshot.header.get('model_name') == self.model_name
+                and snapshot.dimension == self.embedding_dimension
+                and snapshot.header.get('partition', [0, 1]) == self._partition())
+
+    @staticmethod
+    def _partition() -> List[int]:
+        return [scatter_gather.partition_index, scatter_gather.partition_count]
+
+    def _open_current(self) -> Optional[IndexSnapshot]:
+        try:
+            snapshot = IndexSnapshot.open_current(self.snapshot_dir)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not open index snapshot: {e}")
+            return None
+        if snapshot is not None and not self._compatible(snapshot):
+            logger.warning(f"Ignoring snapshot {snapshot.name} built for another model")
+            return None
+        return snapshot
+
+    def _refresh_snapshot(self):
+        """Swap to the latest published snapshot if it is newer than what is served"""
+        name = current_snapshot_name(self.snapshot_dir)
+        if name is None or (self._snapshot is not None and self._snapshot.name == name):
+            return
+        snapshot = self._open_current()
+        served_sync = self._snapshot.synced_at if self._snapshot is not None else self._synced_at
+        if snapshot is None or (served_sync is not None and snapshot.synced_at <= served_sync):
+            return
+        with self._sync_lock:
+            # Readers drop their private fallback index once a snapshot is available
+            self._snapshot = snapshot
+            self._reset()
+        self._stats['snapshot_swaps'] += 1
+        logger.info(f"Serving embedding index snapshot {snapshot.name} ({snapshot.count} test cases)")
+
+    def _become_writer(self):
+        """Take over syncing, bootstrapping from the latest snapshot instead of a full table load"""
+        snapshot = self._snapshot or self._open_current()
+        with self._sync_lock:
+            if snapshot is not None and self._synced_at is None:
+                with self._lock:
+                    self._matrix = np.array(snapshot.vectors, dtype=np.float32)
+                    self._size = snapshot.count
+                    self._ids = list(snapshot.ids)
+                    self._rows = [snapshot.row(position) for position in range(snapshot.count)]
+                    self._positions = {tc_id: position for position, tc_id in enumerate(self._ids)}
+                    self._versions = {row['id']: row['updatedAt'] for row in self._rows}
+                    self._watermark = snapshot.watermark
+                self._published_version = snapshot.version
+            self._snapshot = None
+            self._role = 'writer'
+        logger.info(f"Worker {os.getpid()} is the embedding index writer")
+
+    def _maybe_publish(self):
+        changes = self._stats['upserts'] + self._stats['deletions']
+        if changes == self._published_changes or time.monotonic() - self._published_at < self.snapshot_interval:
+            return
+
+        with self._lock:
+            vectors = self._matrix[:self._size].copy()
+            ids = list(self._ids)
+            rows = list(self._rows)
+        watermark = [self._watermark[0].isoformat(), self._watermark[1]] if self._watermark else None
+
+        version = self._published_version + 1
+        write_snapshot(self.snapshot_dir, version, ids, vectors, rows, {
+            'model_name': self.model_name,
+            'embedding_dimension': self.embedding_dimension,
+            'watermark': watermark,
+            'synced_at': self._synced_at,
+            'partition': self._partition(),
+        })
+        prune_snapshots(self.snapshot_dir, self.snapshot_keep)
+        self._published_version = version
+        self._published_at = time.monotonic()
+        self._published_changes = changes
+        self._stats['snapshots_published'] += 1
+
+    # ==================== LOOP ====================
+
+    def start(self):
+        """Start the background sync loop"""
+        if self._thread and self._thread.is_alive():
+            return
+        if self._writer_lock is not None:
+            if self._writer_lock.acquire():
+                self._become_writer()
+            else:
+                # Cold start straight from the shared snapshot, no table load
+                self._role = 'reader'
+                self._refresh_snapshot()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='embedding-index-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._writer_lock is not None:
+            self._writer_lock.release()
+
+    def _tick(self):
+        if self._role == 'reader' and self._writer_lock.acquire():
+            # The previous writer exited; take over
+            self._become_writer()
+
+        if self._role == 'reader':
+            self._refresh_snapshot()
+        else:
+            self.sync()
+            if self._role == 'writer':
+                self._maybe_publish()
+
+    def _run(self):
+        while True:
+            try:
+                self._tick()
+            except Exception as e:
+                logger.warning(f"Embedding index sync failed: {e}")
+            if self._stop.wait(self.sync_interval):
+                return
+
+    # ==================== SEARCH ====================
+
+    def _top_k(self, vectors: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, positions) over `vectors`, highest first; shards are scored
+        in parallel and their partial top-k lists merged"""
+        shards = max(1, min(self.shard_count, len(vectors) // self.min_shard_rows))
+        if shards == 1:
+            parts = [_shard_top_k(vectors, query, k, 0)]
+        else:
+            if self._executor is None:
+                # Concurrent first searches (sync handlers run in a threadpool) must share one pool;
+                # not self._lock, which search() holds while scoring the private matrix
+                with self._executor_lock:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=self.shard_count,
+                                                            thread_name_prefix='index-shard')
+            bounds = np.linspace(0, len(vectors), shards + 1, dtype=np.int64)
+            futures = [
+                self._executor.submit(_shard_top_k, vectors[start:end], query, k, int(start))
+                for start, end in zip(bounds[:-1], bounds[1:])
+            ]
+            parts = [future.result() for future in futures]
+
+        scores = np.concatenate([part[0] for part in parts])
+        positions = np.concatenate([part[1] for part in parts])
+        order = np.lexsort((positions, -scores))[:k]
+        return scores[order], positions[order]
+
+    def search(self, query_embedding: np.ndarray, k: Optional[int] = None) -> RankedRows:
+        """The k most cosine-similar indexed rows (all of them when k is None), highest first"""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape != (self.embedding_dimension,):
+            return RankedRows(np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64), [])
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        snapshot = self._snapshot
+        if snapshot is not None:
+            scores, positions = self._top_k(snapshot.vectors, query, k or max(1, snapshot.count))
+            return RankedRows(scores, positions, snapshot.rows)
+
+        with self._lock:
+            scores, positions = self._top_k(self._matrix[:self._size], query, k or max(1, self._size))
+            rows = [self._rows[position] for position in positions]
+        return RankedRows(scores, np.arange(len(rows)), rows)
+
+    def get_vectors(self, ids: Sequence[str], with_rows: bool = False) -> Tuple[List[str], np.ndarray, List[Dict[str, Any]]]:
+        """Copies of the normalized vectors of those of `ids` that are indexed (in that
+        order), with their rows when with_rows; consumers share the served vectors
+        instead of keeping their own"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            positions = snapshot.positions
+            found = [tc_id for tc_id in ids if tc_id in positions]
+            index = np.fromiter((positions[tc_id] for tc_id in found), dtype=np.int64, count=len(found))
+            rows = [snapshot.row(position) for position in index] if with_rows else []
+            return found, snapshot.vectors[index], rows
+
+        with self._lock:
+            found = [tc_id for tc_id in ids if tc_id in self._positions]
+            index = np.fromiter((self._positions[tc_id] for tc_id in found), dtype=np.int64, count=len(found))
+            rows = [self._rows[position] for position in index] if with_rows else []
+            return found, self._matrix[index], rows
+
+    def get_index_size(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.count if snapshot is not None else self._size
+
+    def get_stats(self) -> Dict[str, Any]:
+        lag = self.get_lag()
+        snapshot = self._snapshot
+        watermark = snapshot.watermark if snapshot is not None else self._watermark
+        return {
+            'index_size': self.get_index_size(),
+            'lag_seconds': lag if lag != float('inf') else None,
+            'max_staleness_seconds': self.max_staleness,
+            'watermark': watermark[0].isoformat() if watermark else None,
+            'role': self._role,
+            'snapshot_version': snapshot.version if snapshot is not None else (self._published_version or None),
+            **self._stats,
+        }
+
+
+# Global embedding index instance
+embedding_index = EmbeddingIndex()
@@ -12,12 +12,14 @@ import google.generativeai as genai
 import os
 
 from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
 from models import (
     GenerateTestCaseRequest, GenerateTestCaseResponse,
     TestStep, RAGReference, TokenUsage,
     TokenEstimateRequest, TokenEstimateResponse
 )
 from services.ai_service import ai_service
+from services.metrics import stage_timer, gemini_requests_total, record_token_usage
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +37,14 @@ class GeminiService:
         if self._api_key is None:
             self._api_key = os.getenv('GEMINI_API_KEY')
             if self._api_key and not self._configured:
-                genai.configure(api_key=self._api_key)
+                endpoint = os.getenv('GEMINI_API_ENDPOINT')
+                if endpoint:
+                    # e.g. a local stand-in for load tests; REST is the only transport that accepts http://
+                    genai.configure(api_key=self._api_key, transport='rest',
+                                    client_options={'api_endpoint': endpoint})
+                    logger.info(f"Gemini requests routed to {endpoint}")
+                else:
+                    genai.configure(api_key=self._api_key)
                 self._configured = True
                 logger.info("Gemini AI configured successfully")
             elif not self._api_key:
@@ -69,7 +78,9 @@ class GeminiService:
                         limit=request.maxRAGReferences
                     )
 
-                    search_results = ai_service.semantic_search(search_request)
+                    with stage_timer('generate', 'retrieval'):
+                        # Encoding and (scatter-gather) search block: keep them off the event loop
+                        search_results = await run_in_threadpool(ai_service.semantic_search, search_request)
 
                     if search_results:
                         generation_method = "rag"
@@ -113,10 +124,16 @@ class GeminiService:
                 user_prompt += f"\n\nPreferred priority: {request.preferredPriority}"
 
             # Generate content with token tracking
-            response = model.generate_content([
-                {"text": system_prompt},
-                {"text": user_prompt}
-            ])
+            try:
+                with stage_timer('generate', 'gemini'):
+                    response = model.generate_content([
+                        {"text": system_prompt},
+                        {"text": user_prompt}
+                    ])
+                gemini_requests_total.labels('success').inc()
+            except Exception:
+                gemini_requests_total.labels('error').inc()
+                raise
 
             response_text = response.text
 
@@ -125,6 +142,11 @@ class GeminiService:
                 # Gemini API provides usage metadata in response
                 if hasattr(response, 'usage_metadata'):
                     usage = response.usage_metadata
+                    record_token_usage({
+                        'prompt_token_count': getattr(usage, 'prompt_token_count', None),
+                        'candidates_token_count': getattr(usage, 'candidates_token_count', None),
+                        'total_token_count': getattr(usage, 'total_token_count', None),
+                    })
                     logger.info(f"Token usage - Prompt: {usage.prompt_token_count}, "
                                f"Candidates: {usage.candidates_token_count}, "
                                f"Total: {usage.total_token_count}")
@@ -139,11 +161,12 @@ class GeminiService:
             # Parse the JSON response
             try:
                 # Clean up the response text to extract JSON
-                json_match = re.search(r'\{[\s\S]*\}', response_text)
-                if not json_match:
-                    raise ValueError('No valid JSON found in AI response')
+                with stage_timer('generate', 'parse'):
+                    json_match = re.search(r'\{[\s\S]*\}', response_text)
+                    if not json_match:
+                        raise ValueError('No valid JSON found in AI response')
 
-                ai_response = json.loads(json_match.group())
+                    ai_response = json.loads(json_match.group())
             except (json.JSONDecodeError, ValueError) as parse_error:
                 logger.error(f"Failed to parse AI response: {response_text}")
                 raise HTTPException(
@@ -222,7 +245,7 @@ class GeminiService:
                     limit=request.maxRAGReferences
                 )
 
-                search_results = ai_service.semantic_search(search_request)
+                search_results = await run_in_threadpool(ai_service.semantic_search, search_request)
 
                 if search_results:
                     # Simulate RAG context formatting
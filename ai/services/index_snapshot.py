@@ -0,0 +1,239 @@
+"""
+On-disk embedding index snapshots shared by all workers of a pod.
+One worker (holding the writer lock) publishes versioned snapshot files; the
+others mmap them read-only so the vectors live once in the OS page cache, and
+swap to a newer file without restarting.
+
+File layout (little endian):
+    MAGIC (8 bytes) | header length (uint64) | header JSON | padding to 64 bytes
+    vectors  float32[count, dimension]   L2-normalized
+    offsets  int64[count + 1]            row JSON boundaries
+    rows     JSON per row (without the embedding column)
+    ids      newline-separated test case ids
+
+Files are written under a temporary name and published with os.replace(), and
+CURRENT (also replaced atomically) names the latest one, so readers never see
+a partial snapshot.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'TCIDXSNP'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = 'writer.lock'
+DATETIME_FIELDS = ('createdAt', 'updatedAt')
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _encode_row(row: Dict[str, Any]) -> bytes:
+    return json.dumps(
+        row, separators=(',', ':'),
+        default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value)
+    ).encode('utf-8')
+
+
+def _decode_row(data: bytes) -> Dict[str, Any]:
+    row = json.loads(data)
+    for field in DATETIME_FIELDS:
+        if row.get(field):
+            row[field] = datetime.fromisoformat(row[field])
+    return row
+
+
+def write_snapshot(directory: str, version: int, ids: List[str], vectors: np.ndarray,
+                   rows: List[Dict[str, Any]], metadata: Dict[str, Any]) -> str:
+    """Write and publish snapshot `version`; returns its file name"""
+    os.makedirs(directory, exist_ok=True)
+    count, dimension = vectors.shape if len(vectors) else (0, metadata['embedding_dimension'])
+
+    encoded = [_encode_row(row) for row in rows]
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    if encoded:
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    ids_blob = '\n'.join(ids).encode('utf-8')
+
+    header = {
+        **metadata,
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'count': count,
+        'embedding_dimension': dimension,
+        'created_at': time.time(),
+    }
+    # Offsets depend on the header length, which depends on the offsets: reserve digits
+    header.update(vectors_offset=0, offsets_offset=0, rows_offset=0, ids_offset=0, ids_length=len(ids_blob))
+    header_length = len(json.dumps(header)) + 64
+    vectors_offset = _align(len(MAGIC) + 8 + header_length)
+    offsets_offset = vectors_offset + count * dimension * 4
+    rows_offset = offsets_offset + offsets.nbytes
+    ids_offset = rows_offset + int(offsets[-1])
+    header.update(vectors_offset=vectors_offset, offsets_offset=offsets_offset,
+                  rows_offset=rows_offset, ids_offset=ids_offset)
+    header_bytes = json.dumps(header).encode('utf-8').ljust(header_length)
+
+    name = f"snapshot-{version:010d}.idx"
+    temp_path = os.path.join(directory, f".{name}.tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', header_length))
+        f.write(header_bytes)
+        f.write(b'\0' * (vectors_offset - f.tell()))
+        f.write(np.ascontiguousarray(vectors, dtype='<f4').tobytes())
+        f.write(offsets.astype('<i8').tobytes())
+        for data in encoded:
+            f.write(data)
+        f.write(ids_blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, os.path.join(directory, name))
+
+    current_temp = os.path.join(directory, f".{CURRENT_FILE}.tmp")
+    with open(current_temp, 'w') as f:
+        f.write(name)
+    os.replace(current_temp, os.path.join(directory, CURRENT_FILE))
+    return name
+
+
+def prune_snapshots(directory: str, keep: int):
+    """Remove all but the newest `keep` snapshots (mapped files stay valid until unmapped)"""
+    names = sorted(name for name in os.listdir(directory) if name.startswith('snapshot-') and name.endswith('.idx'))
+    for name in names[:-keep]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError as e:
+            logger.warning(f"Could not remove old snapshot {name}: {e}")
+
+
+def current_snapshot_name(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class SnapshotRows:
+    """Read-only sequence of rows decoded on access from the mapped file"""
+
+    def __init__(self, snapshot: 'IndexSnapshot'):
+        self._snapshot = snapshot
+
+    def __len__(self) -> int:
+        return self._snapshot.count
+
+    def __getitem__(self, position: int) -> Dict[str, Any]:
+        return self._snapshot.row(position)
+
+
+class IndexSnapshot:
+    """A published snapshot, mapped read-only"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an index snapshot")
+        (header_length,) = struct.unpack_from('<Q', self._mmap, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(bytes(self._mmap[start:start + header_length]))
+        if self.header['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {self.header['format_version']}")
+
+        self.version = self.header['version']
+        self.count = self.header['count']
+        self.dimension = self.header['embedding_dimension']
+        self.vectors = np.frombuffer(self._mmap, dtype='<f4', count=self.count * self.dimension,
+                                     offset=self.header['vectors_offset']).reshape(self.count, self.dimension)
+        self._offsets = np.frombuffer(self._mmap, dtype='<i8', count=self.count + 1,
+                                      offset=self.header['offsets_offset'])
+        self.rows = SnapshotRows(self)
+        self._ids: Optional[List[str]] = None
+        self._positions: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def open_current(cls, directory: str) -> Optional['IndexSnapshot']:
+        name = current_snapshot_name(directory)
+        return cls(os.path.join(directory, name)) if name else None
+
+    @property
+    def ids(self) -> List[str]:
+        if self._ids is None:
+            start = self.header['ids_offset']
+            blob = bytes(self._mmap[start:start + self.header['ids_length']])
+            self._ids = blob.decode('utf-8').split('\n') if blob else []
+        return self._ids
+
+    @property
+    def positions(self) -> Dict[str, int]:
+        if self._positions is None:
+            self._positions = {tc_id: position for position, tc_id in enumerate(self.ids)}
+        return self._positions
+
+    @property
+    def synced_at(self) -> float:
+        """Wall-clock time the data was last confirmed against the database"""
+        return self.header['synced_at']
+
+    @property
+    def watermark(self) -> Optional[Tuple[datetime, str]]:
+        watermark = self.header.get('watermark')
+        return (datetime.fromisoformat(watermark[0]), watermark[1]) if watermark else None
+
+    def row(self, position: int) -> Dict[str, Any]:
+        start = self.header['rows_offset'] + int(self._offsets[position])
+        end = self.header['rows_offset'] + int(self._offsets[position + 1])
+        return _decode_row(self._mmap[start:end])
+
+
+class WriterLock:
+    """Non-blocking flock electing the one worker that syncs and publishes"""
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, LOCK_FILE)
+        self._file = None
+
+    def acquire(self) -> bool:
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            # No flock: every worker keeps its own index
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        handle = open(self.path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._file = handle
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
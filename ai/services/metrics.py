@@ -0,0 +1,192 @@
+"""
+Prometheus instrumentation for the AI service.
+Records per-endpoint request counts/latency, per-stage pipeline latency
+histograms (search and generation), Gemini token counters, and exposes
+cache and index gauges collected at scrape time. Stage timings are also
+collected per request when a trace is active, for the Server-Timing header.
+With PROMETHEUS_MULTIPROC_DIR set (several uvicorn workers), counters and
+histograms are written to per-process files there and merged on every scrape.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from prometheus_client import (
+    Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'testcase_ai'
+
+# Buckets tuned for sub-millisecond stages (similarity) up to slow Gemini calls
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+http_requests_total = Counter(
+    f'{PREFIX}_http_requests_total',
+    'Total number of HTTP requests',
+    ['method', 'route', 'status_code']
+)
+
+http_request_errors_total = Counter(
+    f'{PREFIX}_http_request_errors_total',
+    'Total number of HTTP requests that ended in a server error',
+    ['method', 'route']
+)
+
+http_request_duration_seconds = Histogram(
+    f'{PREFIX}_http_request_duration_seconds',
+    'Duration of HTTP requests in seconds',
+    ['method', 'route'],
+    buckets=STAGE_BUCKETS
+)
+
+pipeline_stage_duration_seconds = Histogram(
+    f'{PREFIX}_pipeline_stage_duration_seconds',
+    'Duration of individual pipeline stages in seconds',
+    ['pipeline', 'stage'],
+    buckets=STAGE_BUCKETS
+)
+
+gemini_tokens_total = Counter(
+    f'{PREFIX}_gemini_tokens_total',
+    'Gemini tokens consumed',
+    ['type']
+)
+
+gemini_requests_total = Counter(
+    f'{PREFIX}_gemini_requests_total',
+    'Gemini generation requests',
+    ['status']
+)
+
+
+# Stage timings of the current request, when it asked for them (None otherwise)
+_request_trace: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_trace', default=None)
+
+
+@contextmanager
+def stage_timer(pipeline: str, stage: str):
+    """Context manager timing one pipeline stage, e.g. with stage_timer('search', 'encode'):"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        pipeline_stage_duration_seconds.labels(pipeline, stage).observe(elapsed)
+        trace = _request_trace.get()
+        if trace is not None:
+            trace.append((f'{pipeline}.{stage}', elapsed))
+
+
+def start_request_trace() -> List[Tuple[str, float]]:
+    """Collect the stage timings of the current request (and work it hands to copied contexts)"""
+    trace = []
+    _request_trace.set(trace)
+    return trace
+
+
+def stop_request_trace():
+    _request_trace.set(None)
+
+
+def server_timing_header(trace: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing value with milliseconds per stage (repeated stages summed) and the total"""
+    durations: Dict[str, float] = {}
+    for name, seconds in trace:
+        durations[name] = durations.get(name, 0.0) + seconds
+    entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in durations.items()]
+    entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
+
+
+def observe_request(method: str, route: str, status_code: int, duration: float):
+    """Record one finished HTTP request"""
+    http_requests_total.labels(method, route, str(status_code)).inc()
+    http_request_duration_seconds.labels(method, route).observe(duration)
+    if status_code >= 500:
+        http_request_errors_total.labels(method, route).inc()
+
+
+def record_token_usage(usage: Dict[str, Any]):
+    """Add Gemini usage_metadata counts to the token counters"""
+    for token_type, key in (('prompt', 'prompt_token_count'),
+                            ('candidates', 'candidates_token_count'),
+                            ('total', 'total_token_count')):
+        if usage.get(key):
+            gemini_tokens_total.labels(token_type).inc(usage[key])
+
+
+def multiprocess_dir() -> str:
+    """Directory shared by the workers' metric files ('' outside multiprocess mode)"""
+    return os.getenv('PROMETHEUS_MULTIPROC_DIR', '')
+
+
+def mark_process_dead():
+    """Drop this worker's live-gauge files when it exits (its counters stay in the totals)"""
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class StatsCollector:
+    """Exposes counters that services already track (caches, coalescing, index sizes).
+    They live in the worker that answers the scrape, so in multiprocess mode every
+    family carries a pid label instead of passing one worker's values off as the pod's."""
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def register(self, name: str, source: Callable[[], Dict[str, Any]]):
+        """Register a stats callable; known keys are mapped onto Prometheus families"""
+        self._sources[name] = source
+
+    def collect(self):
+        process = ['pid'] if multiprocess_dir() else []
+        pid = [str(os.getpid())] if process else []
+        cache_lookups = CounterMetricFamily(f'{PREFIX}_cache_lookups', 'Cache lookups by result', labels=['cache', 'result'] + process)
+        cache_ratio = GaugeMetricFamily(f'{PREFIX}_cache_hit_ratio', 'Cache hit ratio', labels=['cache'] + process)
+        coalesced = CounterMetricFamily(f'{PREFIX}_coalesced_calls', 'Calls served by another in-flight execution', labels=['source'] + process)
+        executions = CounterMetricFamily(f'{PREFIX}_coalescing_executions', 'Executions performed by singleflight groups', labels=['source'] + process)
+        index_size = GaugeMetricFamily(f'{PREFIX}_index_size', 'Number of test cases held by in-memory indexes', labels=['index'] + process)
+        index_lag = GaugeMetricFamily(f'{PREFIX}_index_lag_seconds', 'Seconds since an in-memory index last caught up with the database', labels=['index'] + process)
+
+        for name, source in self._sources.items():
+            try:
+                stats = source()
+            except Exception as e:
+                logger.warning(f"Metrics source {name} failed: {e}")
+                continue
+
+            if 'cache_hits' in stats:
+                cache_lookups.add_metric([name, 'hit'] + pid, stats['cache_hits'])
+                cache_lookups.add_metric([name, 'miss'] + pid, stats['cache_misses'])
+                lookups = stats['cache_hits'] + stats['cache_misses']
+                cache_ratio.add_metric([name] + pid, stats['cache_hits'] / lookups if lookups else 0.0)
+            if 'coalesced' in stats:
+                coalesced.add_metric([name] + pid, stats['coalesced'])
+                executions.add_metric([name] + pid, stats['executions'])
+            if 'index_size' in stats:
+                index_size.add_metric([name] + pid, stats['index_size'])
+            if stats.get('lag_seconds') is not None:
+                index_lag.add_metric([name] + pid, stats['lag_seconds'])
+
+        yield from (cache_lookups, cache_ratio, coalesced, executions, index_size, index_lag)
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def render_metrics():
+    """Render the registry in Prometheus text format, merging every worker's files in multiprocess mode"""
+    if not multiprocess_dir():
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(stats_collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
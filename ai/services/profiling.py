@@ -0,0 +1,135 @@
+"""
+Sampled request profiling for offline analysis.
+The profiler is armed at runtime for the next N requests (optionally only a
+sampled fraction of them); each profiled request runs under cProfile and
+its stats are written to PROFILE_DIR as a .prof file, readable with
+`python -m pstats` or snakeviz. Idle cost is one lock-free check per request.
+"""
+
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def debug_enabled() -> bool:
+    """Per-request timings and the profiling endpoints are opt-in"""
+    return os.getenv('REQUEST_DEBUG_ENABLED', 'false').lower() == 'true'
+
+
+class RequestProfiler:
+    """Profiles the next N (sampled) requests, one at a time"""
+
+    def __init__(self, output_dir: str = None):
+        self.output_dir = output_dir or os.getenv(
+            'PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'testcase-ai-profiles'))
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._sample_rate = 1.0
+        # cProfile hooks one thread and the profiler is not reentrant: requests
+        # arriving while one is being profiled are skipped, not queued
+        self._busy = False
+        self._files: List[str] = []
+        self._stats = {'profiled': 0, 'skipped_busy': 0}
+
+    def arm(self, requests: int, sample_rate: float = 1.0) -> Dict[str, Any]:
+        """Profile up to `requests` of the following requests, each with probability sample_rate"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            self._remaining = requests
+            self._sample_rate = sample_rate
+        logger.info(f"Profiling armed for {requests} requests (sample rate {sample_rate})")
+        return self.get_status()
+
+    def disarm(self) -> Dict[str, Any]:
+        with self._lock:
+            self._remaining = 0
+        return self.get_status()
+
+    def start(self) -> Optional[cProfile.Profile]:
+        """Profile the calling thread if this request is sampled; pass the result to finish()"""
+        if self._remaining <= 0:
+            return None
+        with self._lock:
+            if self._remaining <= 0 or random.random() >= self._sample_rate:
+                return None
+            if self._busy:
+                self._stats['skipped_busy'] += 1
+                return None
+            self._remaining -= 1
+            self._busy = True
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def finish(self, profiler: Optional[cProfile.Profile], label: str):
+        """Stop profiling and write the stats to PROFILE_DIR"""
+        if profiler is None:
+            return
+        profiler.disable()
+        safe_label = re.sub(r'[^A-Za-z0-9-]+', '_', label).strip('_') or 'request'
+        path = os.path.join(self.output_dir, f"{safe_label}-{os.getpid()}-{time.time_ns()}.prof")
+        try:
+            profiler.dump_stats(path)
+        except OSError as e:
+            logger.warning(f"Failed to write profile {path}: {e}")
+            path = None
+        with self._lock:
+            self._busy = False
+            if path:
+                self._stats['profiled'] += 1
+                self._files = (self._files + [path])[-20:]
+        if path:
+            logger.info(f"Wrote profile {path}")
+
+    @contextmanager
+    def profile(self, label: str):
+        profiler = self.start()
+        try:
+            yield
+        finally:
+            self.finish(profiler, label)
+
+    def profiled(self, label: str):
+        """Decorator profiling a (sync or async) handler when the request is sampled.
+        Sync FastAPI handlers run in the threadpool, so the profile covers exactly the
+        handler's thread; for async handlers it covers the event loop while awaited."""
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.profile(label):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.profile(label):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'remaining': self._remaining,
+                'sample_rate': self._sample_rate,
+                'output_dir': self.output_dir,
+                'recent_files': list(self._files),
+                **self._stats,
+            }
+
+
+# Shared by every request of this process
+request_profiler = RequestProfiler()
@@ -0,0 +1,178 @@
+"""
+Second-stage re-ranking for semantic search and RAG retrieval.
+Rescores the top N bi-encoder candidates with a small local cross-encoder,
+caching per-(query, doc) scores and skipping the stage when the expected
+cost exceeds the latency budget.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker(ABC):
+    """Interface for second-stage rerankers"""
+
+    name = "base"
+
+    @abstractmethod
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        """Return one relevance score in [0, 1] per document"""
+
+
+class CrossEncoderReranker(Reranker):
+    """Local sentence-transformers cross-encoder (loaded lazily on first use)"""
+
+    name = "cross-encoder"
+
+    def __init__(self, model_name: str = None):
+        self.model_name = model_name or os.getenv('RERANKER_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name)
+                    logger.info(f"Cross-encoder reranker initialized: {self.model_name}")
+        return self._model
+
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        logits = self.model.predict([(query, document) for document in documents])
+        # ms-marco cross-encoders return raw logits; squash them into [0, 1]
+        return [1.0 / (1.0 + math.exp(-float(logit))) for logit in logits]
+
+
+RERANKER_BACKENDS = {
+    CrossEncoderReranker.name: CrossEncoderReranker,
+}
+
+
+class RerankerService:
+    """Applies a reranker to search candidates with caching and a latency budget"""
+
+    def __init__(self):
+        self.enabled = os.getenv('RERANKER_ENABLED', 'false').lower() == 'true'
+        self.top_n = int(os.getenv('RERANK_TOP_N', '20'))
+        # Candidates are retrieved this far below the requested similarity threshold
+        self.similarity_margin = float(os.getenv('RERANK_SIMILARITY_MARGIN', '0.15'))
+        self.min_score = float(os.getenv('RERANK_MIN_SCORE', '0.5'))
+        self.budget_ms = float(os.getenv('RERANK_BUDGET_MS', '150'))
+        self.cache_size = int(os.getenv('RERANK_CACHE_SIZE', '10000'))
+
+        backend = os.getenv('RERANKER_BACKEND', CrossEncoderReranker.name)
+        self.reranker: Reranker = RERANKER_BACKENDS[backend]()
+
+        self._cache: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Exponentially weighted cost of scoring one (query, doc) pair
+        self._pair_cost_ms: Optional[float] = None
+        self._stats = {
+            'requests': 0,
+            'reranked': 0,
+            'skipped_budget': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'total_added_latency_ms': 0.0,
+            'last_added_latency_ms': 0.0,
+        }
+
+    def set_reranker(self, reranker: Reranker):
+        """Plug in a different reranker implementation"""
+        with self._lock:
+            self.reranker = reranker
+            self._cache.clear()
+            self._pair_cost_ms = None
+
+    def candidate_window(self, min_similarity: float, limit: int) -> Tuple[float, int]:
+        """Looser bi-encoder threshold and larger limit used to gather rerank candidates"""
+        return max(0.0, min_similarity - self.similarity_margin), max(limit, self.top_n)
+
+    @staticmethod
+    def _document_text(test_case: Dict[str, Any]) -> str:
+        tags = test_case.get('tags') or []
+        return f"{test_case.get('name', '')}. {test_case.get('description', '')} {' '.join(tags)}".strip()
+
+    @staticmethod
+    def _cache_key(query: str, test_case: Dict[str, Any]) -> Tuple[str, str, str]:
+        return (query, test_case['id'], str(test_case.get('updatedAt')))
+
+    def rerank(self, query: str, candidates: List[Any]) -> Optional[List[Tuple[Any, float]]]:
+        """
+        Rescore the top N candidates (objects with .similarity and .testCase).
+        Returns (candidate, score) pairs sorted by score, or None when reranking was skipped.
+        """
+        started = time.perf_counter()
+        candidates = sorted(candidates, key=lambda c: c.similarity, reverse=True)[:self.top_n]
+
+        with self._lock:
+            self._stats['requests'] += 1
+            scores = {}
+            missing = []
+            for index, candidate in enumerate(candidates):
+                key = self._cache_key(query, candidate.testCase)
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[index] = self._cache[key]
+                else:
+                    missing.append(index)
+            self._stats['cache_hits'] += len(candidates) - len(missing)
+            self._stats['cache_misses'] += len(missing)
+
+            expected_ms = len(missing) * self._pair_cost_ms if self._pair_cost_ms is not None else 0.0
+            if expected_ms > self.budget_ms:
+                self._stats['skipped_budget'] += 1
+                logger.info(f"Skipping rerank: expected {expected_ms:.1f}ms exceeds budget {self.budget_ms:.0f}ms")
+                return None
+            reranker = self.reranker
+
+        if missing:
+            scoring_started = time.perf_counter()
+            fresh = reranker.score(query, [self._document_text(candidates[i].testCase) for i in missing])
+            pair_cost_ms = (time.perf_counter() - scoring_started) * 1000 / len(missing)
+
+            with self._lock:
+                self._pair_cost_ms = pair_cost_ms if self._pair_cost_ms is None else 0.8 * self._pair_cost_ms + 0.2 * pair_cost_ms
+                for index, score in zip(missing, fresh):
+                    scores[index] = score
+                    self._cache[self._cache_key(query, candidates[index].testCase)] = score
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        ranked = sorted(((candidates[i], scores[i]) for i in range(len(candidates))), key=lambda pair: pair[1], reverse=True)
+
+        added_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats['reranked'] += 1
+            self._stats['total_added_latency_ms'] += added_ms
+            self._stats['last_added_latency_ms'] = added_ms
+        logger.info(f"Reranked {len(candidates)} candidates ({len(missing)} uncached) in {added_ms:.1f}ms")
+
+        return ranked
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Reranker counters, cache hit ratio and added latency"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['cache_hits'] + stats['cache_misses']
+            stats['enabled'] = self.enabled
+            stats['backend'] = self.reranker.name
+            stats['cache_entries'] = len(self._cache)
+            stats['cache_hit_ratio'] = stats['cache_hits'] / lookups if lookups else 0.0
+            stats['avg_added_latency_ms'] = stats['total_added_latency_ms'] / stats['reranked'] if stats['reranked'] else 0.0
+            stats['pair_cost_ms'] = self._pair_cost_ms
+            return stats
+
+
+# Global reranker service instance
+reranker_service = RerankerService()
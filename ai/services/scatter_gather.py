@@ -0,0 +1,146 @@
+"""
+Cross-replica scatter-gather search for partitioned deployments.
+With PARTITION_COUNT > 1 every replica indexes only the test case ids that
+hash to its PARTITION_INDEX. Any replica can coordinate a search: it encodes
+the query once, fans it out to every partition listed in PARTITION_PEERS
+(answering its own partition locally), merges the per-partition top-k and
+returns whatever arrived before SCATTER_DEADLINE_MS.
+"""
+
+import logging
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Callable, Optional
+
+import httpx
+
+from models import SearchResult
+
+logger = logging.getLogger(__name__)
+
+
+def partition_of(tc_id: str, partition_count: int) -> int:
+    """Stable hash partition of a test case id (Python's hash() is salted per process)"""
+    return zlib.crc32(tc_id.encode('utf-8')) % partition_count
+
+
+class ScatterGather:
+    """Fans searches out to every partition and merges the results under a deadline"""
+
+    def __init__(self):
+        self.partition_count = int(os.getenv('PARTITION_COUNT', '1'))
+        self.partition_index = int(os.getenv('PARTITION_INDEX', '0'))
+        # Base URL of every partition, in partition order (this replica's own entry is not called)
+        self.peers = [peer.strip().rstrip('/') for peer in os.getenv('PARTITION_PEERS', '').split(',') if peer.strip()]
+        self.deadline = float(os.getenv('SCATTER_DEADLINE_MS', '300')) / 1000
+
+        if not 0 <= self.partition_index < self.partition_count:
+            raise ValueError(f"PARTITION_INDEX must be in [0, {self.partition_count}), got {self.partition_index}")
+        if self.peers and len(self.peers) != self.partition_count:
+            raise ValueError(f"PARTITION_PEERS lists {len(self.peers)} URLs for {self.partition_count} partitions")
+
+        # Without peers a partitioned replica only answers /partition/search
+        self.enabled = self.partition_count > 1 and bool(self.peers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._client: Optional[httpx.Client] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'searches': 0,
+            'partial_results': 0,
+            'partition_timeouts': 0,
+            'partition_errors': 0,
+        }
+        self._last_latency_ms: Dict[int, float] = {}
+
+    def owns(self, tc_id: str) -> bool:
+        """Whether this replica's partition holds the test case"""
+        return self.partition_count == 1 or partition_of(tc_id, self.partition_count) == self.partition_index
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _record_latency(self, partition: int, started: float):
+        with self._lock:
+            self._last_latency_ms[partition] = (time.perf_counter() - started) * 1000
+
+    def _remote_search(self, partition: int, payload: Dict[str, Any]) -> List[SearchResult]:
+        started = time.perf_counter()
+        response = self._client.post(f"{self.peers[partition]}/partition/search", json=payload)
+        response.raise_for_status()
+        self._record_latency(partition, started)
+        return [SearchResult(**result) for result in response.json()]
+
+    def _local_search(self, partition: int, local_search: Callable, *args) -> List[SearchResult]:
+        started = time.perf_counter()
+        results = local_search(*args)
+        self._record_latency(partition, started)
+        return results
+
+    def search(self, query: str, query_embedding: List[float], min_similarity: float, limit: int,
+               local_search: Callable[..., List[SearchResult]]) -> List[SearchResult]:
+        """Top `limit` results across all partitions that answered before the deadline"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._client = httpx.Client(timeout=self.deadline)
+                    self._executor = ThreadPoolExecutor(max_workers=4 * self.partition_count,
+                                                        thread_name_prefix='scatter')
+
+        payload = {
+            'query': query,
+            'min_similarity': min_similarity,
+            'limit': limit,
+            'query_embedding': query_embedding,
+        }
+        futures = {}
+        for partition in range(self.partition_count):
+            if partition == self.partition_index:
+                future = self._executor.submit(self._local_search, partition, local_search,
+                                               query, min_similarity, limit, query_embedding)
+            else:
+                future = self._executor.submit(self._remote_search, partition, payload)
+            futures[future] = partition
+
+        done, pending = wait(futures, timeout=self.deadline)
+        self._count('searches')
+
+        results: List[SearchResult] = []
+        answered = 0
+        for future in done:
+            try:
+                results.extend(future.result())
+                answered += 1
+            except Exception as e:
+                self._count('partition_errors')
+                logger.warning(f"Partition {futures[future]} search failed: {e}")
+        for future in pending:
+            future.cancel()
+            self._count('partition_timeouts')
+            logger.warning(f"Partition {futures[future]} missed the {self.deadline * 1000:.0f}ms search deadline")
+
+        if answered == 0:
+            raise RuntimeError('No partition answered before the search deadline')
+        if answered < self.partition_count:
+            self._count('partial_results')
+
+        results.sort(key=lambda result: result.similarity, reverse=True)
+        return results[:limit]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'partition_count': self.partition_count,
+                'partition_index': self.partition_index,
+                'deadline_ms': self.deadline * 1000,
+                **self._stats,
+                'last_latency_ms': {str(partition): round(ms, 2) for partition, ms in self._last_latency_ms.items()},
+            }
+
+
+# Global scatter-gather coordinator instance
+scatter_gather = ScatterGather()
@@ -0,0 +1,108 @@
+"""
+Fast JSON response path for search results.
+Search hits come from the resident index and are trusted, so they are built
+with model_construct (no per-item validation) and rendered straight to bytes:
+each test case's JSON is serialized once and cached by (id, updatedAt), and
+the response body is assembled from those fragments with orjson (stdlib json
+when orjson is not installed) instead of FastAPI re-validating and encoding
+every result against the response_model.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Callable
+
+from fastapi import Response
+
+from models import SearchResult
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _default(value):
+    """Encode values neither encoder handles natively (numpy scalars, datetimes with the stdlib)"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class RowFragmentCache:
+    """LRU cache of formatted test case payloads and their serialized JSON, keyed by (id, updatedAt)"""
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or int(os.getenv('ROW_FRAGMENT_CACHE_SIZE', '20000'))
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, row: Dict[str, Any], format_row: Callable[[Dict[str, Any]], Dict[str, Any]]) -> tuple:
+        """(format_row(row), its JSON bytes), reused while the row's updatedAt is unchanged"""
+        key = (row['id'], row.get('updatedAt'))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+            self._misses += 1
+
+        payload = format_row(row)
+        entry = (payload, dumps(payload))
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'cache_hits': self._hits,
+                'cache_misses': self._misses,
+                'encoder': 'orjson' if orjson is not None else 'json',
+            }
+
+
+def trusted_search_result(similarity: float, payload: Dict[str, Any], fragment: bytes = None) -> SearchResult:
+    """SearchResult for index data without validation, carrying its pre-serialized testCase"""
+    result = SearchResult.model_construct(similarity=similarity, testCase=payload, rerankScore=None)
+    result._fragment = fragment
+    return result
+
+
+def render_search_results(results: List[SearchResult]) -> bytes:
+    """JSON array of results, using cached testCase fragments where available"""
+    parts = []
+    for result in results:
+        fragment = result._fragment or dumps(result.testCase)
+        parts.append(b'{"similarity":%s,"testCase":%s,"rerankScore":%s}' % (
+            dumps(result.similarity), fragment, dumps(result.rerankScore)))
+    return b'[' + b','.join(parts) + b']'
+
+
+def search_response(results: List[SearchResult]) -> Response:
+    return Response(content=render_search_results(results), media_type='application/json')
+
+
+# Shared by every search
+row_fragments = RowFragmentCache()
@@ -0,0 +1,122 @@
+"""
+Shared fixtures for the AI service tests.
+The services package loads its sentence encoder when imported, so a stub
+encoder replaces SentenceTransformer before any test module imports it, and
+FakeDatabase answers the MySQL queries the index and clustering engine make.
+"""
+
+import importlib
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pytest
+import sentence_transformers
+
+
+class StubEncoder:
+    """Deterministic per-text unit vectors instead of a downloaded model"""
+
+    def __init__(self, model_name=None, dimension=384):
+        self.model_name = model_name
+        self.dimension = dimension
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.random.default_rng(zlib.crc32(text.encode('utf-8'))).normal(size=self.dimension)
+        return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+    def encode(self, texts):
+        if isinstance(texts, str):
+            return self._vector(texts)
+        return np.stack([self._vector(text) for text in texts])
+
+
+sentence_transformers.SentenceTransformer = StubEncoder
+
+# services/__init__ re-exports instances under their module names (e.g. embedding_index)
+embedding_index_module = importlib.import_module('services.embedding_index')
+clustering_module = importlib.import_module('services.clustering')
+
+
+class FakeDatabase:
+    """In-memory testcases table answering the queries of services.database.db"""
+
+    def __init__(self):
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self._clock = datetime(2026, 1, 1)
+
+    def put(self, tc_id: str, embedding: Optional[List[float]], updated_at: datetime = None, **fields):
+        """Insert or update a row; updatedAt advances one second per write unless given"""
+        if updated_at is None:
+            self._clock += timedelta(seconds=1)
+            updated_at = self._clock
+        self.rows[tc_id] = {
+            'id': tc_id,
+            'name': fields.get('name', f'case {tc_id}'),
+            'description': fields.get('description', 'd'),
+            'type': 'positive',
+            'priority': 'medium',
+            'steps': '[]',
+            'expectedResult': '',
+            'tags': json.dumps(fields.get('tags', [])),
+            'embedding': json.dumps([float(x) for x in embedding]) if embedding is not None else None,
+            'createdAt': self.rows[tc_id]['createdAt'] if tc_id in self.rows else updated_at,
+            'updatedAt': updated_at,
+        }
+
+    def delete(self, tc_id: str):
+        del self.rows[tc_id]
+
+    def _embedded(self) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.rows.values() if row['embedding']]
+
+    def get_test_cases_for_embedding(self, chunk_size: int = 1000):
+        yield from self._embedded()
+
+    def get_test_cases_changed_since(self, updated_at, last_id: str, limit: int) -> List[Dict[str, Any]]:
+        changed = [dict(row) for row in self.rows.values() if (row['updatedAt'], row['id']) > (updated_at, last_id)]
+        return sorted(changed, key=lambda row: (row['updatedAt'], row['id']))[:limit]
+
+    def get_embedded_test_case_ids(self) -> List[str]:
+        return [row['id'] for row in self._embedded()]
+
+    def get_embedded_test_case_count(self) -> int:
+        return len(self._embedded())
+
+    def get_test_case_count(self) -> int:
+        return len(self.rows)
+
+    def get_embedding_versions(self) -> List[Dict[str, Any]]:
+        return [{'id': row['id'], 'updatedAt': row['updatedAt']} for row in self._embedded()]
+
+
+def random_vectors(n: int, dimension: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, dimension)).astype(np.float32)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(embedding_index_module, 'db', database)
+    monkeypatch.setattr(clustering_module, 'db', database)
+    return database
+
+
+@pytest.fixture
+def make_index(fake_db, monkeypatch):
+    """Factory for an EmbeddingIndex over fake_db; keyword arguments become environment variables"""
+    indexes = []
+
+    def make(**env):
+        monkeypatch.setenv('EMBEDDING_DIMENSION', '8')
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        index = embedding_index_module.EmbeddingIndex()
+        indexes.append(index)
+        return index
+
+    yield make
+    for index in indexes:
+        index.stop()
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from services.clustering import ClusteringEngine
+from tests.conftest import clustering_module
+
+
+def blob_vectors(n, centers, seed=0):
+    """n vectors around the given centers (row i belongs to center i % len(centers))"""
+    rng = np.random.default_rng(seed)
+    return np.stack([centers[i % len(centers)] + 0.05 * rng.normal(size=centers.shape[1]) for i in range(n)])
+
+
+@pytest.fixture
+def engine(fake_db, make_index, monkeypatch):
+    index = make_index(INDEX_DELETION_CHECK_SECONDS=0)
+    monkeypatch.setattr(clustering_module, 'embedding_index', index)
+    monkeypatch.setenv('CLUSTER_COUNT', '4')
+    monkeypatch.setenv('CLUSTER_BATCH_SIZE', '32')
+    return ClusteringEngine(), index
+
+
+def test_k_means_separates_feature_areas(fake_db, engine):
+    engine, index = engine
+    centers = np.eye(8)[:4]
+    for i, vector in enumerate(blob_vectors(80, centers)):
+        fake_db.put(f'tc{i:02d}', vector, tags=[f'area{i % 4}', 'smoke'] if i < 4 else [f'area{i % 4}'])
+    index.sync()
+
+    summaries = engine.get_cluster_summaries()
+    assert [summary['size'] for summary in summaries] == [20, 20, 20, 20]
+    assert sum(summary['share'] for summary in summaries) == pytest.approx(100)
+    for summary in summaries:
+        area = next(iter(summary['tag_histogram']))
+        assert summary['tag_histogram'][area] == 20
+        assert all(int(tc['id'][2:]) % 4 == int(area[4:]) for tc in summary['nearest_test_cases'])
+        assert len(summary['nearest_test_cases']) == 3
+        assert summary['nearest_test_cases'][0]['similarity'] > 0.99
+    assert engine.get_index_size() == 80
+    # Vectors are read from the index, not kept again
+    assert not hasattr(engine, '_vectors')
+
+
+def test_assignments_follow_changes(fake_db, engine):
+    engine, index = engine
+    centers = np.eye(8)[:4]
+    for i, vector in enumerate(blob_vectors(40, centers)):
+        fake_db.put(f'tc{i:02d}', vector, tags=[f'area{i % 4}'])
+    index.sync()
+    engine.refresh(force=True)
+    labels = dict(engine._labels)
+
+    # New rows join the cluster of their area, edited ones move, deleted ones leave
+    for i, vector in enumerate(blob_vectors(8, centers[:1], seed=1)):
+        fake_db.put(f'new{i}', vector, tags=['area0'])
+    fake_db.put('tc01', blob_vectors(1, centers[2:3], seed=2)[0], tags=['area2'])
+    fake_db.delete('tc03')
+    index.sync()
+    engine.refresh(force=True)
+
+    assert engine.get_index_size() == 47
+    assert 'tc03' not in engine._labels
+    assert {engine._labels[f'new{i}'] for i in range(8)} == {labels['tc00']}
+    assert engine._labels['tc01'] == labels['tc02']
+    assert [summary['size'] for summary in engine.get_cluster_summaries()] == [18, 11, 9, 9]
+
+
+def test_rows_not_indexed_yet_are_picked_up_later(fake_db, engine):
+    engine, index = engine
+    for i, vector in enumerate(blob_vectors(20, np.eye(8)[:4])):
+        fake_db.put(f'tc{i:02d}', vector)
+    index.sync()
+    engine.refresh(force=True)
+
+    # The database already has the row, the index catches up on its next sync
+    fake_db.put('late', np.eye(8)[0])
+    engine.refresh(force=True)
+    assert 'late' not in engine._labels
+    index.sync()
+    engine.refresh(force=True)
+    assert engine._labels['late'] == engine._labels['tc00']
@@ -0,0 +1,78 @@
+import json
+from datetime import timedelta
+
+import numpy as np
+
+from tests.conftest import random_vectors
+
+
+def brute_force(fake_db, query, k):
+    """Exact top-k ids by cosine similarity over the fake table"""
+    ids = [tc_id for tc_id, row in fake_db.rows.items() if row['embedding']]
+    vectors = np.array([json.loads(fake_db.rows[tc_id]['embedding']) for tc_id in ids])
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = vectors @ (query / np.linalg.norm(query))
+    return [ids[i] for i in np.argsort(-scores)[:k]]
+
+
+def searched_ids(index, query, k):
+    return [row['id'] for _, row in index.search(query, k)]
+
+
+def test_sync_follows_the_watermark(fake_db, make_index):
+    vectors = random_vectors(30, 8)
+    for i, vector in enumerate(vectors[:20]):
+        fake_db.put(f'tc{i:02d}', vector)
+    index = make_index(INDEX_SYNC_BATCH_SIZE=7)
+    index.sync()
+    assert index.get_index_size() == 20
+    assert index.get_stats()['watermark'] == fake_db.rows['tc19']['updatedAt'].isoformat()
+
+    query = vectors[25]
+    assert searched_ids(index, query, 5) == brute_force(fake_db, query, 5)
+
+    # New rows, an edited embedding and a cleared one
+    for i, vector in enumerate(vectors[20:25], start=20):
+        fake_db.put(f'tc{i:02d}', vector)
+    fake_db.put('tc03', vectors[29])
+    fake_db.put('tc04', None)
+    upserts = index.get_stats()['upserts']
+    index.sync()
+
+    assert index.get_index_size() == 24
+    # Unchanged rows re-read within the watermark overlap are skipped
+    assert index.get_stats()['upserts'] == upserts + 6
+    assert searched_ids(index, query, 10) == brute_force(fake_db, query, 10)
+    assert searched_ids(index, vectors[29], 1) == ['tc03']
+
+    # Committed late with an updatedAt just behind the watermark: re-read by the overlap
+    fake_db.put('late', vectors[26], updated_at=fake_db.rows['tc04']['updatedAt'] - timedelta(seconds=1))
+    index.sync()
+    assert searched_ids(index, vectors[26], 1) == ['late']
+    assert index.get_index_size() == 25
+
+
+def test_deleted_rows_are_detected(fake_db, make_index):
+    for i, vector in enumerate(random_vectors(10, 8)):
+        fake_db.put(f'tc{i}', vector)
+    index = make_index(INDEX_DELETION_CHECK_SECONDS=3600)
+    index.sync()
+
+    # The row count shows the gap
+    fake_db.delete('tc1')
+    index.sync()
+    assert index.get_index_size() == 9
+    assert 'tc1' not in searched_ids(index, random_vectors(1, 8, seed=1)[0], 10)
+
+    # A delete and a counted row the index skips (another model's dimension) keep
+    # the counts equal: only the periodic id diff finds it
+    fake_db.delete('tc2')
+    fake_db.put('other-model', [1.0, 0.0])
+    index.sync()
+    assert index.get_index_size() == 9
+    index.deletion_check_interval = 0
+    index.sync()
+    assert index.get_index_size() == 8
+    assert index.get_stats()['deletions'] == 2
+    live = sorted(tc_id for tc_id in fake_db.rows if tc_id != 'other-model')
+    assert sorted(searched_ids(index, random_vectors(1, 8, seed=1)[0], 20)) == live
@@ -0,0 +1,89 @@
+import os
+from datetime import datetime
+
+import numpy as np
+
+from services.index_snapshot import IndexSnapshot, WriterLock, write_snapshot, prune_snapshots, current_snapshot_name
+from tests.conftest import random_vectors
+
+
+def test_snapshot_round_trip(tmp_path):
+    vectors = random_vectors(5, 8)
+    ids = [f'tc{i}' for i in range(5)]
+    rows = [{'id': tc_id, 'name': f'name {i} ü', 'tags': '["auth"]',
+             'createdAt': datetime(2026, 1, 1), 'updatedAt': datetime(2026, 1, 2, 3, 4, 5, 678000)}
+            for i, tc_id in enumerate(ids)]
+    name = write_snapshot(str(tmp_path), 7, ids, vectors, rows, {
+        'model_name': 'model', 'embedding_dimension': 8,
+        'watermark': ['2026-01-02T03:04:05', 'tc4'], 'synced_at': 123.5, 'partition': [0, 1],
+    })
+
+    assert current_snapshot_name(str(tmp_path)) == name
+    snapshot = IndexSnapshot.open_current(str(tmp_path))
+    assert (snapshot.version, snapshot.count, snapshot.dimension) == (7, 5, 8)
+    np.testing.assert_array_equal(snapshot.vectors, vectors)
+    assert snapshot.ids == ids
+    assert snapshot.positions == {tc_id: i for i, tc_id in enumerate(ids)}
+    assert [snapshot.rows[i] for i in range(5)] == rows
+    assert snapshot.watermark == (datetime(2026, 1, 2, 3, 4, 5), 'tc4')
+    assert (snapshot.synced_at, snapshot.header['model_name']) == (123.5, 'model')
+    # Vectors start on an aligned offset and are served from the mapping, not copied
+    assert snapshot.header['vectors_offset'] % 64 == 0
+    assert not snapshot.vectors.flags.writeable
+
+    empty = write_snapshot(str(tmp_path), 8, [], np.zeros((0, 8), dtype=np.float32), [], {'embedding_dimension': 8})
+    snapshot = IndexSnapshot.open_current(str(tmp_path))
+    assert (snapshot.name, snapshot.count, snapshot.ids, snapshot.vectors.shape) == (empty, 0, [], (0, 8))
+
+    for version in range(9, 12):
+        write_snapshot(str(tmp_path), version, ids, vectors, rows, {'embedding_dimension': 8})
+    prune_snapshots(str(tmp_path), 2)
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.idx')) == [
+        'snapshot-0000000010.idx', 'snapshot-0000000011.idx']
+
+
+def test_writer_lock_elects_one_holder(tmp_path):
+    first, second = WriterLock(str(tmp_path)), WriterLock(str(tmp_path))
+    assert first.acquire()
+    # Re-acquiring is a no-op for the holder; others are refused without blocking
+    assert first.acquire()
+    assert not second.acquire()
+
+    first.release()
+    assert second.acquire()
+    assert not first.acquire()
+    second.release()
+
+
+def test_readers_serve_the_writers_snapshot(fake_db, make_index, tmp_path):
+    vectors = random_vectors(40, 8)
+    for i, vector in enumerate(vectors[:30]):
+        fake_db.put(f'tc{i:02d}', vector)
+    env = {'INDEX_SNAPSHOT_DIR': str(tmp_path), 'INDEX_SNAPSHOT_INTERVAL_SECONDS': 0}
+    writer, reader = make_index(**env), make_index(**env)
+
+    assert writer._writer_lock.acquire()
+    writer._become_writer()
+    assert not reader._writer_lock.acquire()
+    reader._role = 'reader'
+    writer._tick()
+    reader._tick()
+
+    query = vectors[35]
+    expected = [(score, row['id']) for score, row in writer.search(query, 5)]
+    assert [(score, row['id']) for score, row in reader.search(query, 5)] == expected
+    assert reader.get_stats()['role'] == 'reader' and reader.get_stats()['snapshot_version'] == 1
+
+    # Newer snapshots are swapped in on the next tick
+    fake_db.put('new', query)
+    writer._tick()
+    reader._tick()
+    assert next(iter(reader.search(query, 1)))[1]['id'] == 'new'
+    assert reader.get_stats()['snapshot_swaps'] == 2
+
+    # When the writer goes away a reader takes over from the latest snapshot
+    writer.stop()
+    reader._tick()
+    assert reader.get_stats()['role'] == 'writer'
+    assert reader.get_index_size() == 31
+    assert next(iter(reader.search(query, 1)))[1]['id'] == 'new'
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+from services import metrics
+
+# A uvicorn worker in miniature: load the metrics module (the services package would
+# load the model) in multiprocess mode and record one request
+WORKER = """
+import importlib.util
+spec = importlib.util.spec_from_file_location('worker_metrics', 'services/metrics.py')
+worker_metrics = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(worker_metrics)
+worker_metrics.observe_request('GET', '/search', 200, 0.003)
+worker_metrics.mark_process_dead()
+"""
+
+
+def test_multiprocess_scrape_merges_every_worker(tmp_path, monkeypatch):
+    ai_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', WORKER], cwd=ai_dir, check=True,
+                       env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': str(tmp_path)})
+    assert len(list(tmp_path.iterdir())) == 4
+
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    monkeypatch.setattr(metrics.stats_collector, '_sources', {'search': lambda: {'index_size': 7}})
+    body, _ = metrics.render_metrics()
+    text = body.decode()
+
+    # Counters and histograms are summed over both workers' files, exited ones included
+    assert 'testcase_ai_http_requests_total{method="GET",route="/search",status_code="200"} 2.0' in text
+    assert 'testcase_ai_http_request_duration_seconds_count{method="GET",route="/search"} 2.0' in text
+    # Scrape-time gauges only know the answering worker and say which one it is
+    assert f'testcase_ai_index_size{{index="search",pid="{os.getpid()}"}} 7.0' in text
+
+    monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR')
+    body, _ = metrics.render_metrics()
+    assert 'testcase_ai_index_size{index="search"} 7.0' in body.decode()
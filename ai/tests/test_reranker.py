@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytest
+
+from models import SearchResult
+from services.reranker import Reranker, RerankerService
+
+
+class CountingReranker(Reranker):
+    """Scores documents by their length and records what it was asked to score"""
+
+    name = "counting"
+
+    def __init__(self):
+        self.scored = []
+
+    def score(self, query, documents):
+        self.scored.extend(documents)
+        return [1.0 / len(document) for document in documents]
+
+
+def candidate(tc_id, similarity, name=None, updated_at=datetime(2026, 1, 1)):
+    return SearchResult(similarity=similarity, testCase={
+        'id': tc_id, 'name': name or tc_id, 'description': 'd', 'tags': [], 'updatedAt': updated_at})
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv('RERANK_TOP_N', '3')
+    monkeypatch.setenv('RERANK_CACHE_SIZE', '4')
+    monkeypatch.setenv('RERANK_BUDGET_MS', '150')
+    service = RerankerService()
+    service.set_reranker(CountingReranker())
+    return service
+
+
+def test_scores_are_cached_per_query_and_version(service):
+    candidates = [candidate('a', 0.9, 'aaaa'), candidate('b', 0.8, 'bb'), candidate('c', 0.7, 'cccccc'),
+                  candidate('d', 0.1)]
+    ranked = service.rerank('login', candidates)
+
+    # Only the top N by similarity are rescored, then ordered by the reranker's score
+    assert [c.testCase['id'] for c, _ in ranked] == ['b', 'a', 'c']
+    assert len(service.reranker.scored) == 3
+
+    service.rerank('login', candidates)
+    assert len(service.reranker.scored) == 3
+    # An edited test case and another query miss the cache
+    service.rerank('login', [candidate('a', 0.9, 'aaaa', updated_at=datetime(2026, 2, 1))])
+    service.rerank('logout', [candidate('a', 0.9, 'aaaa')])
+    assert len(service.reranker.scored) == 5
+
+    stats = service.get_stats()
+    assert (stats['cache_hits'], stats['cache_misses'], stats['cache_entries']) == (3, 5, 4)
+
+
+def test_cache_evicts_the_least_recently_used_pair(service):
+    service.rerank('q', [candidate('a', 0.9), candidate('b', 0.8), candidate('c', 0.7)])
+    service.rerank('q', [candidate('d', 0.9)])
+    # Touch 'a', then a fifth pair pushes out the least recently used one ('b')
+    service.rerank('q', [candidate('a', 0.9)])
+    service.rerank('q', [candidate('e', 0.9)])
+    scored = len(service.reranker.scored)
+
+    service.rerank('q', [candidate('a', 0.9), candidate('c', 0.8), candidate('d', 0.7)])
+    assert len(service.reranker.scored) == scored
+    service.rerank('q', [candidate('b', 0.9)])
+    assert len(service.reranker.scored) == scored + 1
+
+
+def test_rerank_is_skipped_when_uncached_pairs_exceed_the_budget(service):
+    service._pair_cost_ms = 100.0
+    # One uncached pair (100ms) fits the 150ms budget; the cost estimate then decays
+    # towards the much cheaper measured cost (EWMA with weight 0.2)
+    assert service.rerank('q', [candidate('a', 0.9)]) is not None
+    assert 80.0 <= service.get_stats()['pair_cost_ms'] < 81.0
+
+    # Two uncached pairs (~160ms) do not; cached pairs cost nothing
+    assert service.rerank('q', [candidate('a', 0.9), candidate('b', 0.8), candidate('c', 0.7)]) is None
+    assert service.rerank('q', [candidate('a', 0.9), candidate('b', 0.8)]) is not None
+    stats = service.get_stats()
+    assert (stats['requests'], stats['reranked'], stats['skipped_budget']) == (3, 2, 1)
+    assert service.reranker.scored == ['a. d', 'b. d']
@@ -0,0 +1,105 @@
+import threading
+import zlib
+
+import pytest
+
+from models import SearchResult
+from services.scatter_gather import ScatterGather, partition_of
+from tests.conftest import embedding_index_module, random_vectors
+
+
+def make_coordinator(monkeypatch, partition_count=3, partition_index=0, deadline_ms=200):
+    monkeypatch.setenv('PARTITION_COUNT', str(partition_count))
+    monkeypatch.setenv('PARTITION_INDEX', str(partition_index))
+    monkeypatch.setenv('PARTITION_PEERS', ','.join(f'http://partition-{i}:8000' for i in range(partition_count)))
+    monkeypatch.setenv('SCATTER_DEADLINE_MS', str(deadline_ms))
+    return ScatterGather()
+
+
+def results(partition, similarities):
+    return [SearchResult(similarity=s, testCase={'id': f'p{partition}-{s}'}) for s in similarities]
+
+
+def test_partitions_route_by_crc32():
+    ids = [f'tc{i:04d}' for i in range(1000)]
+    assert all(partition_of(tc_id, 4) == zlib.crc32(tc_id.encode('utf-8')) % 4 for tc_id in ids)
+    counts = [sum(partition_of(tc_id, 4) == p for tc_id in ids) for p in range(4)]
+    assert sum(counts) == 1000 and min(counts) > 200
+
+
+def test_every_id_is_owned_by_exactly_one_partition(monkeypatch):
+    coordinators = [make_coordinator(monkeypatch, 3, index) for index in range(3)]
+    for tc_id in (f'tc{i}' for i in range(300)):
+        assert [c.owns(tc_id) for c in coordinators].count(True) == 1
+    single = make_coordinator(monkeypatch, 1)
+    assert single.owns('anything') and not single.enabled
+
+    monkeypatch.setenv('PARTITION_INDEX', '3')
+    with pytest.raises(ValueError):
+        ScatterGather()
+
+
+def test_merges_the_top_results_of_every_partition(monkeypatch):
+    coordinator = make_coordinator(monkeypatch, partition_index=1)
+    remote = {0: [0.9, 0.5, 0.2], 2: [0.8, 0.7]}
+    calls = []
+
+    def remote_search(partition, payload):
+        calls.append((partition, payload))
+        return results(partition, remote[partition])
+
+    def local_search(query, min_similarity, limit, query_embedding):
+        assert (query, min_similarity, limit, query_embedding) == ('login', 0.1, 4, [1.0, 0.0])
+        return results(1, [0.95, 0.3])
+
+    monkeypatch.setattr(coordinator, '_remote_search', remote_search)
+    merged = coordinator.search('login', [1.0, 0.0], 0.1, 4, local_search)
+
+    assert [r.similarity for r in merged] == [0.95, 0.9, 0.8, 0.7]
+    assert [r.testCase['id'] for r in merged][:2] == ['p1-0.95', 'p0-0.9']
+    # The query is encoded once and sent along; this replica's own partition is not called remotely
+    assert sorted(partition for partition, _ in calls) == [0, 2]
+    assert all(payload['query_embedding'] == [1.0, 0.0] for _, payload in calls)
+    stats = coordinator.get_stats()
+    assert (stats['searches'], stats['partial_results']) == (1, 0)
+    assert set(stats['last_latency_ms']) == {'1'}
+
+
+def test_slow_and_failing_partitions_give_partial_results(monkeypatch):
+    coordinator = make_coordinator(monkeypatch, deadline_ms=100)
+    release = threading.Event()
+
+    def remote_search(partition, payload):
+        if partition == 1:
+            release.wait(5)
+            return results(1, [0.99])
+        raise ConnectionError('partition 2 is down')
+
+    monkeypatch.setattr(coordinator, '_remote_search', remote_search)
+    try:
+        merged = coordinator.search('q', [0.0], 0.0, 10, lambda *args: results(0, [0.4, 0.6]))
+    finally:
+        release.set()
+
+    # Partition 1 missed the deadline and partition 2 failed: the local results still come back
+    assert [r.similarity for r in merged] == [0.6, 0.4]
+    stats = coordinator.get_stats()
+    assert (stats['partial_results'], stats['partition_timeouts'], stats['partition_errors']) == (1, 1, 1)
+
+    monkeypatch.setattr(coordinator, '_remote_search', lambda partition, payload: 1 / 0)
+    with pytest.raises(RuntimeError):
+        coordinator.search('q', [0.0], 0.0, 10, lambda *args: 1 / 0)
+
+
+def test_partitioned_index_holds_its_hash_partition(fake_db, make_index, monkeypatch):
+    monkeypatch.setenv('PARTITION_COUNT', '3')
+    monkeypatch.setenv('PARTITION_INDEX', '1')
+    monkeypatch.setattr(embedding_index_module, 'scatter_gather', ScatterGather())
+    for i, vector in enumerate(random_vectors(60, 8)):
+        fake_db.put(f'tc{i:02d}', vector)
+    index = make_index()
+    index.sync()
+
+    owned = {tc_id for tc_id in fake_db.rows if partition_of(tc_id, 3) == 1}
+    assert 0 < len(owned) < 60
+    assert {row['id'] for _, row in index.search(random_vectors(1, 8)[0])} == owned
@@ -0,0 +1,47 @@
+import threading
+
+import numpy as np
+
+from tests.conftest import embedding_index_module, random_vectors
+
+
+def test_sharded_top_k_matches_a_single_shard(make_index):
+    vectors = random_vectors(1000, 8)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    single = make_index(INDEX_SHARDS=1)
+    sharded = make_index(INDEX_SHARDS=4, INDEX_MIN_SHARD_ROWS=1)
+
+    for query in random_vectors(20, 8, seed=1):
+        for k in (1, 10, 300, 1000):
+            expected_scores, expected_positions = single._top_k(vectors, query, k)
+            scores, positions = sharded._top_k(vectors, query, k)
+            np.testing.assert_array_equal(positions, expected_positions)
+            # Shards are separate matmuls: equal up to float32 rounding
+            np.testing.assert_allclose(scores, expected_scores, atol=1e-6)
+    assert sharded._executor is not None
+
+
+def test_concurrent_first_searches_share_one_pool(fake_db, make_index, monkeypatch):
+    vectors = random_vectors(64, 8)
+    for i, vector in enumerate(vectors):
+        fake_db.put(f'tc{i:02d}', vector)
+    index = make_index(INDEX_SHARDS=4, INDEX_MIN_SHARD_ROWS=1)
+    index.sync()
+
+    created = []
+    real_executor = embedding_index_module.ThreadPoolExecutor
+    ready = threading.Barrier(8)
+
+    def executor(*args, **kwargs):
+        created.append(real_executor(*args, **kwargs))
+        return created[-1]
+
+    def search():
+        ready.wait()
+        return [row['id'] for _, row in index.search(vectors[0], 3)]
+
+    monkeypatch.setattr(embedding_index_module, 'ThreadPoolExecutor', executor)
+    with real_executor(max_workers=8) as clients:
+        results = list(clients.map(lambda _: search(), range(8)))
+    assert all(result == results[0] for result in results) and results[0][0] == 'tc00'
+    assert len(created) == 1
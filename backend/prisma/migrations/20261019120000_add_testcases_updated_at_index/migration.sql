@@ -0,0 +1,2 @@
+-- CreateIndex
+CREATE INDEX `testcases_updatedAt_id_idx` ON `testcases`(`updatedAt`, `id`);
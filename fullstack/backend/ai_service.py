@@ -5,28 +5,87 @@ Handles sentence transformer operations and similarity calculations.
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import hashlib
 import json
 import logging
 import os
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Tuple, Optional
+
+from embedding_matrix import load_embedding_matrix
+from singleflight import SingleFlight
+from metrics import stage_timer, stats_collector
 
 logger = logging.getLogger(__name__)
 
+# Shared by every AIService instance so app and RAG searches coalesce together
+search_flight = SingleFlight()
+stats_collector.register('search', search_flight.get_stats)
+
+
+def embedding_model_id(model_name: str, dimension: int) -> str:
+    """Tag stored with every embedding, e.g. 'all-MiniLM-L6-v2:384'"""
+    return f"{model_name}:{dimension}"
+
+
+def parse_embedding_model_id(model_id: str) -> Tuple[str, int]:
+    """Inverse of embedding_model_id"""
+    model_name, _, dimension = model_id.rpartition(':')
+    return model_name, int(dimension)
+
+
+def embedding_text(name: str, description: str, tags) -> str:
+    """Text a test case is embedded from (tags may still be a JSON string)"""
+    if isinstance(tags, str):
+        tags = json.loads(tags) if tags else []
+    return f"{name} {description} {' '.join(tags or [])}"
+
+
+def embedding_hash(text: str) -> str:
+    """Content hash stored with an embedding; edits that keep it reuse the embedding"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+
+def rank_matches(similarities: np.ndarray, min_similarity: float, limit: int) -> np.ndarray:
+    """Positions of the best `limit` scores at or above min_similarity, highest first
+    (ties in corpus order). Only the rows above the threshold are partitioned and sorted."""
+    candidates = np.flatnonzero(similarities >= min_similarity)
+    if limit <= 0:
+        return candidates[:0]
+    if len(candidates) > limit:
+        values = similarities[candidates]
+        kth = np.partition(values, len(values) - limit)[len(values) - limit]
+        above = candidates[values > kth]
+        ties = candidates[values == kth][:limit - len(above)]
+        candidates = np.sort(np.concatenate([above, ties]))
+    return candidates[np.argsort(-similarities[candidates], kind='stable')]
 
 class AIService:
     """Handles AI/ML operations for embeddings and semantic search"""
 
-    def __init__(self):
+    # Rows seen by the last search; sizes the next search's preallocated matrix
+    corpus_size_hint = 0
+
+    def __init__(self, model=None):
         # Initialize the sentence transformer model using environment variable
+        # (an already-loaded or stand-in encoder can be injected, e.g. by benchmarks)
         model_name = os.getenv('MODEL_NAME', 'all-MiniLM-L6-v2')
-        self.model = SentenceTransformer(model_name)
+        self.model = model if model is not None else SentenceTransformer(model_name)
         logger.info(f"Sentence transformer model initialized: {model_name}")
 
         # Store model configuration
         self.model_name = model_name
         self.embedding_dimension = int(os.getenv('EMBEDDING_DIMENSION', '384'))
-        
+        self.model_id = embedding_model_id(model_name, self.embedding_dimension)
+        # Texts per encoder call when embedding in bulk
+        self.embedding_batch_size = int(os.getenv('EMBEDDING_BATCH_SIZE', '256'))
+
+        # Configured model while stored embeddings still come from an older one:
+        # searches keep using the stored model until re-embedding completes
+        self.target_model: Optional[Dict[str, Any]] = None
+        self._model_lock = threading.Lock()
+
         # Database reference (set later)
         self._db = None
     
@@ -41,6 +100,52 @@ class AIService:
             self._db = DatabaseConnection()
         return self._db
 
+    def serve_stored_model(self, model_id: str, model=None):
+        """Keep serving with the model the stored embeddings were created with"""
+        if model_id == self.model_id:
+            return
+        model_name, dimension = parse_embedding_model_id(model_id)
+        try:
+            stored_model = model if model is not None else SentenceTransformer(model_name)
+        except Exception as e:
+            # Searches only see rows re-embedded so far until the job completes
+            logger.error(f"Could not load stored embedding model {model_id}, serving {self.model_id}: {e}")
+            return
+
+        with self._model_lock:
+            self.target_model = {
+                'model_id': self.model_id,
+                'model_name': self.model_name,
+                'embedding_dimension': self.embedding_dimension,
+                'model': self.model,
+            }
+            self.model = stored_model
+            self.model_name = model_name
+            self.embedding_dimension = dimension
+            self.model_id = model_id
+        logger.info(f"Serving stored embedding model {model_id} until {self.target_model['model_id']} is complete")
+
+    def reembedding_target(self) -> Tuple[str, Any]:
+        """(model id, encoder) the re-embedding job writes embeddings for"""
+        with self._model_lock:
+            target = self.target_model
+            if target is None:
+                return self.model_id, self.model
+            return target['model_id'], target['model']
+
+    def activate_target_model(self):
+        """Switch searches and new writes to the re-embedded model"""
+        with self._model_lock:
+            target = self.target_model
+            if target is None:
+                return
+            self.model = target['model']
+            self.model_name = target['model_name']
+            self.embedding_dimension = target['embedding_dimension']
+            self.model_id = target['model_id']
+            self.target_model = None
+        logger.info(f"Switched to embedding model {self.model_id}")
+
     def generate_embedding_vector(self, text: str) -> List[float]:
         """Generate embedding for given text and return as list"""
         try:
@@ -50,6 +155,34 @@ class AIService:
             logger.error(f"Embedding generation error: {e}")
             return []
 
+    def generate_tagged_embedding(self, text: str) -> Tuple[List[float], str]:
+        """Embedding for storage together with the id of the model that produced it"""
+        with self._model_lock:
+            model, model_id = self.model, self.model_id
+        try:
+            return model.encode(text).tolist(), model_id
+        except Exception as e:
+            logger.error(f"Embedding generation error: {e}")
+            return [], model_id
+
+    def generate_tagged_embeddings(self, texts: List[str], batch_size: int = None) -> Tuple[List[List[float]], str]:
+        """Embeddings for many texts from batched encoder calls, and the id of their model.
+        Encodes batch_size texts per call (EMBEDDING_BATCH_SIZE) to bound memory;
+        texts in a batch that fails to encode get an empty embedding."""
+        batch_size = batch_size or self.embedding_batch_size
+        with self._model_lock:
+            model, model_id = self.model, self.model_id
+
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            try:
+                embeddings.extend(vector.tolist() for vector in model.encode(batch))
+            except Exception as e:
+                logger.error(f"Embedding generation error: {e}")
+                embeddings.extend([] for _ in batch)
+        return embeddings, model_id
+
     def generate_embedding(self, text: str) -> Dict[str, Any]:
         """Generate embedding for given text"""
         try:
@@ -64,82 +197,15 @@ class AIService:
     def semantic_search(self, query: str, min_similarity: float = 0.7, limit: int = 10) -> List[Dict[str, Any]]:
         """Perform semantic search on test cases using optimized matrix operations"""
         try:
-            # Generate embedding for search query
-            query_embedding = self.model.encode(query)
-
-            # Get all test cases from database
-            test_cases = self.db.get_test_cases_for_embedding()
-
-            if not test_cases:
-                return []
+            # Identical concurrent queries share one encode + corpus scan;
+            # min_similarity and limit are applied per request afterwards
+            similarities, test_cases = search_flight.do(query, lambda: self._score_corpus(query))
 
-            # Prepare embeddings for bulk calculation
-            embeddings = []
-            valid_tc_indices = []
-            
-            for i, tc in enumerate(test_cases):
-                try:
-                    stored_embedding = json.loads(tc['embedding'])
-                    if stored_embedding and len(stored_embedding) == self.embedding_dimension:
-                        embeddings.append(stored_embedding)
-                        valid_tc_indices.append(i)
-                except (json.JSONDecodeError, KeyError, TypeError):
-                    continue
-
-            if not embeddings:
-                return []
-
-            # Bulk calculate cosine similarity using NumPy
-            # cosine_similarity expects [n_samples_a, n_features] and [n_samples_b, n_features]
-            similarities = cosine_similarity(
-                [query_embedding],
-                embeddings
-            )[0]
-
-            # Filter and format results
-            results = []
-            for idx, similarity in zip(valid_tc_indices, similarities):
-                if similarity >= min_similarity:
-                    tc = test_cases[idx]
-                    
-                    # Convert test case data (reuse logic but more defensive)
-                    def _format_dt(v):
-                        """Return a string representation for datetimes; safe if v is already a str."""
-                        if not v:
-                            return None
-                        if isinstance(v, str):
-                            return v
-                        # prefer isoformat if available
-                        if hasattr(v, 'isoformat'):
-                            try:
-                                return v.isoformat()
-                            except Exception:
-                                return str(v)
-                        return str(v)
-
-                    test_case_data = {
-                        'id': tc['id'],
-                        'name': tc['name'],
-                        'description': tc['description'],
-                        'type': tc['type'],
-                        'priority': tc['priority'],
-                        'steps': json.loads(tc['steps']) if isinstance(tc['steps'], str) else tc['steps'],
-                        'expectedResult': tc['expectedResult'],
-                        'tags': json.loads(tc['tags']) if isinstance(tc['tags'], str) else tc['tags'],
-                        'createdAt': _format_dt(tc.get('createdAt')),
-                        'updatedAt': _format_dt(tc.get('updatedAt')),
-                        'aiGenerated': bool(tc.get('aiGenerated', False)),
-                        'referencesCount': 0,
-                    }
-
-                    results.append({
-                        'similarity': float(similarity),
-                        'testCase': test_case_data
-                    })
-
-            # Sort by similarity (highest first) and limit results
-            results.sort(key=lambda x: x['similarity'], reverse=True)
-            results = results[:limit]
+            with stage_timer('search', 'format'):
+                results = [{
+                    'similarity': float(similarities[idx]),
+                    'testCase': self._format_test_case(test_cases[idx])
+                } for idx in rank_matches(similarities, min_similarity, limit)]
 
             logger.info(f"Found {len(results)} similar test cases for query: {query}")
             return results
@@ -148,6 +214,72 @@ class AIService:
             logger.error(f"Search error: {e}")
             raise Exception("Failed to perform semantic search")
 
+    def _score_corpus(self, query: str) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """Similarity of every embedded test case to the query, and the matching rows.
+        Shared read-only between coalesced searches, which rank it with rank_matches."""
+        with self._model_lock:
+            model, model_id, dimension = self.model, self.model_id, self.embedding_dimension
+
+        # Generate embedding for search query
+        with stage_timer('search', 'encode'):
+            query_embedding = model.encode(query)
+
+        # Stream rows straight into a preallocated matrix; decoding happens as rows arrive
+        # Vectors from another model live in a different space (untagged rows predate tagging)
+        with stage_timer('search', 'db_fetch'):
+            matrix, test_cases = load_embedding_matrix(
+                self.db.get_test_cases_for_embedding(), dimension,
+                capacity=self.corpus_size_hint,
+                accept=lambda tc: tc.get('embeddingModel') in (None, model_id),
+            )
+        self.corpus_size_hint = len(test_cases)
+
+        if model_id != self.model_id:
+            # Re-embedded rows were switched in meanwhile: score in the new model's space
+            return self._score_corpus(query)
+
+        if not test_cases:
+            return np.zeros(0, dtype=np.float32), []
+
+        # Rows are already L2-normalized, so cosine similarity is a single mat-vec product
+        with stage_timer('search', 'similarity'):
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            norm = np.linalg.norm(query_vector)
+            similarities = matrix @ (query_vector / norm if norm else query_vector)
+        return similarities, test_cases
+
+    @staticmethod
+    def _format_test_case(tc: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a test case row into the search result payload"""
+        def _format_dt(v):
+            """Return a string representation for datetimes; safe if v is already a str."""
+            if not v:
+                return None
+            if isinstance(v, str):
+                return v
+            # prefer isoformat if available
+            if hasattr(v, 'isoformat'):
+                try:
+                    return v.isoformat()
+                except Exception:
+                    return str(v)
+            return str(v)
+
+        return {
+            'id': tc['id'],
+            'name': tc['name'],
+            'description': tc['description'],
+            'type': tc['type'],
+            'priority': tc['priority'],
+            'steps': json.loads(tc['steps']) if isinstance(tc['steps'], str) else tc['steps'],
+            'expectedResult': tc['expectedResult'],
+            'tags': json.loads(tc['tags']) if isinstance(tc['tags'], str) else tc['tags'],
+            'createdAt': _format_dt(tc.get('createdAt')),
+            'updatedAt': _format_dt(tc.get('updatedAt')),
+            'aiGenerated': bool(tc.get('aiGenerated', False)),
+            'referencesCount': 0,
+        }
+
     def get_statistics(self) -> Dict[str, Any]:
         """Get AI service statistics"""
         try:
@@ -159,7 +291,10 @@ class AIService:
                 "embedded_test_cases": embedded_count,
                 "embedding_coverage": (embedded_count / total_count * 100) if total_count > 0 else 0,
                 "model_name": self.model_name,
-                "embedding_dimension": self.embedding_dimension
+                "embedding_dimension": self.embedding_dimension,
+                "embedding_model": self.model_id,
+                "target_embedding_model": self.target_model['model_id'] if self.target_model else None,
+                "search_coalescing": search_flight.get_stats()
             }
 
         except Exception as e:
@@ -5,12 +5,17 @@ A unified Python backend with Flask, integrating AI services for test case gener
 
 import os
 import json
+import hashlib
 import uuid
+import io
 import logging
+import time
 from datetime import datetime
 from functools import wraps
 
-from flask import Flask, request, jsonify, send_from_directory, render_template
+from flask import (
+    Flask, request, jsonify, send_from_directory, render_template, g, Response, stream_with_context, make_response
+)
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -18,9 +23,25 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import local modules
-from database import DatabaseConnection
-from ai_service import AIService
+from database import DatabaseConnection, LIST_COLUMNS
+from ai_service import AIService, embedding_hash
 from gemini_service import GeminiService
+from similarity_graph import SimilarityGraph
+from reembedding import ReembeddingJob
+from bulk_import import (
+    create_testcases, import_testcases, update_testcases, merge_update, plan_embedding, embed_testcases,
+    IMPORT_READERS, IMPORT_CONTENT_TYPES
+)
+from jobs import JobQueue, JobCancelled, serialize_job, FINISHED_STATES
+from metrics import (
+    observe_request, render_metrics, stats_collector,
+    start_request_trace, stop_request_trace, server_timing_header
+)
+from profiling import request_profiler, debug_enabled
+from serialization import (
+    serialize_testcase, project_testcase, encode_cursor, decode_cursor,
+    json_response, raw_json_response, extend_fragment, join_fragments, dumps, row_fragments
+)
 
 # Setup logging
 log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
@@ -39,6 +60,60 @@ ai_service = AIService()
 gemini_service = GeminiService()
 
 
+def rebuild_after_reembedding():
+    """Neighbour lists were scored in the previous model's space"""
+    similarity_graph.embedding_dimension = ai_service.embedding_dimension
+    similarity_graph.build()
+
+
+# Serves the stored embedding model until re-embedding with MODEL_NAME completes
+reembedding_job = ReembeddingJob(db, ai_service, on_complete=rebuild_after_reembedding)
+needs_reembedding = reembedding_job.prepare()
+similarity_graph = SimilarityGraph(db, ai_service.embedding_dimension)
+stats_collector.register('similarity_graph', lambda: {'index_size': db.get_neighbor_graph_size()})
+stats_collector.register('row_fragments', row_fragments.get_stats)
+
+if needs_reembedding and os.getenv('REEMBED_ON_STARTUP', 'true').lower() == 'true':
+    reembedding_job.start()
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    # Opt-in per-request stage timings, returned as a Server-Timing header
+    if debug_enabled() and request.headers.get('X-Debug-Timing'):
+        g.request_trace = start_request_trace()
+    else:
+        # Worker threads are reused: drop a trace left by an earlier request
+        stop_request_trace()
+    if request.path.startswith('/api/') and not request.path.startswith('/api/debug/'):
+        g.profiler = request_profiler.start()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Record per-endpoint request counts, errors and latency"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        observe_request(
+            request.method,
+            request.url_rule.rule if request.url_rule else 'unmatched',
+            response.status_code,
+            time.perf_counter() - started
+        )
+        trace = g.pop('request_trace', None)
+        if trace is not None:
+            response.headers['Server-Timing'] = server_timing_header(trace, time.perf_counter() - started)
+    return response
+
+
+@app.teardown_request
+def finish_request_profile(exc):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        request_profiler.finish(profiler, f"{request.method}_{request.url_rule.rule if request.url_rule else 'unmatched'}")
+
+
 def generate_cuid():
     """Generate a sortable unique identifier (timestamp + random hex)"""
     import time
@@ -48,30 +123,14 @@ def generate_cuid():
     return f"tc_{timestamp}_{random_part}"
 
 
-def serialize_testcase(testcase):
-    """Convert database testcase to JSON serializable dict"""
-    if not testcase:
-        return None
-    
-    result = {
-        'id': testcase['id'],
-        'name': testcase['name'],
-        'description': testcase['description'],
-        'type': testcase['type'],
-        'priority': testcase['priority'],
-        'steps': json.loads(testcase['steps']) if isinstance(testcase['steps'], str) else testcase['steps'],
-        'expectedResult': testcase['expectedResult'],
-        'tags': json.loads(testcase['tags']) if isinstance(testcase['tags'], str) else testcase['tags'],
-        'aiGenerated': bool(testcase.get('aiGenerated', False)),
-        'originalPrompt': testcase.get('originalPrompt'),
-        'aiConfidence': testcase.get('aiConfidence'),
-        'aiSuggestions': testcase.get('aiSuggestions'),
-        'aiGenerationMethod': testcase.get('aiGenerationMethod'),
-        'tokenUsage': json.loads(testcase['tokenUsage']) if testcase.get('tokenUsage') and isinstance(testcase['tokenUsage'], str) else testcase.get('tokenUsage'),
-        'createdAt': testcase.get('createdAt'),  # SQLite returns as string already
-        'updatedAt': testcase.get('updatedAt'),  # SQLite returns as string already
-    }
-    return result
+def schedule_graph_update():
+    """Queue a catch-up of the kNN graph with the logged embedding changes (unless one
+    is already waiting) after embeddings changed; never fails the calling request"""
+    try:
+        if not db.has_queued_job('similarity_graph'):
+            job_queue.submit('similarity_graph', {})
+    except Exception as e:
+        logger.warning(f"Failed to schedule a similarity graph update: {e}")
 
 
 # ==================== FRONTEND ROUTES ====================
@@ -132,25 +191,105 @@ def health_check():
     return jsonify({'status': 'healthy', 'service': 'Fullstack Flask Backend'})
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics in text exposition format"""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
 # ==================== TEST CASE CRUD ====================
 
+# Reference counts added to listed test cases (response field -> list_testcases() column)
+LIST_COUNT_FIELDS = {
+    'referencesCount': 'references_count',
+    'referencedByCount': 'referenced_by_count',
+    'ragReferencesCount': 'rag_references_count',
+    'manualReferencesCount': 'manual_references_count',
+    'derivedFromCount': 'derived_from_count',
+}
+DEFAULT_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.getenv('LIST_MAX_PAGE_SIZE', '500'))
+
+# Polled reads are revalidated with If-None-Match on every use (or once max-age expires)
+HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', '0'))
+CACHE_CONTROL = 'no-cache' if HTTP_CACHE_MAX_AGE <= 0 else f'max-age={HTTP_CACHE_MAX_AGE}, must-revalidate'
+
+
+def conditional_get(view):
+    """Strong ETag from the test case / reference write counters and the request URL.
+    A matching If-None-Match gets 304 Not Modified after one counter lookup, without
+    running the view. Counters are read before the view's queries, so a body is never
+    older than the ETag it is sent with."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        versions = db.get_data_versions()
+        state = ','.join(f"{name}={version}" for name, version in sorted(versions.items()))
+        tag = hashlib.blake2b(f"{state}|{request.full_path}".encode('utf-8'), digest_size=16).hexdigest()
+        if request.if_none_match.contains_weak(tag):
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(tag)
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        return response
+    return wrapper
+
+
 @app.route('/api/testcases', methods=['GET'])
+@conditional_get
 def get_all_testcases():
-    """Get all test cases with reference counts"""
+    """Get test cases with reference counts, newest first.
+    Without parameters every test case is returned as a JSON array. With `limit`,
+    `cursor` or `fields` one page is returned as {"items": [...], "nextCursor": ...}:
+    pass nextCursor back as `cursor` for the following page (null on the last one),
+    and `fields` (comma-separated) to only read and return those fields."""
     try:
-        testcases = db.get_all_testcases()
-        result = []
+        paginated = any(param in request.args for param in ('limit', 'cursor', 'fields'))
+        fields = None
+        if request.args.get('fields'):
+            fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+            unknown = [field for field in fields if field not in LIST_COLUMNS and field not in LIST_COUNT_FIELDS]
+            if unknown:
+                return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+        try:
+            after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+            limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int) if paginated else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if limit is not None:
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        count_fields = [field for field in LIST_COUNT_FIELDS if fields is None or field in fields]
+        testcases = db.list_testcases(
+            columns=LIST_COLUMNS if fields is None else fields,
+            # One extra row tells whether another page follows
+            limit=limit + 1 if limit is not None else None,
+            after=after,
+            with_counts=bool(count_fields),
+        )
+        next_cursor = None
+        if limit is not None and len(testcases) > limit:
+            testcases = testcases[:limit]
+            next_cursor = encode_cursor(testcases[-1])
+
+        fragments = []
         for tc in testcases:
-            serialized = serialize_testcase(tc)
-            # Add reference counts
-            counts = db.get_reference_counts(tc['id'])
-            serialized['referencesCount'] = counts['references_count']
-            serialized['referencedByCount'] = counts['referenced_by_count']
-            serialized['ragReferencesCount'] = counts['rag_references_count']
-            serialized['manualReferencesCount'] = counts['manual_references_count']
-            serialized['derivedFromCount'] = counts['derived_from_count']
-            result.append(serialized)
-        return jsonify(result)
+            # Add reference counts (computed by the list query) to the serialized row
+            counts = {field: tc[LIST_COUNT_FIELDS[field]] for field in count_fields}
+            if fields is None:
+                fragment = row_fragments.get(tc, serialize_testcase)
+            else:
+                fragment = dumps(project_testcase(tc, [field for field in fields if field in LIST_COLUMNS]))
+            fragments.append(extend_fragment(fragment, counts))
+
+        if not paginated:
+            return raw_json_response(join_fragments(fragments))
+        return raw_json_response(
+            b'{"items":' + join_fragments(fragments) + b',"nextCursor":' + dumps(next_cursor) + b'}'
+        )
     except Exception as e:
         logger.error(f"Error getting testcases: {e}")
         return jsonify({'error': str(e)}), 500
@@ -167,6 +306,7 @@ def handle_exception(e):
 
 
 @app.route('/api/testcases/<id>', methods=['GET'])
+@conditional_get
 def get_testcase(id):
     """Get a single test case by ID"""
     try:
@@ -179,32 +319,22 @@ def get_testcase(id):
 
 
 @app.route('/api/testcases/<id>/full', methods=['GET'])
+@conditional_get
 def get_testcase_full(id):
     """Get a test case with full reference information"""
     try:
-        testcase = db.get_testcase_by_id(id)
-        if not testcase:
+        # One read transaction: the test case, its references and counts agree with each other
+        detail = db.get_testcase_detail(id)
+        if not detail:
             return jsonify({'error': 'Test case not found'}), 404
-        
-        serialized = serialize_testcase(testcase)
-        
-        # Get references
-        references = db.get_references(id)
-        serialized['references'] = references
-        
-        # Get referenced by
-        referenced_by = db.get_referenced_by(id)
-        serialized['referencedBy'] = referenced_by
-        
-        # Get derived test cases
-        derived = db.get_derived_testcases(id)
-        serialized['derivedTestCases'] = derived
-        
-        # Get counts
-        counts = db.get_reference_counts(id)
-        serialized['referencesCount'] = counts['references_count']
-        serialized['derivedCount'] = counts['referenced_by_count']
-        
+
+        serialized = serialize_testcase(detail['testcase'])
+        serialized['references'] = detail['references']
+        serialized['referencedBy'] = detail['referencedBy']
+        serialized['derivedTestCases'] = detail['derivedTestCases']
+        serialized['referencesCount'] = detail['counts']['references_count']
+        serialized['derivedCount'] = detail['counts']['referenced_by_count']
+
         return jsonify(serialized)
     except Exception as e:
         logger.error(f"Error getting full testcase: {e}")
@@ -219,7 +349,7 @@ def create_testcase():
         
         # Generate embedding
         text_for_embedding = f"{data.get('name', '')} {data.get('description', '')} {' '.join(data.get('tags', []))}"
-        embedding = ai_service.generate_embedding_vector(text_for_embedding)
+        embedding, embedding_model = ai_service.generate_tagged_embedding(text_for_embedding)
         
         # Create test case
         testcase_id = generate_cuid()
@@ -233,6 +363,8 @@ def create_testcase():
             'expectedResult': data.get('expectedResult', ''),
             'tags': json.dumps(data.get('tags', [])),
             'embedding': json.dumps(embedding),
+            'embeddingModel': embedding_model,
+            'embeddingHash': embedding_hash(text_for_embedding) if embedding else None,
             'aiGenerated': data.get('aiGenerated', False),
             'originalPrompt': data.get('originalPrompt'),
             'aiConfidence': data.get('aiConfidence'),
@@ -241,6 +373,8 @@ def create_testcase():
             'tokenUsage': json.dumps(data.get('tokenUsage')) if data.get('tokenUsage') else None,
         })
         
+        schedule_graph_update()
+        
         # Handle references
         if data.get('referenceTo') and data.get('referenceType'):
             db.create_reference(testcase_id, data['referenceTo'], data['referenceType'])
@@ -266,35 +400,9 @@ def bulk_create_testcases():
         if not testcases_data:
             return jsonify({'error': 'No test cases provided'}), 400
         
-        # Prepare test cases with IDs and embeddings
-        prepared_testcases = []
-        for tc_data in testcases_data:
-            testcase_id = generate_cuid()
-            
-            # Generate embedding
-            text_for_embedding = f"{tc_data.get('name', '')} {tc_data.get('description', '')} {' '.join(tc_data.get('tags', []))}"
-            embedding = ai_service.generate_embedding_vector(text_for_embedding)
-            
-            prepared_testcases.append({
-                'id': testcase_id,
-                'name': tc_data['name'],
-                'description': tc_data['description'],
-                'type': tc_data.get('type', 'positive'),
-                'priority': tc_data.get('priority', 'medium'),
-                'steps': json.dumps(tc_data.get('steps', [])),
-                'expectedResult': tc_data.get('expectedResult', ''),
-                'tags': json.dumps(tc_data.get('tags', [])),
-                'embedding': json.dumps(embedding),
-                'aiGenerated': tc_data.get('aiGenerated', False),
-                'originalPrompt': tc_data.get('originalPrompt'),
-                'aiConfidence': tc_data.get('aiConfidence'),
-                'aiSuggestions': tc_data.get('aiSuggestions'),
-                'aiGenerationMethod': tc_data.get('aiGenerationMethod'),
-                'tokenUsage': json.dumps(tc_data.get('tokenUsage')) if tc_data.get('tokenUsage') else None,
-            })
-        
-        # Bulk create
-        results = db.bulk_create_testcases(prepared_testcases)
+        results = create_testcases(db, ai_service, testcases_data, generate_cuid)
+        if any(r['success'] for r in results):
+            schedule_graph_update()
         
         # Calculate statistics
         success_count = sum(1 for r in results if r['success'])
@@ -311,6 +419,36 @@ def bulk_create_testcases():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/testcases/import', methods=['POST'])
+def import_testcases_stream():
+    """Stream-import test cases from an NDJSON or CSV body.
+    The body is read incrementally and created in IMPORT_BATCH_SIZE batches; the
+    response is NDJSON with one progress event per batch and a final summary."""
+    import_format = request.args.get('format') or IMPORT_CONTENT_TYPES.get(request.mimetype)
+    if import_format not in IMPORT_READERS:
+        return jsonify({
+            'error': 'Send NDJSON (application/x-ndjson) or CSV (text/csv), or pass ?format=ndjson|csv'
+        }), 415
+
+    # newline='' keeps quoted CSV fields with embedded newlines intact
+    body = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='' if import_format == 'csv' else None)
+    events = import_testcases(db, ai_service, IMPORT_READERS[import_format](body), generate_cuid)
+
+    def generate():
+        try:
+            for event in events:
+                if event['event'] == 'complete':
+                    schedule_graph_update()
+                yield dumps(event) + b'\n'
+        except Exception as e:
+            # Batches already reported stay committed
+            logger.error(f"Error importing testcases: {e}")
+            schedule_graph_update()
+            yield dumps({'event': 'error', 'error': str(e)}) + b'\n'
+
+    return Response(stream_with_context(generate()), content_type='application/x-ndjson')
+
+
 @app.route('/api/testcases/<id>', methods=['PATCH'])
 def update_testcase(id):
     """Update a test case"""
@@ -322,21 +460,17 @@ def update_testcase(id):
         if not existing:
             return jsonify({'error': 'Test case not found'}), 404
         
-        # Generate new embedding if content changed
-        text_for_embedding = f"{data.get('name', existing['name'])} {data.get('description', existing['description'])} {' '.join(data.get('tags', json.loads(existing['tags']) if isinstance(existing['tags'], str) else existing['tags']))}"
-        embedding = ai_service.generate_embedding_vector(text_for_embedding)
+        # Re-encode only when the embedded text (name, description, tags) changed
+        row = merge_update(existing, data)
+        reembed = plan_embedding(existing, row, ai_service.model_id)
+        if reembed:
+            embed_testcases(ai_service, [row])
         
         # Update test case
-        testcase = db.update_testcase(id, {
-            'name': data.get('name', existing['name']),
-            'description': data.get('description', existing['description']),
-            'type': data.get('type', existing['type']),
-            'priority': data.get('priority', existing['priority']),
-            'steps': json.dumps(data.get('steps')) if data.get('steps') else existing['steps'],
-            'expectedResult': data.get('expectedResult', existing['expectedResult']),
-            'tags': json.dumps(data.get('tags')) if data.get('tags') else existing['tags'],
-            'embedding': json.dumps(embedding),
-        })
+        testcase = db.update_testcase(id, row, content_changed=reembed)
+        row_fragments.invalidate(id)
+        if reembed:
+            schedule_graph_update()
         
         return jsonify(serialize_testcase(testcase))
     except Exception as e:
@@ -344,6 +478,37 @@ def update_testcase(id):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/testcases/bulk', methods=['PATCH'])
+def bulk_update_testcases():
+    """Bulk update test cases: {"testCases": [{"id": ..., <fields to change>}, ...]}.
+    Only test cases whose name, description or tags changed are re-embedded."""
+    try:
+        data = request.get_json()
+        items = data.get('testCases', [])
+        
+        if not items:
+            return jsonify({'error': 'No test cases provided'}), 400
+        
+        results = update_testcases(db, ai_service, items)
+        for r in results:
+            if r['success']:
+                row_fragments.invalidate(r['id'])
+        if any(r['reembedded'] for r in results):
+            schedule_graph_update()
+        
+        success_count = sum(1 for r in results if r['success'])
+        return jsonify({
+            'results': results,
+            'total': len(results),
+            'successCount': success_count,
+            'failureCount': len(results) - success_count,
+            'reembeddedCount': sum(1 for r in results if r['reembedded'])
+        })
+    except Exception as e:
+        logger.error(f"Error bulk updating testcases: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/testcases/<id>', methods=['DELETE'])
 def delete_testcase(id):
     """Delete a test case"""
@@ -353,6 +518,9 @@ def delete_testcase(id):
             return jsonify({'error': 'Test case not found'}), 404
         
         db.delete_testcase(id)
+        row_fragments.invalidate(id)
+        # Lists that contained it were shortened by the cascade and are recomputed
+        schedule_graph_update()
         return '', 204
     except Exception as e:
         logger.error(f"Error deleting testcase: {e}")
@@ -373,12 +541,68 @@ def search_testcases():
             return jsonify([])
         
         results = ai_service.semantic_search(query, min_similarity, limit)
-        return jsonify(results)
+        return json_response(results)
     except Exception as e:
         logger.error(f"Error searching: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/testcases/<id>/similar', methods=['GET'])
+def get_similar_testcases(id):
+    """Get the precomputed nearest neighbours of a test case"""
+    try:
+        if not db.get_testcase_by_id(id):
+            return jsonify({'error': 'Test case not found'}), 404
+        
+        limit = int(request.args.get('limit', similarity_graph.k))
+        return jsonify(similarity_graph.get_similar(id, limit))
+    except Exception as e:
+        logger.error(f"Error getting similar testcases: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/testcases/similar/rebuild', methods=['POST'])
+def rebuild_similarity_graph():
+    """Queue a batch rebuild of the kNN graph for all test cases; returns the job (202)"""
+    try:
+        return jsonify(serialize_job(job_queue.submit('similarity_graph', {'rebuild': True}))), 202
+    except Exception as e:
+        logger.error(f"Error rebuilding similarity graph: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/embeddings/reembed', methods=['GET'])
+def get_reembedding_status():
+    """Progress of the background re-embedding job"""
+    try:
+        return jsonify(reembedding_job.get_status())
+    except Exception as e:
+        logger.error(f"Error getting re-embedding status: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/embeddings/reembed', methods=['POST'])
+def start_reembedding():
+    """Start or resume re-embedding rows not yet embedded with the configured model"""
+    try:
+        started = reembedding_job.start()
+        return jsonify({'started': started, **reembedding_job.get_status()}), 202 if started else 200
+    except Exception as e:
+        logger.error(f"Error starting re-embedding: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/embeddings/reembed/stop', methods=['POST'])
+def stop_reembedding():
+    """Stop re-embedding after the current batch (staged vectors are kept)"""
+    try:
+        reembedding_job.stop(timeout=30)
+        return jsonify(reembedding_job.get_status())
+    except Exception as e:
+        logger.error(f"Error stopping re-embedding: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 # ==================== AI GENERATION ====================
 
 @app.route('/api/testcases/generate-with-ai', methods=['POST'])
@@ -401,61 +625,206 @@ def generate_with_ai():
         return jsonify({'error': str(e)}), 503
 
 
+def generate_and_save_testcase(data):
+    """Generate a test case with AI from a generate-and-save request body and save it"""
+    # Generate test case with AI
+    ai_result = gemini_service.generate_test_case(
+        prompt=data['prompt'],
+        context=data.get('context'),
+        preferred_type=data.get('preferredType'),
+        preferred_priority=data.get('preferredPriority'),
+        use_rag=data.get('useRAG', True),
+        rag_similarity_threshold=data.get('ragSimilarityThreshold', 0.7),
+        max_rag_references=data.get('maxRAGReferences', 3)
+    )
+    
+    # Generate embedding
+    text_for_embedding = f"{ai_result['name']} {ai_result['description']} {' '.join(ai_result.get('tags', []))}"
+    embedding, embedding_model = ai_service.generate_tagged_embedding(text_for_embedding)
+    
+    # Create test case
+    testcase_id = generate_cuid()
+    testcase = db.create_testcase({
+        'id': testcase_id,
+        'name': ai_result['name'],
+        'description': ai_result['description'],
+        'type': ai_result.get('type', 'positive'),
+        'priority': ai_result.get('priority', 'medium'),
+        'steps': json.dumps(ai_result.get('steps', [])),
+        'expectedResult': ai_result.get('expectedResult', ''),
+        'tags': json.dumps(ai_result.get('tags', [])),
+        'embedding': json.dumps(embedding),
+        'embeddingModel': embedding_model,
+        'embeddingHash': embedding_hash(text_for_embedding) if embedding else None,
+        'aiGenerated': True,
+        'originalPrompt': data['prompt'],
+        'aiConfidence': ai_result.get('confidence'),
+        'aiSuggestions': ai_result.get('aiSuggestions'),
+        'aiGenerationMethod': ai_result.get('aiGenerationMethod', 'pure_ai'),
+        'tokenUsage': json.dumps(ai_result.get('tokenUsage')) if ai_result.get('tokenUsage') else None,
+    })
+    
+    schedule_graph_update()
+    
+    # Handle RAG references
+    if ai_result.get('ragReferences'):
+        for ref in ai_result['ragReferences']:
+            db.create_reference(testcase_id, ref['testCaseId'], 'rag_retrieval', ref.get('similarity'))
+    
+    result = serialize_testcase(testcase)
+    result['ragReferences'] = ai_result.get('ragReferences', [])
+    return result
+
+
 @app.route('/api/testcases/generate-and-save-with-ai', methods=['POST'])
 def generate_and_save_with_ai():
     """Generate a test case using AI and save it to the database"""
     try:
-        data = request.get_json()
-        
-        # Generate test case with AI
-        ai_result = gemini_service.generate_test_case(
-            prompt=data['prompt'],
-            context=data.get('context'),
-            preferred_type=data.get('preferredType'),
-            preferred_priority=data.get('preferredPriority'),
-            use_rag=data.get('useRAG', True),
-            rag_similarity_threshold=data.get('ragSimilarityThreshold', 0.7),
-            max_rag_references=data.get('maxRAGReferences', 3)
-        )
-        
-        # Generate embedding
-        text_for_embedding = f"{ai_result['name']} {ai_result['description']} {' '.join(ai_result.get('tags', []))}"
-        embedding = ai_service.generate_embedding_vector(text_for_embedding)
-        
-        # Create test case
-        testcase_id = generate_cuid()
-        testcase = db.create_testcase({
-            'id': testcase_id,
-            'name': ai_result['name'],
-            'description': ai_result['description'],
-            'type': ai_result.get('type', 'positive'),
-            'priority': ai_result.get('priority', 'medium'),
-            'steps': json.dumps(ai_result.get('steps', [])),
-            'expectedResult': ai_result.get('expectedResult', ''),
-            'tags': json.dumps(ai_result.get('tags', [])),
-            'embedding': json.dumps(embedding),
-            'aiGenerated': True,
-            'originalPrompt': data['prompt'],
-            'aiConfidence': ai_result.get('confidence'),
-            'aiSuggestions': ai_result.get('aiSuggestions'),
-            'aiGenerationMethod': ai_result.get('aiGenerationMethod', 'pure_ai'),
-            'tokenUsage': json.dumps(ai_result.get('tokenUsage')) if ai_result.get('tokenUsage') else None,
-        })
-        
-        # Handle RAG references
-        if ai_result.get('ragReferences'):
-            for ref in ai_result['ragReferences']:
-                db.create_reference(testcase_id, ref['testCaseId'], 'rag_retrieval', ref.get('similarity'))
-        
-        result = serialize_testcase(testcase)
-        result['ragReferences'] = ai_result.get('ragReferences', [])
-        
-        return jsonify(result), 201
+        return jsonify(generate_and_save_testcase(request.get_json())), 201
     except Exception as e:
         logger.error(f"Error generating and saving with AI: {e}")
         return jsonify({'error': str(e)}), 503
 
 
+# ==================== BACKGROUND JOBS ====================
+
+def validate_bulk_create_job(payload):
+    if not isinstance(payload.get('testCases'), list) or not payload['testCases']:
+        raise ValueError('No test cases provided')
+
+
+def run_bulk_create_job(payload, job):
+    """POST /api/testcases/bulk as a job: created in IMPORT_BATCH_SIZE batches with
+    progress and cancellation between batches (committed batches are kept)"""
+    items = payload['testCases']
+    created, failures = [], []
+
+    def summary():
+        return {
+            'total': len(items),
+            'successCount': len(created),
+            'failureCount': len(failures),
+            'createdIds': created,
+            'failures': failures,
+        }
+
+    try:
+        for event in import_testcases(db, ai_service, items, generate_cuid, on_batch=created.extend):
+            if event['event'] == 'progress':
+                failures.extend(event['failures'])
+                job.progress(total=len(items), processed=event['processed'],
+                             succeeded=event['succeeded'], failed=event['failed'])
+    except JobCancelled as e:
+        # The batches created so far are committed: report them
+        e.result = summary()
+        raise
+    finally:
+        if created:
+            schedule_graph_update()
+
+    return summary()
+
+
+def validate_generate_job(payload):
+    if not payload.get('prompt'):
+        raise ValueError('prompt is required')
+
+
+def run_generate_job(payload, job):
+    job.progress(stage='generating')
+    return generate_and_save_testcase(payload)
+
+
+def run_similarity_graph_job(payload, job):
+    """Catch the kNN graph up with the logged embedding changes, or rebuild it"""
+    if payload.get('rebuild'):
+        return similarity_graph.build()
+    return similarity_graph.update()
+
+
+job_queue = JobQueue(db)
+job_queue.register('bulk_create', run_bulk_create_job, validate=validate_bulk_create_job, concurrency=1)
+job_queue.register('generate_and_save', run_generate_job, validate=validate_generate_job, concurrency=2)
+# One graph writer at a time across processes; queued updates are deduplicated
+job_queue.register('similarity_graph', run_similarity_graph_job, concurrency=1)
+if os.getenv('JOB_WORKERS_ENABLED', 'true').lower() == 'true':
+    job_queue.start()
+# Builds the graph of an existing database on first start and catches up with
+# changes made while stopped (e.g. by seed_data.py)
+schedule_graph_update()
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a background job: {"type": "bulk_create" | "generate_and_save" | "similarity_graph", "payload": {...}}"""
+    try:
+        data = request.get_json() or {}
+        job = job_queue.submit(data.get('type'), data.get('payload', {}))
+        return jsonify(serialize_job(job)), 202
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error submitting job: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """List recent jobs (?state=&type=&limit=)"""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+        jobs = db.list_jobs(request.args.get('state'), request.args.get('type'), limit)
+        return jsonify([serialize_job(job) for job in jobs])
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    except Exception as e:
+        logger.error(f"Error listing jobs: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get a job's state and progress"""
+    try:
+        job = db.get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(serialize_job(job))
+    except Exception as e:
+        logger.error(f"Error getting job: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Get a finished job's result (409 while it is queued or running)"""
+    try:
+        job = db.get_job(job_id, with_result=True)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        if job['state'] not in FINISHED_STATES:
+            return jsonify({'error': 'Job has not finished', 'state': job['state']}), 409
+        return jsonify(serialize_job(job, with_result=True))
+    except Exception as e:
+        logger.error(f"Error getting job result: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued job, or stop a running one at its next progress report"""
+    try:
+        job = db.get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        if job['state'] in FINISHED_STATES:
+            return jsonify({'error': f"Job already {job['state']}", 'state': job['state']}), 409
+        return jsonify(serialize_job(job_queue.cancel(job_id))), 202
+    except Exception as e:
+        logger.error(f"Error cancelling job: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 # ==================== DERIVATION ====================
 
 @app.route('/api/testcases/derive/<reference_id>', methods=['POST'])
@@ -471,7 +840,7 @@ def derive_testcase(reference_id):
         
         # Generate embedding
         text_for_embedding = f"{data.get('name', '')} {data.get('description', '')} {' '.join(data.get('tags', []))}"
-        embedding = ai_service.generate_embedding_vector(text_for_embedding)
+        embedding, embedding_model = ai_service.generate_tagged_embedding(text_for_embedding)
         
         # Create test case
         testcase_id = generate_cuid()
@@ -485,6 +854,8 @@ def derive_testcase(reference_id):
             'expectedResult': data.get('expectedResult', ''),
             'tags': json.dumps(data.get('tags', [])),
             'embedding': json.dumps(embedding),
+            'embeddingModel': embedding_model,
+            'embeddingHash': embedding_hash(text_for_embedding) if embedding else None,
             'aiGenerated': data.get('aiGenerated', False),
             'originalPrompt': data.get('originalPrompt'),
             'aiConfidence': data.get('aiConfidence'),
@@ -493,6 +864,8 @@ def derive_testcase(reference_id):
             'tokenUsage': json.dumps(data.get('tokenUsage')) if data.get('tokenUsage') else None,
         })
         
+        schedule_graph_update()
+        
         # Create reference to parent
         db.create_reference(testcase_id, reference_id, 'semantic_search')
         
@@ -536,6 +909,44 @@ def remove_reference(reference_id):
         return jsonify({'error': str(e)}), 500
 
 
+# ==================== DEBUG ====================
+# Only served with REQUEST_DEBUG_ENABLED=true
+
+@app.route('/api/debug/profile', methods=['GET'])
+def get_profiling():
+    """Profiling budget left and the most recent profile files"""
+    if not debug_enabled():
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify(request_profiler.get_status())
+
+
+@app.route('/api/debug/profile', methods=['POST'])
+def start_profiling():
+    """Profile the next N sampled API requests into PROFILE_DIR"""
+    if not debug_enabled():
+        return jsonify({'error': 'Not found'}), 404
+    try:
+        data = request.get_json(silent=True) or {}
+        requests_to_profile = int(data.get('requests', 10))
+        sample_rate = float(data.get('sample_rate', 1.0))
+        if requests_to_profile < 1 or not 0.0 < sample_rate <= 1.0:
+            return jsonify({'error': 'requests must be >= 1 and sample_rate in (0, 1]'}), 400
+        return jsonify(request_profiler.arm(requests_to_profile, sample_rate))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error starting profiling: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/debug/profile', methods=['DELETE'])
+def stop_profiling():
+    """Stop profiling before the budget is spent"""
+    if not debug_enabled():
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify(request_profiler.disarm())
+
+
 # ==================== STATS ====================
 
 @app.route('/api/stats', methods=['GET'])
@@ -543,6 +954,8 @@ def get_stats():
     """Get AI service statistics"""
     try:
         stats = ai_service.get_statistics()
+        stats['reembedding'] = reembedding_job.get_status()
+        stats['jobs'] = job_queue.get_stats()
         return jsonify(stats)
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
@@ -0,0 +1,4 @@
+"""
+Benchmarks for the Flask backend.
+Run from fullstack/backend, e.g. python -m benchmarks.search_benchmark --help
+"""
@@ -0,0 +1,196 @@
+"""
+Bulk create benchmark.
+Creates N randomized test cases (the seed_data.py schema) in a fresh database
+with the previous pipeline (one encode call and one INSERT per item) and the
+batched one (bulk_import.create_testcases: batched encoding, executemany in
+savepoint chunks, orjson vector encoding) and reports items/sec per pipeline and scale as JSON.
+
+Encoders:
+    model  the configured SentenceTransformer (MODEL_NAME)
+    hash   deterministic per-text vectors, isolating pipeline and insert costs
+
+Usage (from fullstack/backend):
+    python -m benchmarks.bulk_create_benchmark --scales 1000,10000 --encoder model
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import sqlite3
+import tempfile
+import time
+import zlib
+from typing import List, Dict, Any
+
+import numpy as np
+
+from ai_service import AIService, embedding_text
+from bulk_import import create_testcases, prepare_testcase
+from database import DatabaseConnection, INSERT_TESTCASE, _insert_params
+from benchmarks.search_benchmark import SyntheticCorpus
+
+
+class HashEncoder:
+    """Deterministic vectors derived from the text; near-zero encode cost"""
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def _vector(self, text: str) -> np.ndarray:
+        rng = np.random.default_rng(zlib.crc32(text.encode()))
+        return rng.standard_normal(self.dimension, dtype=np.float32)
+
+    def encode(self, texts):
+        if isinstance(texts, str):
+            return self._vector(texts)
+        return np.stack([self._vector(text) for text in texts])
+
+
+def previous_create(db: DatabaseConnection, ai_service: AIService, items: List[Dict[str, Any]], new_id) -> List[Dict[str, Any]]:
+    """The pipeline before batching: encode and insert item by item in one transaction"""
+    rows = []
+    for tc_data in items:
+        row = prepare_testcase(tc_data, new_id())
+        embedding, model_id = ai_service.generate_tagged_embedding(
+            embedding_text(row['name'], row['description'], row['tags']))
+        row['embedding'], row['embeddingModel'] = json.dumps(embedding), model_id
+        rows.append(row)
+
+    results = []
+    connection = db.get_connection()
+    cursor = connection.cursor()
+    try:
+        for index, row in enumerate(rows):
+            try:
+                cursor.execute(INSERT_TESTCASE, _insert_params(row))
+                results.append({'index': index, 'success': True, 'id': row['id'], 'name': row['name'], 'error': None})
+            except sqlite3.Error as e:
+                results.append({'index': index, 'success': False, 'id': row['id'], 'name': row['name'], 'error': str(e)})
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+    return results
+
+
+PIPELINES = {
+    'previous': previous_create,
+    'batched': create_testcases,
+}
+
+
+def make_items(rows: int, seed: int) -> List[Dict[str, Any]]:
+    """Request items as posted to /api/testcases/bulk"""
+    # Vectors are unused here: the pipelines under test compute their own
+    corpus = SyntheticCorpus(rows, 1, vectors='random', seed=seed)
+    items = []
+    for index in range(rows):
+        fields = corpus._fields(index)
+        del fields['id']
+        items.append(fields)
+    return items
+
+
+def run_pipeline(name: str, items: List[Dict[str, Any]], ai_service: AIService) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = os.environ.get('DB_PATH')
+        os.environ['DB_PATH'] = os.path.join(tmp, 'bench.db')
+        try:
+            db = DatabaseConnection()
+        finally:
+            if previous is None:
+                os.environ.pop('DB_PATH', None)
+            else:
+                os.environ['DB_PATH'] = previous
+
+        counter = itertools.count()
+        started = time.perf_counter()
+        results = PIPELINES[name](db, ai_service, items, lambda: f"tc_bulk_{next(counter):08d}")
+        elapsed = time.perf_counter() - started
+
+        stored = db.get_connection()
+        try:
+            count = stored.execute("SELECT COUNT(*) AS n FROM testcases").fetchone()['n']
+        finally:
+            stored.close()
+
+    return {
+        'pipeline': name,
+        'items': len(items),
+        'seconds': round(elapsed, 3),
+        'items_per_second': round(len(items) / elapsed, 1),
+        'succeeded': sum(1 for r in results if r['success']),
+        'stored': count,
+    }
+
+
+def run_benchmark(scales: List[int] = None, encoder: str = 'hash', dimension: int = 384,
+                  pipelines: List[str] = None, seed: int = 0) -> Dict[str, Any]:
+    if encoder == 'hash':
+        os.environ.setdefault('EMBEDDING_DIMENSION', str(dimension))
+        ai_service = AIService(model=HashEncoder(int(os.environ['EMBEDDING_DIMENSION'])))
+    elif encoder == 'model':
+        ai_service = AIService()
+    else:
+        raise ValueError(f"Unknown encoder: {encoder}")
+
+    results = []
+    for rows in scales or [1000, 10000]:
+        items = make_items(rows, seed)
+        scale_results = [run_pipeline(name, items, ai_service) for name in (pipelines or list(PIPELINES))]
+        baseline = scale_results[0]['items_per_second']
+        for result in scale_results:
+            result['speedup'] = round(result['items_per_second'] / baseline, 2) if baseline else None
+        results.extend(scale_results)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {
+            'scales': scales or [1000, 10000],
+            'encoder': encoder,
+            'model': ai_service.model_id,
+            'embedding_batch_size': ai_service.embedding_batch_size,
+            'bulk_insert_chunk_size': int(os.getenv('BULK_INSERT_CHUNK_SIZE', '500')),
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1000,10000', help='Comma-separated item counts')
+    parser.add_argument('--encoder', choices=['hash', 'model'], default='hash')
+    parser.add_argument('--dimension', type=int, default=384, help='Vector dimension of the hash encoder')
+    parser.add_argument('--pipelines', default=','.join(PIPELINES), help='Comma-separated pipelines; the first is the baseline')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run_benchmark(
+        scales=[int(s) for s in args.scales.split(',')],
+        encoder=args.encoder,
+        dimension=args.dimension,
+        pipelines=args.pipelines.split(','),
+        seed=args.seed,
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
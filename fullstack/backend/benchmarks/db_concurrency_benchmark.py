@@ -0,0 +1,208 @@
+"""
+Concurrent read/write benchmark for the SQLite connection settings.
+Seeds a fresh database per profile, then runs reader threads (test case by
+id, a list page, reference counts) alongside writer threads (create and
+update test cases) for a fixed duration, and reports throughput, p50/p99
+latency and errors (e.g. "database is locked") per operation kind as JSON.
+
+Profiles:
+    per_call  a new connection per call, rollback journal, synchronous=FULL
+              (the previous behaviour)
+    tuned     per-thread connections, WAL, synchronous=NORMAL, mmap and a
+              larger page cache (the defaults)
+
+Usage (from fullstack/backend):
+    python -m benchmarks.db_concurrency_benchmark --readers 8 --writers 2 --duration 10
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import List, Dict, Any
+
+import numpy as np
+
+from database import DatabaseConnection
+
+PROFILES = {
+    'per_call': {
+        'DB_REUSE_CONNECTIONS': 'false',
+        'DB_JOURNAL_MODE': 'DELETE',
+        'DB_SYNCHRONOUS': 'FULL',
+        'DB_MMAP_SIZE': '0',
+        'DB_CACHE_SIZE_KB': '2000',
+    },
+    'tuned': {
+        'DB_REUSE_CONNECTIONS': 'true',
+        'DB_JOURNAL_MODE': 'WAL',
+        'DB_SYNCHRONOUS': 'NORMAL',
+        'DB_MMAP_SIZE': str(256 * 1024 * 1024),
+        'DB_CACHE_SIZE_KB': str(64 * 1024),
+    },
+}
+
+
+def open_database(db_path: str, settings: Dict[str, str]) -> DatabaseConnection:
+    previous = {key: os.environ.get(key) for key in ('DB_PATH', *settings)}
+    os.environ.update(DB_PATH=db_path, **settings)
+    try:
+        return DatabaseConnection()
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def seed(db: DatabaseConnection, rows: int, seed_value: int = 0) -> List[str]:
+    rng = random.Random(seed_value)
+    ids = [f"tc_bench_{i:08d}" for i in range(rows)]
+    connection = db.get_connection()
+    try:
+        connection.executemany(
+            """INSERT INTO testcases (id, name, description, type, priority, steps, expectedResult, tags, createdAt)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('2026-01-01', ? || ' seconds'))""",
+            [(tc_id, f"Benchmark test case {i}", "Verify the feature under benchmark",
+              'positive', 'medium', json.dumps([{'step': f"Step {i}", 'expectedResult': 'ok'}]),
+              'ok', json.dumps(['benchmark']), i) for i, tc_id in enumerate(ids)]
+        )
+        connection.executemany(
+            "INSERT OR IGNORE INTO testcase_references (id, sourceId, targetId, referenceType) VALUES (?, ?, ?, ?)",
+            [(f"ref_{i}", rng.choice(ids), rng.choice(ids), rng.choice(['manual', 'rag_retrieval', 'semantic_search']))
+             for i in range(rows * 2)]
+        )
+        connection.commit()
+    finally:
+        connection.close()
+    return ids
+
+
+def run_profile(name: str, readers: int, writers: int, duration: float, rows: int, seed_value: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = open_database(os.path.join(tmp, 'bench.db'), PROFILES[name])
+        ids = seed(db, rows, seed_value)
+        samples = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def read(rng):
+            choice = rng.random()
+            if choice < 0.5:
+                db.get_testcase_by_id(rng.choice(ids))
+            elif choice < 0.8:
+                db.get_reference_counts(rng.choice(ids))
+            else:
+                db.list_testcases(limit=50)
+
+        def write(rng, worker, counter):
+            if rng.random() < 0.5:
+                db.create_testcase({'id': f"tc_new_{worker}_{counter}", 'name': 'New', 'description': 'd', 'tags': '[]'})
+            else:
+                db.update_testcase(rng.choice(ids), {
+                    'name': f"Edited {counter}", 'description': 'd', 'type': 'negative', 'priority': 'high',
+                    'steps': '[]', 'expectedResult': 'ok', 'tags': '[]',
+                })
+
+        def worker_loop(kind: str, worker: int):
+            rng = random.Random(seed_value * 1000 + worker)
+            local, failed, counter = [], 0, 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    if kind == 'read':
+                        read(rng)
+                    else:
+                        write(rng, worker, counter)
+                    local.append(time.perf_counter() - started)
+                except Exception:
+                    failed += 1
+                counter += 1
+            with lock:
+                samples[kind].extend(local)
+                errors[kind] += failed
+
+        threads = [threading.Thread(target=worker_loop, args=('read', i)) for i in range(readers)]
+        threads += [threading.Thread(target=worker_loop, args=('write', readers + i)) for i in range(writers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        result = {'profile': name, 'connections_opened': db.get_connection_stats()['connections_opened']}
+        for kind in ('read', 'write'):
+            latencies_ms = np.array(samples[kind] or [0.0]) * 1000
+            result[kind] = {
+                'ops': len(samples[kind]),
+                'ops_per_second': round(len(samples[kind]) / elapsed, 1),
+                'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+                'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+                'errors': errors[kind],
+            }
+        return result
+
+
+def run_benchmark(readers: int = 8, writers: int = 2, duration: float = 10.0, rows: int = 5000,
+                  profiles: List[str] = None, seed_value: int = 0) -> Dict[str, Any]:
+    results = [run_profile(name, readers, writers, duration, rows, seed_value) for name in (profiles or list(PROFILES))]
+    baseline = results[0]
+    for result in results:
+        for kind in ('read', 'write'):
+            base = baseline[kind]['ops_per_second']
+            result[kind]['speedup'] = round(result[kind]['ops_per_second'] / base, 2) if base else None
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {'readers': readers, 'writers': writers, 'duration': duration, 'rows': rows, 'seed': seed_value},
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per profile')
+    parser.add_argument('--rows', type=int, default=5000, help='Test cases seeded before the run')
+    parser.add_argument('--profiles', default=','.join(PROFILES), help='Comma-separated profiles; the first is the baseline')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run_benchmark(
+        readers=args.readers,
+        writers=args.writers,
+        duration=args.duration,
+        rows=args.rows,
+        profiles=args.profiles.split(','),
+        seed_value=args.seed,
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Test case detail benchmark for GET /api/testcases/<id>/full.
+Fills a fresh database with N randomized test cases (the seed_data.py schema)
+and random references between them, then times building the response body for
+random ids with the previous path (get_testcase_by_id, get_references,
+get_referenced_by, get_derived_testcases and get_reference_counts: nine queries,
+each call on its own connection) against the consolidated one
+(get_testcase_detail: three queries in one read transaction). Reports p50/p99
+milliseconds per request as JSON, with reused (DB_REUSE_CONNECTIONS=true) and
+per-call connections.
+
+Usage (from fullstack/backend):
+    python -m benchmarks.detail_benchmark --rows 1000,10000 --references 8
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import sqlite3
+import tempfile
+import time
+from typing import List, Dict, Any, Callable
+
+import numpy as np
+from flask import Flask, jsonify
+
+from database import DatabaseConnection
+from serialization import serialize_testcase
+from benchmarks.search_benchmark import SyntheticCorpus
+
+REFERENCE_TYPES = ('rag_retrieval', 'manual', 'semantic_search')
+
+
+def previous_response(db: DatabaseConnection, testcase_id: str) -> bytes:
+    serialized = serialize_testcase(db.get_testcase_by_id(testcase_id))
+    serialized['references'] = db.get_references(testcase_id)
+    serialized['referencedBy'] = db.get_referenced_by(testcase_id)
+    serialized['derivedTestCases'] = db.get_derived_testcases(testcase_id)
+    counts = db.get_reference_counts(testcase_id)
+    serialized['referencesCount'] = counts['references_count']
+    serialized['derivedCount'] = counts['referenced_by_count']
+    return jsonify(serialized).get_data()
+
+
+def consolidated_response(db: DatabaseConnection, testcase_id: str) -> bytes:
+    detail = db.get_testcase_detail(testcase_id)
+    serialized = serialize_testcase(detail['testcase'])
+    serialized['references'] = detail['references']
+    serialized['referencedBy'] = detail['referencedBy']
+    serialized['derivedTestCases'] = detail['derivedTestCases']
+    serialized['referencesCount'] = detail['counts']['references_count']
+    serialized['derivedCount'] = detail['counts']['referenced_by_count']
+    return jsonify(serialized).get_data()
+
+
+PATHS = {
+    'previous': previous_response,
+    'consolidated': consolidated_response,
+}
+
+
+def populate(db: DatabaseConnection, rows: int, references: int, seed: int) -> List[str]:
+    """Insert the corpus and `references` outgoing references per test case"""
+    corpus = SyntheticCorpus(rows, 8, vectors='random', seed=seed)
+    db.bulk_create_testcases(corpus.rows())
+    ids = corpus.ids()
+
+    rng = np.random.default_rng(seed)
+    counter = itertools.count()
+    params = []
+    for source in range(rows):
+        for target in rng.choice(rows, size=min(references, rows - 1), replace=False):
+            if target != source:
+                params.append((f"ref_{next(counter):010d}", ids[source], ids[target], float(rng.random()),
+                               REFERENCE_TYPES[int(rng.integers(len(REFERENCE_TYPES)))]))
+    connection = db.get_connection()
+    try:
+        connection.executemany("""
+            INSERT INTO testcase_references (id, sourceId, targetId, similarityScore, referenceType)
+            VALUES (?, ?, ?, ?, ?)
+        """, params)
+        connection.commit()
+    finally:
+        connection.close()
+    return ids
+
+
+def time_path(render: Callable[[str], bytes], ids: List[str], warmup: int) -> Dict[str, Any]:
+    for testcase_id in ids[:warmup]:
+        render(testcase_id)
+    latencies = []
+    for testcase_id in ids:
+        started = time.perf_counter()
+        render(testcase_id)
+        latencies.append(time.perf_counter() - started)
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+        'requests_per_second': round(len(ids) / sum(latencies), 1),
+    }
+
+
+def open_database(path: str, reuse_connections: bool) -> DatabaseConnection:
+    previous = {name: os.environ.get(name) for name in ('DB_PATH', 'DB_REUSE_CONNECTIONS')}
+    os.environ['DB_PATH'] = path
+    os.environ['DB_REUSE_CONNECTIONS'] = 'true' if reuse_connections else 'false'
+    try:
+        return DatabaseConnection()
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def run_benchmark(rows_list: List[int], references: int = 8, requests: int = 2000, warmup: int = 100,
+                  paths: List[str] = None, seed: int = 0) -> Dict[str, Any]:
+    app = Flask(__name__)
+    results = []
+
+    with app.app_context(), tempfile.TemporaryDirectory() as tmp:
+        for rows in rows_list:
+            path = os.path.join(tmp, f'detail-{rows}.db')
+            ids = populate(open_database(path, True), rows, references, seed)
+            sample = [ids[i] for i in np.random.default_rng(seed + 1).integers(rows, size=requests)]
+
+            for reuse_connections in (True, False):
+                db = open_database(path, reuse_connections)
+                # Responses must carry the same data
+                assert json.loads(previous_response(db, ids[0])) == json.loads(consolidated_response(db, ids[0]))
+                timings = {name: time_path(lambda i: PATHS[name](db, i), sample, warmup)
+                           for name in (paths or list(PATHS))}
+                baseline = next(iter(timings.values()))['p50_ms']
+                for name, timing in timings.items():
+                    results.append({
+                        'rows': rows,
+                        'connections': 'reused' if reuse_connections else 'per_call',
+                        'path': name,
+                        **timing,
+                        'speedup_p50': round(baseline / timing['p50_ms'], 2) if timing['p50_ms'] else None,
+                    })
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {
+            'rows': rows_list,
+            'references_per_testcase': references,
+            'requests': requests,
+            'warmup': warmup,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1000,10000', help='Comma-separated database sizes')
+    parser.add_argument('--references', type=int, default=8, help='Outgoing references per test case')
+    parser.add_argument('--requests', type=int, default=2000, help='Timed requests per path')
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--paths', default=','.join(PATHS), help='Comma-separated paths; the first is the baseline')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run_benchmark(
+        rows_list=[int(rows) for rows in args.rows.split(',')],
+        references=args.references,
+        requests=args.requests,
+        warmup=args.warmup,
+        paths=args.paths.split(','),
+        seed=args.seed,
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
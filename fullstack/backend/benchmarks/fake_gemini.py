@@ -0,0 +1,278 @@
+"""
+Local stand-in for the Gemini REST API.
+Serves models/<model>:generateContent with configurable latency, error-rate
+and token-usage distributions so generation can be load-tested without an
+API key or spend. Point a service at it through the genai configuration:
+
+    GEMINI_API_KEY=fake GEMINI_API_ENDPOINT=http://127.0.0.1:8089 python app.py
+
+Usage (from fullstack/backend):
+    python -m benchmarks.fake_gemini --port 8089 --latency-ms 800 --error-rate 0.02
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+GENERATE_PATH = re.compile(r'^/v1(?:beta)?/models/(?P<model>[^:/]+):generateContent$')
+
+# HTTP status -> google.rpc status name, as returned by the real API
+ERROR_STATUSES = {
+    429: 'RESOURCE_EXHAUSTED',
+    500: 'INTERNAL',
+    503: 'UNAVAILABLE',
+}
+
+
+class FakeGeminiConfig:
+    """Distributions the fake samples from for every generateContent call"""
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        error_codes=(429, 500, 503),
+        malformed_rate: float = 0.0,
+        output_tokens: float = 350.0,
+        output_tokens_sigma: float = 0.3,
+        chars_per_token: float = 4.0,
+        seed: Optional[int] = None,
+    ):
+        # Latency is log-normal around the median; sigma 0 makes it constant
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        # Responses without a JSON object, to exercise the services' parse errors
+        self.malformed_rate = malformed_rate
+        # Output tokens are log-normal around the median; prompt tokens follow the input length
+        self.output_tokens = output_tokens
+        self.output_tokens_sigma = output_tokens_sigma
+        self.chars_per_token = chars_per_token
+        self.seed = seed
+
+
+class FakeGemini:
+    """Samples responses from a FakeGeminiConfig and keeps request counters"""
+
+    def __init__(self, config: Optional[FakeGeminiConfig] = None):
+        self.config = config or FakeGeminiConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'errors': 0, 'malformed': 0, 'prompt_tokens': 0, 'candidates_tokens': 0}
+
+    def _lognormal(self, median: float, sigma: float) -> float:
+        with self._lock:
+            return median * math.exp(self._rng.gauss(0.0, sigma)) if sigma > 0 else median
+
+    def _chance(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._rng.random() < rate
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, delta in deltas.items():
+                self._stats[key] += delta
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def generate(self, model: str, body: Dict[str, Any]):
+        """Return (status, payload) for one generateContent request, after the sampled latency"""
+        time.sleep(self._lognormal(self.config.latency_ms, self.config.latency_sigma) / 1000)
+        self._count(requests=1)
+
+        if self._chance(self.config.error_rate):
+            with self._lock:
+                code = self._rng.choice(self.config.error_codes)
+            self._count(errors=1)
+            return code, {'error': {
+                'code': code,
+                'message': 'Injected by the fake Gemini server',
+                'status': ERROR_STATUSES.get(code, 'UNKNOWN'),
+            }}
+
+        prompt = '\n'.join(
+            part.get('text', '')
+            for content in body.get('contents', [])
+            for part in content.get('parts', [])
+        )
+        prompt_tokens = max(1, math.ceil(len(prompt) / self.config.chars_per_token))
+        candidates_tokens = max(1, round(self._lognormal(self.config.output_tokens, self.config.output_tokens_sigma)))
+        self._count(prompt_tokens=prompt_tokens, candidates_tokens=candidates_tokens)
+
+        if self._chance(self.config.malformed_rate):
+            self._count(malformed=1)
+            text = 'I am unable to produce a test case for this request.'
+        else:
+            text = json.dumps(self._test_case(prompt))
+
+        return 200, {
+            'candidates': [{
+                'content': {'parts': [{'text': text}], 'role': 'model'},
+                'finishReason': 'STOP',
+                'index': 0,
+            }],
+            'usageMetadata': {
+                'promptTokenCount': prompt_tokens,
+                'candidatesTokenCount': candidates_tokens,
+                'totalTokenCount': prompt_tokens + candidates_tokens,
+            },
+            'modelVersion': model,
+        }
+
+    def _test_case(self, prompt: str) -> Dict[str, Any]:
+        """A test case in the shape the system prompts ask for"""
+        match = re.search(r'Generate a test case for: (.+)', prompt)
+        subject = (match.group(1) if match else 'the requested feature').strip()[:80]
+        with self._lock:
+            test_type = self._rng.choice(['positive', 'negative'])
+            priority = self._rng.choice(['high', 'medium', 'low'])
+            step_count = self._rng.randint(2, 5)
+        return {
+            'name': f"Verify {subject}",
+            'description': f"Load-test generated case covering {subject}",
+            'type': test_type,
+            'priority': priority,
+            'steps': [
+                {'step': f"Step {i} for {subject}", 'expectedResult': f"Step {i} succeeds"}
+                for i in range(1, step_count + 1)
+            ],
+            'expectedResult': f"{subject} behaves as specified",
+            'tags': ['load-test', test_type],
+            'confidence': 0.9,
+            'aiSuggestions': None,
+        }
+
+
+def _make_handler(fake: FakeGemini):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status: int, payload: Dict[str, Any]):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            match = GENERATE_PATH.match(self.path.split('?', 1)[0])
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if not match:
+                self._send(404, {'error': {'code': 404, 'message': f"Unknown path {self.path}", 'status': 'NOT_FOUND'}})
+                return
+            try:
+                request_body = json.loads(body or b'{}')
+            except json.JSONDecodeError:
+                self._send(400, {'error': {'code': 400, 'message': 'Invalid JSON body', 'status': 'INVALID_ARGUMENT'}})
+                return
+            self._send(*fake.generate(match.group('model'), request_body))
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._send(200, fake.get_stats())
+            else:
+                self._send(404, {'error': {'code': 404, 'message': f"Unknown path {self.path}", 'status': 'NOT_FOUND'}})
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    return Handler
+
+
+class FakeGeminiServer:
+    """Runs a FakeGemini on a background HTTP server thread"""
+
+    def __init__(self, config: Optional[FakeGeminiConfig] = None, host: str = '127.0.0.1', port: int = 0):
+        self.fake = FakeGemini(config)
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self.fake))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeGeminiServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve on the calling thread (CLI use)"""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """Fake Gemini options, shared with the load-test harness"""
+    group = parser.add_argument_group('fake Gemini')
+    group.add_argument('--latency-ms', type=float, default=800.0, help='Median generateContent latency')
+    group.add_argument('--latency-sigma', type=float, default=0.5, help='Log-normal sigma of the latency (0 = constant)')
+    group.add_argument('--error-rate', type=float, default=0.0, help='Fraction of calls answered with an error status')
+    group.add_argument('--error-codes', default='429,500,503', help='Comma-separated statuses injected errors are drawn from')
+    group.add_argument('--malformed-rate', type=float, default=0.0, help='Fraction of calls answered without a JSON test case')
+    group.add_argument('--output-tokens', type=float, default=350.0, help='Median candidates token count')
+    group.add_argument('--output-tokens-sigma', type=float, default=0.3)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeGeminiConfig:
+    return FakeGeminiConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        error_codes=[int(code) for code in args.error_codes.split(',') if code],
+        malformed_rate=args.malformed_rate,
+        output_tokens=args.output_tokens,
+        output_tokens_sigma=args.output_tokens_sigma,
+        seed=args.seed,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--seed', type=int, default=None)
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeGeminiServer(config_from_args(args), args.host, args.port)
+    logger.info(f"Fake Gemini listening on {server.endpoint} (GEMINI_API_ENDPOINT={server.endpoint})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
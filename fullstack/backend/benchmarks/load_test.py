@@ -0,0 +1,407 @@
+"""
+End-to-end load test against a local fake Gemini server.
+Boots the Flask app (fullstack/backend) or the FastAPI AI service (ai/) with
+GEMINI_API_ENDPOINT pointing at benchmarks.fake_gemini, replays a weighted
+request mix (CRUD, search, generate, bulk) open-loop at a target RPS and
+reports throughput, tail latency and error rates per endpoint as JSON.
+
+Latency is measured from each request's scheduled send time, so a saturated
+server shows up as queueing delay instead of a silently lower request rate.
+
+Usage (from fullstack/backend):
+    python -m benchmarks.load_test --app flask --rps 20 --duration 60
+    python -m benchmarks.load_test --app flask --mix search=5,generate=1 --error-rate 0.05
+    # The AI service reads from MySQL; pass its DATABASE_URL through the environment
+    python -m benchmarks.load_test --app fastapi --rps 10
+    # Already running app (must be started with GEMINI_API_ENDPOINT set by hand)
+    python -m benchmarks.load_test --app flask --target http://127.0.0.1:5000
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
+
+import numpy as np
+
+from seed_data import SAMPLE_TESTCASES
+from benchmarks.fake_gemini import FakeGeminiServer, FakeGeminiConfig, add_config_arguments, config_from_args
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AI_DIR = os.path.join(BACKEND_DIR, '..', '..', 'ai')
+
+
+# ==================== REQUEST MIX ====================
+
+class LoadState:
+    """Test case ids known to exist, shared by the request builders"""
+
+    def __init__(self, seed: int = 0):
+        self.rng = random.Random(seed)
+        self._ids: List[str] = []
+        self._lock = threading.Lock()
+
+    def add_ids(self, ids: List[str]):
+        with self._lock:
+            self._ids.extend(ids)
+
+    def random_id(self) -> Optional[str]:
+        with self._lock:
+            return self.rng.choice(self._ids) if self._ids else None
+
+    def sample(self) -> Dict[str, Any]:
+        return self.rng.choice(SAMPLE_TESTCASES)
+
+    def new_test_case(self) -> Dict[str, Any]:
+        template = self.sample()
+        return {
+            'name': f"{template['name']} #{self.rng.randrange(10 ** 6)}",
+            'description': template['description'],
+            'type': template['type'],
+            'priority': template['priority'],
+            'steps': template['steps'],
+            'expectedResult': template['expectedResult'],
+            'tags': template['tags'] + ['load-test'],
+        }
+
+
+class Operation:
+    """One endpoint in the mix; build() returns (method, path, body) or None to skip"""
+
+    def __init__(self, name: str, weight: float, build: Callable[[LoadState], Optional[tuple]], track_ids: bool = False):
+        self.name = name
+        self.weight = weight
+        self.build = build
+        # Created ids are fed back into LoadState so reads/updates hit fresh rows too
+        self.track_ids = track_ids
+
+
+def _with_id(method: str, template: str, body_fn=None):
+    def build(state: LoadState):
+        tc_id = state.random_id()
+        if tc_id is None:
+            return None
+        return method, template.format(id=tc_id), body_fn(state) if body_fn else None
+    return build
+
+
+FLASK_OPERATIONS = [
+    Operation('list', 25, lambda s: ('GET', '/api/testcases', None)),
+    Operation('get', 15, _with_id('GET', '/api/testcases/{id}')),
+    Operation('get_full', 10, _with_id('GET', '/api/testcases/{id}/full')),
+    Operation('search', 20, lambda s: (
+        'GET', '/api/testcases/search?' + urllib.parse.urlencode({'query': s.sample()['description'], 'limit': 10}), None
+    )),
+    Operation('create', 8, lambda s: ('POST', '/api/testcases', s.new_test_case()), track_ids=True),
+    Operation('update', 5, _with_id('PATCH', '/api/testcases/{id}', lambda s: {'priority': s.rng.choice(['high', 'medium', 'low'])})),
+    Operation('generate', 10, lambda s: ('POST', '/api/testcases/generate-with-ai', {'prompt': s.sample()['name']})),
+    Operation('bulk', 2, lambda s: ('POST', '/api/testcases/bulk', {'testCases': [s.new_test_case() for _ in range(10)]}), track_ids=True),
+    Operation('stats', 5, lambda s: ('GET', '/api/stats', None)),
+]
+
+# The AI service has no CRUD endpoints; test cases are owned by the NestJS backend
+FASTAPI_OPERATIONS = [
+    Operation('search', 50, lambda s: ('POST', '/search', {'query': s.sample()['description'], 'min_similarity': 0.3, 'limit': 10})),
+    Operation('generate', 20, lambda s: ('POST', '/generate-test-case', {'prompt': s.sample()['name']})),
+    Operation('embedding', 20, lambda s: ('POST', '/generate-embedding', {'text': s.sample()['description']})),
+    Operation('stats', 10, lambda s: ('GET', '/stats', None)),
+]
+
+
+class AppTarget:
+    """How to boot, health-check and seed one of the services"""
+
+    def __init__(self, name: str, cwd: str, command: List[str], health_path: str, operations: List[Operation]):
+        self.name = name
+        self.cwd = os.path.abspath(cwd)
+        self.command = command
+        self.health_path = health_path
+        self.operations = operations
+
+
+APPS = {
+    'flask': AppTarget('flask', BACKEND_DIR, [sys.executable, 'app.py'], '/api/health', FLASK_OPERATIONS),
+    'fastapi': AppTarget('fastapi', AI_DIR, [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1'],
+                         '/health', FASTAPI_OPERATIONS),
+}
+
+
+def parse_mix(spec: str, operations: List[Operation]) -> List[Operation]:
+    """'search=5,generate=1' -> the named operations with those weights"""
+    if not spec:
+        return operations
+    by_name = {op.name: op for op in operations}
+    mix = []
+    for item in spec.split(','):
+        name, _, weight = item.partition('=')
+        if name not in by_name:
+            raise ValueError(f"Unknown operation '{name}' (available: {', '.join(by_name)})")
+        op = by_name[name]
+        mix.append(Operation(op.name, float(weight or 1), op.build, op.track_ids))
+    return mix
+
+
+# ==================== HTTP ====================
+
+def send_request(base_url: str, method: str, path: str, body=None, timeout: float = 60.0):
+    """Return (status, parsed JSON or None); status 0 means the request never got a response"""
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'} if data else {})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, payload = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, payload = e.code, e.read()
+    except (urllib.error.URLError, OSError):
+        return 0, None
+    try:
+        return status, json.loads(payload) if payload else None
+    except json.JSONDecodeError:
+        return status, None
+
+
+def _created_ids(payload) -> List[str]:
+    if isinstance(payload, dict) and 'id' in payload:
+        return [payload['id']]
+    if isinstance(payload, list):
+        return [tc['id'] for tc in payload if isinstance(tc, dict) and 'id' in tc and tc.get('success', True)]
+    if isinstance(payload, dict):
+        # Bulk responses wrap the created rows
+        for value in payload.values():
+            if isinstance(value, list):
+                return _created_ids(value)
+    return []
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_health(base_url: str, path: str, timeout: float, process: Optional[subprocess.Popen] = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"App exited with code {process.returncode} before becoming healthy")
+        status, _ = send_request(base_url, 'GET', path, timeout=2)
+        if status == 200:
+            return
+        time.sleep(0.5)
+    raise RuntimeError(f"{base_url}{path} not healthy after {timeout:.0f}s")
+
+
+def boot_app(target: AppTarget, gemini_endpoint: str, log_file, port: Optional[int] = None, db_path: Optional[str] = None):
+    """Start the app as a subprocess wired to the fake Gemini server; returns (process, base_url)"""
+    port = port or _free_port()
+    env = dict(os.environ)
+    env.update({
+        'HOST': '127.0.0.1',
+        'PORT': str(port),
+        # Never let a load test reach the real API
+        'GEMINI_API_KEY': 'load-test',
+        'GEMINI_API_ENDPOINT': gemini_endpoint,
+        'LOG_LEVEL': env.get('LOG_LEVEL', 'WARNING'),
+    })
+    if db_path:
+        env['DB_PATH'] = db_path
+    command = target.command + (['--port', str(port)] if target.name == 'fastapi' else [])
+    process = subprocess.Popen(command, cwd=target.cwd, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    return process, f"http://127.0.0.1:{port}"
+
+
+# ==================== LOAD ====================
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def summarize(samples: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Throughput, latency percentiles and error rate for one group of samples"""
+    latencies = [s['latency_ms'] for s in samples]
+    errors = sum(1 for s in samples if s['status'] == 0 or s['status'] >= 400)
+    statuses: Dict[str, int] = {}
+    for s in samples:
+        statuses[str(s['status'])] = statuses.get(str(s['status']), 0) + 1
+    return {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'status_codes': statuses,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(max(latencies), 2) if latencies else 0.0,
+        'service_p99_ms': round(percentile([s['service_ms'] for s in samples], 99), 2),
+    }
+
+
+def run_load(base_url: str, operations: List[Operation], state: LoadState, rps: float, duration: float,
+             concurrency: int = 64, timeout: float = 60.0) -> Dict[str, Any]:
+    """Replay the mix open-loop at `rps` for `duration` seconds; returns per-endpoint summaries"""
+    samples: List[Dict[str, Any]] = []
+    samples_lock = threading.Lock()
+    weights = [op.weight for op in operations]
+
+    def issue(op: Operation, method: str, path: str, body, scheduled: float):
+        sent = time.perf_counter()
+        status, payload = send_request(base_url, method, path, body, timeout)
+        finished = time.perf_counter()
+        if op.track_ids and status < 300:
+            state.add_ids(_created_ids(payload))
+        with samples_lock:
+            samples.append({
+                'operation': op.name,
+                'status': status,
+                'latency_ms': (finished - scheduled) * 1000,
+                'service_ms': (finished - sent) * 1000,
+            })
+
+    total = int(rps * duration)
+    skipped = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i in range(total):
+            scheduled = started + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            op = state.rng.choices(operations, weights)[0]
+            built = op.build(state)
+            if built is None:
+                skipped += 1
+                continue
+            executor.submit(issue, op, *built, scheduled)
+    elapsed = time.perf_counter() - started
+
+    by_operation: Dict[str, List[Dict[str, Any]]] = {}
+    for sample in samples:
+        by_operation.setdefault(sample['operation'], []).append(sample)
+
+    return {
+        'offered_rps': rps,
+        'duration_seconds': round(elapsed, 2),
+        'skipped': skipped,
+        'total': summarize(samples, elapsed),
+        'endpoints': {name: summarize(group, elapsed) for name, group in sorted(by_operation.items())},
+    }
+
+
+def seed_test_cases(base_url: str, state: LoadState, count: int, batch_size: int = 25):
+    """Create `count` rows through the bulk endpoint so reads and updates have targets"""
+    for start in range(0, count, batch_size):
+        batch = [state.new_test_case() for _ in range(min(batch_size, count - start))]
+        status, payload = send_request(base_url, 'POST', '/api/testcases/bulk', {'testCases': batch}, timeout=300)
+        if status >= 300:
+            raise RuntimeError(f"Seeding failed with status {status}: {payload}")
+        state.add_ids(_created_ids(payload))
+    status, payload = send_request(base_url, 'GET', '/api/testcases')
+    if status == 200:
+        state.add_ids(_created_ids(payload))
+
+
+def run_load_test(app: str = 'flask', rps: float = 10.0, duration: float = 30.0, mix: str = '',
+                  fake_config: Optional[FakeGeminiConfig] = None, target: Optional[str] = None,
+                  seed_rows: int = 50, concurrency: int = 64, warmup: float = 0.0, timeout: float = 60.0,
+                  boot_timeout: float = 300.0, seed: int = 0, app_log: Optional[str] = None) -> Dict[str, Any]:
+    """Boot the app against a fake Gemini server (unless `target` is given), replay the mix and report"""
+    app_target = APPS[app]
+    operations = parse_mix(mix, app_target.operations)
+    state = LoadState(seed)
+
+    with FakeGeminiServer(fake_config) as fake, tempfile.TemporaryDirectory() as workdir:
+        process = None
+        log_path = app_log or os.path.join(workdir, 'app.log')
+        with open(log_path, 'ab') as log_file:
+            try:
+                if target:
+                    base_url = target.rstrip('/')
+                    logger.warning(f"Using running app at {base_url}; it must have GEMINI_API_ENDPOINT={fake.endpoint}")
+                else:
+                    process, base_url = boot_app(app_target, fake.endpoint, log_file,
+                                                 db_path=os.path.join(workdir, 'loadtest.db'))
+                wait_for_health(base_url, app_target.health_path, boot_timeout, process)
+
+                if app == 'flask':
+                    seed_test_cases(base_url, state, seed_rows)
+                if warmup > 0:
+                    run_load(base_url, operations, state, rps, warmup, concurrency, timeout)
+
+                report = run_load(base_url, operations, state, rps, duration, concurrency, timeout)
+            finally:
+                if process is not None:
+                    process.terminate()
+                    try:
+                        process.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+
+        report.update({
+            'app': app,
+            'mix': {op.name: op.weight for op in operations},
+            'fake_gemini': {**vars(fake.fake.config), **fake.fake.get_stats()},
+        })
+        return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', choices=list(APPS), default='flask')
+    parser.add_argument('--target', help='Base URL of an already running app instead of booting one')
+    parser.add_argument('--rps', type=float, default=10.0, help='Target requests per second (open loop)')
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Unmeasured seconds before the run')
+    parser.add_argument('--mix', default='', help='Operation weights, e.g. search=5,generate=1 (default: realistic mix)')
+    parser.add_argument('--seed-rows', type=int, default=50, help='Test cases created before the run (flask)')
+    parser.add_argument('--concurrency', type=int, default=64, help='Maximum requests in flight')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Per-request timeout in seconds')
+    parser.add_argument('--boot-timeout', type=float, default=300.0, help='Seconds to wait for the app to become healthy')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--app-log', help='Append the app output to this file')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run_load_test(
+        app=args.app,
+        rps=args.rps,
+        duration=args.duration,
+        mix=args.mix,
+        fake_config=config_from_args(args),
+        target=args.target,
+        seed_rows=args.seed_rows,
+        concurrency=args.concurrency,
+        warmup=args.warmup,
+        timeout=args.timeout,
+        boot_timeout=args.boot_timeout,
+        seed=args.seed,
+        app_log=args.app_log,
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
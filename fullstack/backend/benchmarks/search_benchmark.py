@@ -0,0 +1,352 @@
+"""
+Synthetic-corpus benchmark for semantic search.
+Builds corpora at several scales from the seed_data.py schema (randomized
+fields, random/clustered/model vectors), runs every registered search engine
+and reports p50/p99 latency, QPS, RSS and recall@k as JSON.
+
+Usage (from fullstack/backend):
+    python -m benchmarks.search_benchmark --scales 1000,10000,100000 --output search.json
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from ai_service import AIService
+from seed_data import SAMPLE_TESTCASES
+
+EXTRA_TAGS = ['regression', 'smoke-test', 'api', 'ui', 'mobile', 'payments', 'profile', 'search', 'admin', 'reports']
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is KB on Linux and bytes on macOS; only a peak is available here
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+# ==================== CORPUS ====================
+
+class SyntheticCorpus:
+    """Randomized test cases following the seed_data.py schema plus their vectors"""
+
+    def __init__(self, rows: int, dimension: int, vectors: str = 'clustered', seed: int = 0, cache_dir: Optional[str] = None):
+        self.size = rows
+        self.dimension = dimension
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._templates = self._rng.integers(len(SAMPLE_TESTCASES), size=rows)
+        self.vectors = self._make_vectors(vectors, cache_dir)
+
+    def _make_vectors(self, kind: str, cache_dir: Optional[str]) -> np.ndarray:
+        if kind == 'random':
+            return normalize(self._rng.standard_normal((self.size, self.dimension), dtype=np.float32))
+
+        if kind == 'clustered':
+            # Topic centres with per-row noise approximate the structure of real embeddings
+            topics = max(8, self.size // 1000)
+            centres = self._rng.standard_normal((topics, self.dimension), dtype=np.float32)
+            labels = self._rng.integers(topics, size=self.size)
+            noise = self._rng.standard_normal((self.size, self.dimension), dtype=np.float32)
+            return normalize(centres[labels] + 0.6 * noise)
+
+        if kind == 'model':
+            cache_path = None
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+                model_name = os.getenv('MODEL_NAME', 'all-MiniLM-L6-v2').replace('/', '_')
+                cache_path = os.path.join(cache_dir, f"{model_name}-{self.size}-{self.seed}.npy")
+                if os.path.exists(cache_path):
+                    return np.load(cache_path)
+
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(os.getenv('MODEL_NAME', 'all-MiniLM-L6-v2'))
+            texts = (self._embedding_text(i) for i in range(self.size))
+            vectors = normalize(model.encode(list(texts), batch_size=256))
+            if cache_path:
+                np.save(cache_path, vectors)
+            return vectors
+
+        raise ValueError(f"Unknown vector kind: {kind}")
+
+    def _fields(self, index: int) -> Dict[str, Any]:
+        template = SAMPLE_TESTCASES[self._templates[index]]
+        rng = np.random.default_rng((self.seed, index))
+        tags = list(template['tags']) + [EXTRA_TAGS[i] for i in rng.choice(len(EXTRA_TAGS), size=2, replace=False)]
+        return {
+            'id': f"tc_bench_{index:08d}",
+            'name': f"{template['name']} #{index}",
+            'description': template['description'],
+            'type': ['positive', 'negative'][int(rng.integers(2))],
+            'priority': ['high', 'medium', 'low'][int(rng.integers(3))],
+            'steps': template['steps'],
+            'expectedResult': template['expectedResult'],
+            'tags': tags,
+        }
+
+    def _embedding_text(self, index: int) -> str:
+        fields = self._fields(index)
+        return f"{fields['name']} {fields['description']} {' '.join(fields['tags'])}"
+
+    def ids(self) -> List[str]:
+        return [f"tc_bench_{index:08d}" for index in range(self.size)]
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Rows shaped like DatabaseConnection.get_test_cases_for_embedding()"""
+        rows = []
+        for index in range(self.size):
+            fields = self._fields(index)
+            fields['steps'] = json.dumps(fields['steps'])
+            fields['tags'] = json.dumps(fields['tags'])
+            fields['embedding'] = json.dumps(self.vectors[index].tolist())
+            fields['createdAt'] = fields['updatedAt'] = '2026-01-01 00:00:00'
+            fields['aiGenerated'] = 0
+            rows.append(fields)
+        return rows
+
+    def queries(self, count: int, seed: int = 1) -> np.ndarray:
+        """Perturbed corpus vectors, so every query has genuinely close neighbours"""
+        rng = np.random.default_rng(seed)
+        picks = self.vectors[rng.integers(self.size, size=count)]
+        noise = rng.standard_normal(picks.shape, dtype=np.float32)
+        return normalize(picks + 0.3 * noise / np.sqrt(self.dimension))
+
+
+# ==================== ENGINES ====================
+
+class SearchEngine(ABC):
+    """A search strategy under benchmark: build once, then answer top-k queries"""
+
+    name = 'base'
+    # Largest corpus the engine is run against by default (None = unlimited)
+    default_max_rows: Optional[int] = None
+    # Cap on timed queries for slow engines (None = all queries)
+    max_queries: Optional[int] = None
+
+    @abstractmethod
+    def build(self, corpus: SyntheticCorpus):
+        """Index the corpus; not timed per query"""
+
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int) -> List[str]:
+        """Ids of the top k test cases for a query vector"""
+
+
+class _InMemoryDB:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def get_test_cases_for_embedding(self):
+        return self._rows
+
+
+class _QueryEncoder:
+    """Stands in for the sentence transformer: benchmark queries are pre-encoded"""
+
+    def __init__(self):
+        self.vectors = {}
+
+    def encode(self, text):
+        return self.vectors[text]
+
+
+class CurrentEngine(SearchEngine):
+    """AIService.semantic_search as shipped: DB rows, per-query JSON decode and scoring"""
+
+    name = 'current'
+    # Seconds per query beyond ~20k rows; override with --max-rows current=N
+    default_max_rows = 20_000
+    max_queries = 20
+
+    def build(self, corpus: SyntheticCorpus):
+        self.encoder = _QueryEncoder()
+        self.service = AIService(model=self.encoder)
+        self.service.embedding_dimension = corpus.dimension
+        self.service.set_database(_InMemoryDB(corpus.rows()))
+
+    def search(self, query: np.ndarray, k: int) -> List[str]:
+        text = f"benchmark query {len(self.encoder.vectors)}"
+        self.encoder.vectors[text] = query
+        results = self.service.semantic_search(text, min_similarity=-1.0, limit=k)
+        return [result['testCase']['id'] for result in results]
+
+
+class MatrixEngine(SearchEngine):
+    """Exact brute force over a resident normalized float32 matrix (recall baseline)"""
+
+    name = 'matrix'
+
+    def build(self, corpus: SyntheticCorpus):
+        self.ids = corpus.ids()
+        self.matrix = corpus.vectors
+
+    def search(self, query: np.ndarray, k: int) -> List[str]:
+        scores = self.matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.ids[i] for i in top]
+
+
+ENGINES = {
+    CurrentEngine.name: CurrentEngine,
+    MatrixEngine.name: MatrixEngine,
+}
+
+
+# ==================== RUNNER ====================
+
+def exact_top_k(corpus: SyntheticCorpus, queries: np.ndarray, k: int) -> List[set]:
+    """Ground-truth neighbour sets used for recall@k"""
+    ids = corpus.ids()
+    truth = []
+    for start in range(0, len(queries), 64):
+        scores = queries[start:start + 64] @ corpus.vectors.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        truth.extend({ids[i] for i in row} for row in top)
+    return truth
+
+
+def run_engine(engine: SearchEngine, corpus: SyntheticCorpus, queries: np.ndarray, truth: List[set], k: int, warmup: int) -> Dict[str, Any]:
+    gc.collect()
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    engine.build(corpus)
+    build_seconds = time.perf_counter() - started
+    rss_after = current_rss_mb()
+
+    for query in queries[:warmup]:
+        engine.search(query, k)
+
+    latencies = []
+    recalls = []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        found = engine.search(query, k)
+        latencies.append(time.perf_counter() - started)
+        recalls.append(len(expected.intersection(found)) / len(expected))
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'engine': engine.name,
+        'rows': corpus.size,
+        'k': k,
+        'queries': len(queries),
+        'build_seconds': round(build_seconds, 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 4),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 4),
+        'mean_ms': round(float(latencies.mean()), 4),
+        'qps': round(len(latencies) / (latencies.sum() / 1000), 2),
+        'rss_mb': round(rss_after, 1),
+        'engine_rss_mb': round(rss_after - rss_before, 1),
+        f'recall_at_{k}': round(float(np.mean(recalls)), 4),
+    }
+
+
+def run_benchmark(scales: List[int], engines: List[str], queries: int = 200, k: int = 10, dimension: int = 384,
+                  vectors: str = 'clustered', seed: int = 0, warmup: int = 5, max_rows: Optional[Dict[str, int]] = None,
+                  cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Run every engine at every scale and return a JSON-serializable report"""
+    max_rows = max_rows or {}
+    report = {
+        'benchmark': 'semantic_search',
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'dimension': dimension,
+            'vectors': vectors,
+            'seed': seed,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'results': [],
+    }
+
+    for rows in scales:
+        corpus = SyntheticCorpus(rows, dimension, vectors=vectors, seed=seed, cache_dir=cache_dir)
+        query_vectors = corpus.queries(queries, seed=seed + 1)
+        truth = exact_top_k(corpus, query_vectors, k)
+
+        for name in engines:
+            engine_cls = ENGINES[name]
+            limit = max_rows.get(name, engine_cls.default_max_rows)
+            if limit is not None and rows > limit:
+                report['results'].append({'engine': name, 'rows': rows, 'skipped': f'rows > max rows ({limit})'})
+                continue
+
+            engine = engine_cls()
+            count = engine.max_queries or len(query_vectors)
+            report['results'].append(run_engine(engine, corpus, query_vectors[:count], truth[:count], k, min(warmup, count)))
+            del engine
+
+        del corpus
+        gc.collect()
+
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1000,10000,100000', help='Comma-separated corpus sizes (up to 1000000)')
+    parser.add_argument('--engines', default=','.join(ENGINES), help=f"Comma-separated engines ({', '.join(ENGINES)})")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--dimension', type=int, default=int(os.getenv('EMBEDDING_DIMENSION', '384')))
+    parser.add_argument('--vectors', choices=['random', 'clustered', 'model'], default='clustered')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-rows', action='append', default=[], metavar='ENGINE=ROWS',
+                        help='Override the largest corpus an engine runs against, e.g. current=1000000')
+    parser.add_argument('--cache-dir', default=os.path.join(os.path.dirname(__file__), '.cache'),
+                        help='Where model vectors are cached between runs')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    # Per-query INFO logs from the services would dominate the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = run_benchmark(
+        scales=[int(value) for value in args.scales.split(',')],
+        engines=args.engines.split(','),
+        queries=args.queries,
+        k=args.k,
+        dimension=args.dimension,
+        vectors=args.vectors,
+        seed=args.seed,
+        max_rows={name: int(rows) for name, rows in (item.split('=') for item in args.max_rows)},
+        cache_dir=args.cache_dir,
+    )
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(payload + '\n')
+    else:
+        print(payload)
+
+
+if __name__ == '__main__':
+    main()
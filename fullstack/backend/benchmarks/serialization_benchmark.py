@@ -0,0 +1,139 @@
+"""
+Serialization benchmark for the GET /api/testcases response.
+Builds synthetic test case rows with every column (embedding included) and
+times the previous path (serialize_testcase per row + jsonify) against the
+fast path (cached row fragments + orjson) with a cold and a warm fragment
+cache, reporting p50/p99 milliseconds per response and bytes as JSON. The
+database query itself is excluded so only serialization is compared.
+
+Usage (from fullstack/backend):
+    python -m benchmarks.serialization_benchmark --rows 1000,10000
+"""
+
+import argparse
+import json
+import logging
+import platform
+import time
+from typing import List, Dict, Any, Callable
+
+import numpy as np
+from flask import Flask, jsonify
+
+import serialization
+from serialization import (
+    RowFragmentCache, serialize_testcase, extend_fragment, join_fragments, raw_json_response
+)
+from benchmarks.search_benchmark import SyntheticCorpus
+
+COUNTS = {
+    'referencesCount': 2,
+    'referencedByCount': 1,
+    'ragReferencesCount': 1,
+    'manualReferencesCount': 1,
+    'derivedFromCount': 0,
+}
+
+
+def list_rows(rows: int, dimension: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Rows as SELECT * returns them (embedding column included)"""
+    result = SyntheticCorpus(rows, dimension, vectors='random', seed=seed).rows()
+    for row in result:
+        row.update(originalPrompt=None, aiConfidence=None, aiSuggestions=None,
+                   aiGenerationMethod=None, tokenUsage=None)
+    return result
+
+
+def previous_response(rows: List[Dict[str, Any]]) -> bytes:
+    result = []
+    for row in rows:
+        serialized = serialize_testcase(row)
+        serialized.update(COUNTS)
+        result.append(serialized)
+    return jsonify(result).get_data()
+
+
+def fast_response(rows: List[Dict[str, Any]], cache: RowFragmentCache) -> bytes:
+    fragments = [extend_fragment(cache.get(row, serialize_testcase), COUNTS) for row in rows]
+    return raw_json_response(join_fragments(fragments)).get_data()
+
+
+def time_path(render: Callable[[], bytes], repeats: int) -> Dict[str, Any]:
+    render()
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        body = render()
+        latencies.append(time.perf_counter() - started)
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+        'bytes': len(body),
+    }
+
+
+def run_benchmark(rows_list: List[int], repeats: int = 20, dimension: int = 384, seed: int = 0) -> Dict[str, Any]:
+    app = Flask(__name__)
+    results = []
+
+    with app.app_context():
+        for size in rows_list:
+            rows = list_rows(size, dimension, seed)
+            # Responses must carry the same data
+            assert json.loads(previous_response(rows)) == json.loads(fast_response(rows, RowFragmentCache(size)))
+
+            # Filled by the warm-up render of time_path
+            warm = RowFragmentCache(size)
+            paths = {
+                'previous': time_path(lambda: previous_response(rows), repeats),
+                # Every row missing from the cache: fresh cache per response
+                'fast_cold': time_path(lambda: fast_response(rows, RowFragmentCache(size)), repeats),
+                'fast_warm': time_path(lambda: fast_response(rows, warm), repeats),
+            }
+            for name, timing in paths.items():
+                results.append({
+                    'rows': size,
+                    'path': name,
+                    **timing,
+                    'speedup_p50': round(paths['previous']['p50_ms'] / timing['p50_ms'], 2) if timing['p50_ms'] else None,
+                })
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'encoder': 'orjson' if serialization.orjson is not None else 'json',
+        },
+        'config': {'repeats': repeats, 'dimension': dimension, 'seed': seed},
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1000,10000', help='Comma-separated response sizes')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run_benchmark(
+        rows_list=[int(rows) for rows in args.rows.split(',')],
+        repeats=args.repeats,
+        dimension=args.dimension,
+        seed=args.seed,
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
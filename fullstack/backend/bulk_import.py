@@ -0,0 +1,266 @@
+"""
+Bulk test case creation.
+Incoming test cases are embedded with batched encoder calls and inserted
+with executemany in savepoint-guarded chunks. Results are reported per input
+index exactly as with one-at-a-time creation: a row that fails does not
+affect the others.
+
+Updates re-encode a test case only when its embedded text (name,
+description, tags) changes, detected with the content hash stored next to
+the embedding; bulk updates batch the re-encodes that are needed.
+
+Streaming imports read NDJSON or CSV records incrementally and create them
+IMPORT_BATCH_SIZE at a time, so memory is bounded by one batch regardless
+of the upload size. Each batch commits on its own: an interrupted import
+keeps the batches already reported.
+"""
+
+import csv
+import json
+import os
+from itertools import islice
+from typing import Dict, Any, List, Callable, Iterable, Iterator, TextIO
+
+from ai_service import embedding_text, embedding_hash
+from serialization import dumps
+
+
+# Columns read from CSV imports; steps and tags hold JSON arrays (tags may also be comma-separated)
+CSV_COLUMNS = ('name', 'description', 'type', 'priority', 'expectedResult', 'steps', 'tags')
+
+
+class InvalidRecord(ValueError):
+    """An import record that could not be parsed; reported as a failure at its index"""
+
+
+def prepare_testcase(tc_data: Dict[str, Any], testcase_id: str) -> Dict[str, Any]:
+    """Row for db.bulk_create_testcases from a request item (embedding not yet set)"""
+    return {
+        'id': testcase_id,
+        'name': tc_data['name'],
+        'description': tc_data['description'],
+        'type': tc_data.get('type', 'positive'),
+        'priority': tc_data.get('priority', 'medium'),
+        'steps': json.dumps(tc_data.get('steps', [])),
+        'expectedResult': tc_data.get('expectedResult', ''),
+        'tags': json.dumps(tc_data.get('tags', [])),
+        'aiGenerated': tc_data.get('aiGenerated', False),
+        'originalPrompt': tc_data.get('originalPrompt'),
+        'aiConfidence': tc_data.get('aiConfidence'),
+        'aiSuggestions': tc_data.get('aiSuggestions'),
+        'aiGenerationMethod': tc_data.get('aiGenerationMethod'),
+        'tokenUsage': json.dumps(tc_data.get('tokenUsage')) if tc_data.get('tokenUsage') else None,
+    }
+
+
+def embed_testcases(ai_service, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Set embedding and embeddingModel on prepared rows with batched encoding.
+    Vectors are serialized batch by batch, so only one batch of float lists is alive at a time."""
+    batch_size = ai_service.embedding_batch_size
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        texts = [embedding_text(row['name'], row['description'], row['tags']) for row in batch]
+        embeddings, model_id = ai_service.generate_tagged_embeddings(texts)
+        for row, text, embedding in zip(batch, texts, embeddings):
+            row['embedding'] = dumps(embedding).decode('utf-8')
+            row['embeddingModel'] = model_id
+            # A failed encode leaves no hash, so the next edit retries it
+            row['embeddingHash'] = embedding_hash(text) if embedding else None
+    return rows
+
+
+def create_testcases(db, ai_service, items: List[Dict[str, Any]],
+                     new_id: Callable[[], str]) -> List[Dict[str, Any]]:
+    """Embed and insert request items; one result per item, in input order.
+    Items missing a required field fail at their index without being embedded."""
+    results: List[Dict[str, Any]] = [None] * len(items)
+    rows, indexes = [], []
+    for index, tc_data in enumerate(items):
+        try:
+            if isinstance(tc_data, InvalidRecord):
+                raise tc_data
+            rows.append(prepare_testcase(tc_data, new_id()))
+            indexes.append(index)
+        except (KeyError, TypeError, InvalidRecord) as e:
+            results[index] = {
+                'index': index,
+                'success': False,
+                'id': None,
+                'name': tc_data.get('name') if isinstance(tc_data, dict) else None,
+                'error': str(e) if isinstance(e, InvalidRecord) else f"Invalid test case: {e}"
+            }
+
+    if rows:
+        embed_testcases(ai_service, rows)
+        for result in db.bulk_create_testcases(rows):
+            result['index'] = indexes[result['index']]
+            results[result['index']] = result
+    return results
+
+
+# ==================== UPDATES ====================
+
+def merge_update(existing: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Row for db.update_testcase from a stored test case and a PATCH body.
+    The embedding fields are left for plan_embedding to fill in."""
+    return {
+        'id': existing['id'],
+        'name': data.get('name', existing['name']),
+        'description': data.get('description', existing['description']),
+        'type': data.get('type', existing['type']),
+        'priority': data.get('priority', existing['priority']),
+        'steps': json.dumps(data.get('steps')) if data.get('steps') else existing['steps'],
+        'expectedResult': data.get('expectedResult', existing['expectedResult']),
+        'tags': json.dumps(data.get('tags')) if data.get('tags') else existing['tags'],
+    }
+
+
+def stored_embedding_hash(row: Dict[str, Any]) -> str:
+    """Hash of the text row's embedding was made from (rows stored before hashes were
+    kept are hashed from their fields, which their embedding was computed from)"""
+    return row.get('embeddingHash') or embedding_hash(embedding_text(row['name'], row['description'], row['tags']))
+
+
+def plan_embedding(existing: Dict[str, Any], row: Dict[str, Any], model_id: str) -> bool:
+    """Reuse existing's embedding for the updated row when its text hash is unchanged and
+    the embedding is from the serving model; returns whether the row needs encoding"""
+    text = embedding_text(row['name'], row['description'], row['tags'])
+    row['embeddingHash'] = embedding_hash(text)
+    reusable = (existing.get('embedding') not in (None, '', '[]')
+                and existing.get('embeddingModel') == model_id
+                and stored_embedding_hash(existing) == row['embeddingHash'])
+    if reusable:
+        row['embedding'], row['embeddingModel'] = existing['embedding'], existing['embeddingModel']
+    return not reusable
+
+
+def update_testcases(db, ai_service, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply PATCH-style updates ({"id": ..., fields}); one result per item, in input order.
+    Only rows whose embedded text changed are re-encoded, in batches. Each id may
+    appear once per request."""
+    results: List[Dict[str, Any]] = [None] * len(items)
+    ids = [item.get('id') for item in items if isinstance(item, dict)]
+    existing = {row['id']: row for row in db.get_testcases_by_ids([i for i in ids if isinstance(i, str)])}
+
+    rows, indexes, stale, seen = [], [], [], set()
+    for index, item in enumerate(items):
+        testcase_id = item.get('id') if isinstance(item, dict) else None
+        stored = existing.get(testcase_id) if isinstance(testcase_id, str) else None
+        if stored is None or testcase_id in seen:
+            if not testcase_id:
+                error = 'Missing test case id'
+            else:
+                error = 'Duplicate test case id in request' if testcase_id in seen else 'Test case not found'
+            results[index] = {
+                'index': index,
+                'success': False,
+                'id': testcase_id,
+                'name': None,
+                'error': error,
+                'reembedded': False
+            }
+            continue
+        seen.add(testcase_id)
+        row = merge_update(stored, item)
+        if plan_embedding(stored, row, ai_service.model_id):
+            stale.append(row)
+        rows.append(row)
+        indexes.append(index)
+
+    embed_testcases(ai_service, stale)
+    stale_ids = {row['id'] for row in stale}
+    for result in db.bulk_update_testcases(rows, list(stale_ids)):
+        result['index'] = indexes[result['index']]
+        result['reembedded'] = result['success'] and result['id'] in stale_ids
+        results[result['index']] = result
+    return results
+
+
+# ==================== STREAMING IMPORT ====================
+
+def read_ndjson(stream: TextIO) -> Iterator[Any]:
+    """One test case per non-blank line; unparsable lines yield an InvalidRecord"""
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield InvalidRecord(f"Line {line_number}: invalid JSON: {e}")
+            continue
+        yield record if isinstance(record, dict) else InvalidRecord(f"Line {line_number}: expected a JSON object")
+
+
+def _csv_list(value: str, column: str, line_number: int) -> list:
+    value = value.strip()
+    if not value:
+        return []
+    if value.startswith('['):
+        try:
+            return json.loads(value)
+        except ValueError as e:
+            raise InvalidRecord(f"Line {line_number}: invalid JSON in {column}: {e}")
+    if column == 'steps':
+        raise InvalidRecord(f"Line {line_number}: steps must be a JSON array")
+    return [tag.strip() for tag in value.split(',') if tag.strip()]
+
+
+def read_csv(stream: TextIO) -> Iterator[Any]:
+    """One test case per row under a header row naming CSV_COLUMNS (others are ignored)"""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        line_number = reader.line_num
+        try:
+            record = {column: row[column] for column in ('name', 'description', 'type', 'priority', 'expectedResult')
+                      if row.get(column)}
+            for column in ('steps', 'tags'):
+                if row.get(column) is not None:
+                    record[column] = _csv_list(row[column], column, line_number)
+            yield record
+        except InvalidRecord as e:
+            yield e
+
+
+IMPORT_READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+# Request content types mapped to IMPORT_READERS formats
+IMPORT_CONTENT_TYPES = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+}
+
+
+def import_testcases(db, ai_service, records: Iterable[Any], new_id: Callable[[], str],
+                     batch_size: int = None,
+                     on_batch: Callable[[List[str]], None] = None) -> Iterator[Dict[str, Any]]:
+    """Create records batch by batch, yielding a progress event after each batch
+    and a final summary. Progress events carry that batch's failures (indexes
+    count records from the start of the import); on_batch gets the created ids."""
+    batch_size = batch_size or int(os.getenv('IMPORT_BATCH_SIZE', '500'))
+    totals = {'processed': 0, 'succeeded': 0, 'failed': 0}
+    records = iter(records)
+
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        offset = totals['processed']
+        failures, created = [], []
+        for result in create_testcases(db, ai_service, batch, new_id):
+            result['index'] += offset
+            if result['success']:
+                created.append(result['id'])
+            else:
+                failures.append(result)
+        totals['processed'] += len(batch)
+        totals['succeeded'] += len(created)
+        totals['failed'] += len(failures)
+        if on_batch is not None:
+            on_batch(created)
+        yield {'event': 'progress', **totals, 'failures': failures}
+
+    yield {'event': 'complete', **totals}
@@ -8,12 +8,24 @@ import sqlite3
 import os
 import logging
 import json
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Tuple, Callable
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 
+# Test case columns list responses may read; embeddings are never listed
+LIST_COLUMNS = (
+    'id', 'name', 'description', 'type', 'priority', 'steps', 'expectedResult', 'tags',
+    'aiGenerated', 'originalPrompt', 'aiConfidence', 'aiSuggestions', 'aiGenerationMethod',
+    'tokenUsage', 'createdAt', 'updatedAt',
+)
+
+# Every test case column; list_testcases() reads the embedding ones only when asked for
+TESTCASE_COLUMNS = LIST_COLUMNS + ('embedding', 'embeddingModel', 'embeddingHash')
+
+
 def dict_factory(cursor, row):
     """Convert SQLite row to dictionary"""
     d = {}
@@ -22,33 +34,359 @@ def dict_factory(cursor, row):
     return d
 
 
+def _chunks(values: List[Any], size: int = 500):
+    """Split values into chunks that stay below SQLite's bound-parameter limit"""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _neighbor_rows(graph: Dict[str, List[tuple]]):
+    """Flatten {sourceId: [(neighborId, similarity), ...]} into insert rows"""
+    for source_id, neighbors in graph.items():
+        for rank, (neighbor_id, similarity) in enumerate(neighbors, 1):
+            yield (source_id, neighbor_id, rank, similarity)
+
+
+# Job status columns (the payload and result are only read when needed)
+JOB_COLUMNS = "id, type, state, progress, error, cancelRequested, createdAt, startedAt, finishedAt, updatedAt"
+
+INSERT_TESTCASE = """
+    INSERT INTO testcases (id, name, description, type, priority, steps, expectedResult, tags, embedding, embeddingModel, embeddingHash, aiGenerated, originalPrompt, aiConfidence, aiSuggestions, aiGenerationMethod, tokenUsage)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPDATE_TESTCASE = """
+    UPDATE testcases
+    SET name = ?, description = ?, type = ?, priority = ?, steps = ?, expectedResult = ?, tags = ?, embedding = ?, embeddingModel = ?, embeddingHash = ?
+    WHERE id = ?
+"""
+
+
+def _insert_params(data: Dict[str, Any]) -> tuple:
+    """INSERT_TESTCASE parameters for a test case dict (JSON fields already serialized)"""
+    return (
+        data['id'],
+        data['name'],
+        data['description'],
+        data.get('type', 'positive'),
+        data.get('priority', 'medium'),
+        data.get('steps', '[]'),
+        data.get('expectedResult', ''),
+        data.get('tags', '[]'),
+        data.get('embedding'),
+        data.get('embeddingModel'),
+        data.get('embeddingHash'),
+        1 if data.get('aiGenerated', False) else 0,
+        data.get('originalPrompt'),
+        data.get('aiConfidence'),
+        data.get('aiSuggestions'),
+        data.get('aiGenerationMethod'),
+        data.get('tokenUsage'),
+    )
+
+
+def _update_params(id: str, data: Dict[str, Any]) -> tuple:
+    """UPDATE_TESTCASE parameters for a test case dict (JSON fields already serialized)"""
+    return (
+        data['name'],
+        data['description'],
+        data['type'],
+        data['priority'],
+        data['steps'],
+        data['expectedResult'],
+        data['tags'],
+        data.get('embedding'),
+        data.get('embeddingModel'),
+        data.get('embeddingHash'),
+        id,
+    )
+
+
+# ==================== SCHEMA MIGRATIONS ====================
+# Applied in order by init_database() on top of the CREATE TABLE IF NOT EXISTS
+# schema; PRAGMA user_version records the last one applied. Append new
+# migrations, never edit applied ones. Migrations are written to also succeed
+# on databases that got the change before versioning was introduced.
+
+def _add_embedding_model_column(connection):
+    """Databases created before embeddings were tagged with their model"""
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(testcases)")}
+    if 'embeddingModel' not in columns:
+        connection.execute("ALTER TABLE testcases ADD COLUMN embeddingModel TEXT")
+
+
+def _add_list_index(connection):
+    """Keyset pagination of the list endpoint (newest first)"""
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_testcases_created_id ON testcases (createdAt, id)")
+
+
+def _add_reference_indexes(connection):
+    """Incoming references (referenced by, derived from) filter on targetId; per-type
+    counts on (sourceId, referenceType), which also serves sourceId lookups"""
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_testcase_references_target ON testcase_references (targetId)")
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_testcase_references_source_type ON testcase_references (sourceId, referenceType)"
+    )
+
+
+def _add_jobs_table(connection):
+    """Background jobs (see jobs.py); rowid gives submission order"""
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'queued'
+                CHECK(state IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')),
+            payload TEXT,
+            progress TEXT,
+            result TEXT,
+            error TEXT,
+            cancelRequested INTEGER NOT NULL DEFAULT 0,
+            owner TEXT,
+            createdAt TEXT DEFAULT CURRENT_TIMESTAMP,
+            startedAt TEXT,
+            finishedAt TEXT,
+            updatedAt TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state_type ON jobs (state, type)")
+
+
+def _add_embedding_hash_column(connection):
+    """Hash of the embedded text, so edits that leave it unchanged skip re-encoding.
+    Existing rows keep NULL and are hashed from their fields when next edited."""
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(testcases)")}
+    if 'embeddingHash' not in columns:
+        connection.execute("ALTER TABLE testcases ADD COLUMN embeddingHash TEXT")
+
+
+def _add_data_versions(connection):
+    """Change counters behind the ETags of conditional GETs, bumped by triggers on every
+    write to the tables (including cascaded deletes)"""
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # A random epoch keeps ETags of a recreated or restored database from matching old ones
+    connection.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES ('epoch', abs(random()))")
+    for table in ('testcases', 'testcase_references'):
+        connection.execute("INSERT OR IGNORE INTO data_versions (name) VALUES (?)", (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            connection.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS bump_{table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+                END
+            """)
+
+
+def _add_embedding_changes(connection):
+    """Log of test cases whose embedding was added, changed or removed, in write order.
+    The similarity graph catches up from it (see similarity_graph.py) instead of
+    rescanning the corpus on every write; AUTOINCREMENT keeps sequence numbers unique
+    after pruning."""
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS embedding_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            testcaseId TEXT NOT NULL
+        )
+    """)
+    triggers = {
+        'insert': "AFTER INSERT ON testcases WHEN NEW.embedding IS NOT NULL AND NEW.embedding != ''",
+        'update': "AFTER UPDATE OF embedding ON testcases WHEN NEW.embedding IS NOT OLD.embedding",
+        'delete': "AFTER DELETE ON testcases WHEN OLD.embedding IS NOT NULL AND OLD.embedding != ''",
+    }
+    for event, condition in triggers.items():
+        row = 'OLD' if event == 'delete' else 'NEW'
+        connection.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS log_embedding_{event}
+            {condition}
+            BEGIN
+                INSERT INTO embedding_changes (testcaseId) VALUES ({row}.id);
+            END
+        """)
+
+
+MIGRATIONS = [
+    (1, 'tag embeddings with their model', _add_embedding_model_column),
+    (2, 'index test cases by (createdAt, id)', _add_list_index),
+    (3, 'index references by target and by source and type', _add_reference_indexes),
+    (4, 'add the background jobs table', _add_jobs_table),
+    (5, 'store the hash of the embedded text', _add_embedding_hash_column),
+    (6, 'count writes to test cases and references', _add_data_versions),
+    (7, 'log embedding changes for the similarity graph', _add_embedding_changes),
+]
+
+
+def _outgoing_reference(row: Dict[str, Any]) -> Dict[str, Any]:
+    """A reference from a test case, with its target's summary"""
+    return {
+        'id': row['id'],
+        'targetId': row['targetId'],
+        'similarityScore': row['similarityScore'],
+        'referenceType': row['referenceType'],
+        'target': {
+            'id': row['target_id'],
+            'name': row['target_name'],
+            'type': row['target_type'],
+            'priority': row['target_priority'],
+        }
+    }
+
+
+def _incoming_reference(row: Dict[str, Any]) -> Dict[str, Any]:
+    """A reference to a test case, with its source's summary"""
+    return {
+        'id': row['id'],
+        'sourceId': row['sourceId'],
+        'similarityScore': row['similarityScore'],
+        'referenceType': row['referenceType'],
+        'source': {
+            'id': row['source_id'],
+            'name': row['source_name'],
+            'type': row['source_type'],
+            'priority': row['source_priority'],
+        }
+    }
+
+
+def _derived_testcase(row: Dict[str, Any]) -> Dict[str, Any]:
+    """The source of a reference to a test case, described as derived from it"""
+    return {
+        'id': row['source_id'],
+        'name': row['source_name'],
+        'type': row['source_type'],
+        'priority': row['source_priority'],
+        'createdAt': row['source_createdAt'] if row['source_createdAt'] else None,
+        'aiGenerated': bool(row['source_aiGenerated']),
+        'referenceInfo': {
+            'id': row['id'],
+            'referenceType': row['referenceType'],
+            'similarityScore': row['similarityScore'],
+            'createdAt': row['createdAt'] if row['createdAt'] else None,
+        }
+    }
+
+
+# References from a test case with their targets' summaries; read by get_references and
+# get_testcase_detail (whose LEFT JOIN also counts references to missing rows)
+OUTGOING_REFERENCES = """
+    SELECT r.id, r.targetId, r.similarityScore, r.referenceType,
+           t.id as target_id, t.name as target_name, t.type as target_type, t.priority as target_priority
+    FROM testcase_references r
+    {join} testcases t ON r.targetId = t.id
+    WHERE r.sourceId = ?
+"""
+
+# References to a test case with their sources' summaries; read by get_referenced_by,
+# get_derived_testcases and get_testcase_detail
+INCOMING_REFERENCES = """
+    SELECT r.id, r.sourceId, r.similarityScore, r.referenceType, r.createdAt,
+           t.id as source_id, t.name as source_name, t.type as source_type, t.priority as source_priority,
+           t.createdAt as source_createdAt, t.aiGenerated as source_aiGenerated
+    FROM testcase_references r
+    {join} testcases t ON r.sourceId = t.id
+    WHERE r.targetId = ?
+"""
+
+
+class _ThreadConnection:
+    """A thread's reused SQLite connection. close() hands it back instead of closing
+    it: the outermost close() discards uncommitted work, as closing would have."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+        self.depth = 0
+        # SQLite connections must not be used across fork() (e.g. gunicorn --preload)
+        self.pid = os.getpid()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        self.depth -= 1
+        if self.depth == 0 and self._connection.in_transaction:
+            self._connection.rollback()
+
+
 class DatabaseConnection:
     """Handles SQLite database connections and operations"""
 
     def __init__(self):
         # SQLite database file path - defaults to 'testcase.db' in the backend folder
         self.db_path = os.getenv('DB_PATH', os.path.join(os.path.dirname(__file__), 'testcase.db'))
+        # Rows fetched per step when streaming embeddings
+        self.fetch_chunk_size = int(os.getenv('DB_FETCH_CHUNK_SIZE', '1000'))
+        # Rows per executemany in bulk inserts
+        self.bulk_insert_chunk_size = int(os.getenv('BULK_INSERT_CHUNK_SIZE', '500'))
+        # Each thread keeps one connection (and its prepared-statement cache) for every call
+        self.reuse_connections = os.getenv('DB_REUSE_CONNECTIONS', 'true').lower() == 'true'
+        # WAL lets readers run alongside the (single) writer; NORMAL sync is durable
+        # across application crashes in WAL mode and skips an fsync per commit
+        self.journal_mode = os.getenv('DB_JOURNAL_MODE', 'WAL').upper()
+        self.synchronous = os.getenv('DB_SYNCHRONOUS', 'NORMAL').upper()
+        # Wait this long for a competing writer instead of failing with "database is locked"
+        self.busy_timeout_ms = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+        self.mmap_size = int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+        self.cache_size_kb = int(os.getenv('DB_CACHE_SIZE_KB', str(64 * 1024)))
+        self.statement_cache_size = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '256'))
+        if self.journal_mode not in ('WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'OFF'):
+            raise ValueError(f"Unsupported DB_JOURNAL_MODE: {self.journal_mode}")
+        if self.synchronous not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+            raise ValueError(f"Unsupported DB_SYNCHRONOUS: {self.synchronous}")
+        self._local = threading.local()
+        self._connections_opened = 0
         # Initialize database on startup
         self.init_database()
 
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.statement_cache_size,
+        )
+        connection.row_factory = dict_factory
+        # Enable foreign keys
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.execute(f"PRAGMA synchronous = {self.synchronous}")
+        connection.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        connection.execute(f"PRAGMA cache_size = -{self.cache_size_kb}")
+        self._connections_opened += 1
+        return connection
+
     def get_connection(self):
-        """Get a database connection"""
+        """Get this thread's database connection (a new one per call with DB_REUSE_CONNECTIONS=false)"""
         try:
-            connection = sqlite3.connect(self.db_path)
-            connection.row_factory = dict_factory
-            # Enable foreign keys
-            connection.execute("PRAGMA foreign_keys = ON")
+            if not self.reuse_connections:
+                return self._connect()
+            connection = getattr(self._local, 'connection', None)
+            if connection is None or connection.pid != os.getpid():
+                connection = self._local.connection = _ThreadConnection(self._connect())
+            connection.depth += 1
             return connection
         except sqlite3.Error as e:
             logger.error(f"Database connection error: {e}")
             raise Exception("Database connection failed")
 
+    def get_connection_stats(self) -> Dict[str, Any]:
+        return {
+            'connections_opened': self._connections_opened,
+            'reuse_connections': self.reuse_connections,
+            'journal_mode': self.journal_mode,
+            'synchronous': self.synchronous,
+        }
+
     def init_database(self):
         """Initialize database tables if they don't exist"""
         connection = sqlite3.connect(self.db_path)
         cursor = connection.cursor()
         
         try:
+            # Persistent per database file; must be set outside a transaction
+            cursor.execute(f"PRAGMA journal_mode = {self.journal_mode}")
             # Enable foreign keys
             cursor.execute("PRAGMA foreign_keys = ON")
             
@@ -64,6 +402,7 @@ class DatabaseConnection:
                     expectedResult TEXT NOT NULL,
                     tags TEXT,
                     embedding TEXT,
+                    embeddingModel TEXT,
                     aiGenerated INTEGER DEFAULT 0,
                     originalPrompt TEXT,
                     aiConfidence REAL,
@@ -90,16 +429,54 @@ class DatabaseConnection:
                 )
             """)
             
-            # Create trigger to update updatedAt on testcases
+            # Create testcase_neighbors table (precomputed kNN graph)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS testcase_neighbors (
+                    sourceId TEXT NOT NULL,
+                    neighborId TEXT NOT NULL,
+                    rank INTEGER NOT NULL,
+                    similarity REAL NOT NULL,
+                    PRIMARY KEY (sourceId, rank),
+                    FOREIGN KEY (sourceId) REFERENCES testcases(id) ON DELETE CASCADE,
+                    FOREIGN KEY (neighborId) REFERENCES testcases(id) ON DELETE CASCADE
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_testcase_neighbors_neighbor
+                ON testcase_neighbors (neighborId)
+            """)
+
+            # Create embedding_staging table (re-embedded vectors waiting for the model switch)
             cursor.execute("""
-                CREATE TRIGGER IF NOT EXISTS update_testcase_timestamp 
-                AFTER UPDATE ON testcases
+                CREATE TABLE IF NOT EXISTS embedding_staging (
+                    testcaseId TEXT PRIMARY KEY,
+                    embeddingModel TEXT NOT NULL,
+                    embedding TEXT NOT NULL,
+                    FOREIGN KEY (testcaseId) REFERENCES testcases(id) ON DELETE CASCADE
+                )
+            """)
+
+            # Create settings table (e.g. the model the stored embeddings belong to)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+            # Create trigger to update updatedAt on testcases when their content changes
+            # (re-embedding rewrites embedding columns only and is not an edit)
+            cursor.execute("DROP TRIGGER IF EXISTS update_testcase_timestamp")
+            cursor.execute("""
+                CREATE TRIGGER update_testcase_timestamp
+                AFTER UPDATE OF name, description, type, priority, steps, expectedResult, tags ON testcases
                 FOR EACH ROW
                 BEGIN
                     UPDATE testcases SET updatedAt = CURRENT_TIMESTAMP WHERE id = NEW.id;
                 END
             """)
-            
+
+            self._migrate(connection)
             connection.commit()
             logger.info(f"SQLite database initialized at {self.db_path}")
         except sqlite3.Error as e:
@@ -109,17 +486,87 @@ class DatabaseConnection:
             cursor.close()
             connection.close()
 
+    def _migrate(self, connection: sqlite3.Connection):
+        """Apply the MIGRATIONS newer than the database's user_version, each in its own transaction"""
+        current = connection.execute("PRAGMA user_version").fetchone()[0]
+        for version, description, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            try:
+                connection.execute("BEGIN")
+                migrate(connection)
+                # PRAGMA does not accept bound parameters; version is an int from MIGRATIONS
+                connection.execute(f"PRAGMA user_version = {int(version)}")
+                connection.commit()
+            except sqlite3.Error:
+                connection.rollback()
+                logger.error(f"Database migration {version} ({description}) failed")
+                raise
+            logger.info(f"Applied database migration {version}: {description}")
+        # Refresh the planner's statistics when they are missing or out of date
+        connection.execute("PRAGMA optimize")
+
     # ==================== TEST CASE OPERATIONS ====================
 
-    def get_all_testcases(self) -> List[Dict[str, Any]]:
-        """Get all test cases"""
+    def list_testcases(self, columns: Iterable[str] = LIST_COLUMNS, limit: Optional[int] = None,
+                       after: Optional[Tuple[str, str]] = None, with_counts: bool = True) -> List[Dict[str, Any]]:
+        """Get test cases newest first, optionally one keyset page: up to `limit` rows
+        ordered before the (createdAt, id) of the previous page's last row.
+        Only `columns` are read (plus id, createdAt and updatedAt; any of TESTCASE_COLUMNS,
+        the embedding ones only when named); with_counts adds the
+        counts of get_reference_counts() from one grouped aggregation over the page,
+        instead of five COUNT(*) queries per row."""
+        columns = [column for column in TESTCASE_COLUMNS if column in set(columns) | {'id', 'createdAt', 'updatedAt'}]
         connection = self.get_connection()
         cursor = connection.cursor()
 
+        conditions, params = [], []
+        if after is not None:
+            # Row-value comparison walks idx_testcases_created_id backwards from the cursor
+            conditions.append("(createdAt, id) < (?, ?)")
+            params.extend(after)
+        page = f"""
+            SELECT {', '.join(columns)} FROM testcases
+            {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+            ORDER BY createdAt DESC, id DESC
+            {'LIMIT ?' if limit is not None else ''}
+        """
+        if limit is not None:
+            params.append(limit)
+
+        if with_counts:
+            query = f"""
+                WITH page AS ({page})
+                SELECT page.*,
+                       COALESCE(o.references_count, 0) AS references_count,
+                       COALESCE(i.referenced_by_count, 0) AS referenced_by_count,
+                       COALESCE(o.rag_references_count, 0) AS rag_references_count,
+                       COALESCE(o.manual_references_count, 0) AS manual_references_count,
+                       COALESCE(o.derived_from_count, 0) AS derived_from_count
+                FROM page
+                LEFT JOIN (
+                    SELECT sourceId,
+                           COUNT(*) AS references_count,
+                           SUM(referenceType = 'rag_retrieval') AS rag_references_count,
+                           SUM(referenceType = 'manual') AS manual_references_count,
+                           SUM(referenceType = 'semantic_search') AS derived_from_count
+                    FROM testcase_references
+                    WHERE sourceId IN (SELECT id FROM page)
+                    GROUP BY sourceId
+                ) o ON o.sourceId = page.id
+                LEFT JOIN (
+                    SELECT targetId, COUNT(*) AS referenced_by_count
+                    FROM testcase_references
+                    WHERE targetId IN (SELECT id FROM page)
+                    GROUP BY targetId
+                ) i ON i.targetId = page.id
+                ORDER BY page.createdAt DESC, page.id DESC
+            """
+        else:
+            query = page
+
         try:
-            cursor.execute("""
-                SELECT * FROM testcases ORDER BY createdAt DESC
-            """)
+            cursor.execute(query, params)
             return cursor.fetchall()
         except sqlite3.Error as e:
             logger.error(f"Database query error: {e}")
@@ -149,26 +596,7 @@ class DatabaseConnection:
         cursor = connection.cursor()
 
         try:
-            cursor.execute("""
-                INSERT INTO testcases (id, name, description, type, priority, steps, expectedResult, tags, embedding, aiGenerated, originalPrompt, aiConfidence, aiSuggestions, aiGenerationMethod, tokenUsage)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                data['id'],
-                data['name'],
-                data['description'],
-                data.get('type', 'positive'),
-                data.get('priority', 'medium'),
-                data.get('steps', '[]'),
-                data.get('expectedResult', ''),
-                data.get('tags', '[]'),
-                data.get('embedding'),
-                1 if data.get('aiGenerated', False) else 0,
-                data.get('originalPrompt'),
-                data.get('aiConfidence'),
-                data.get('aiSuggestions'),
-                data.get('aiGenerationMethod'),
-                data.get('tokenUsage'),
-            ))
+            cursor.execute(INSERT_TESTCASE, _insert_params(data))
             connection.commit()
             
             return self.get_testcase_by_id(data['id'])
@@ -179,27 +607,16 @@ class DatabaseConnection:
             cursor.close()
             connection.close()
 
-    def update_testcase(self, id: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Update a test case"""
+    def update_testcase(self, id: str, data: Dict[str, Any], content_changed: bool = True) -> Dict[str, Any]:
+        """Update a test case (content_changed: whether the embedded text changed)"""
         connection = self.get_connection()
         cursor = connection.cursor()
 
         try:
-            cursor.execute("""
-                UPDATE testcases 
-                SET name = ?, description = ?, type = ?, priority = ?, steps = ?, expectedResult = ?, tags = ?, embedding = ?
-                WHERE id = ?
-            """, (
-                data['name'],
-                data['description'],
-                data['type'],
-                data['priority'],
-                data['steps'],
-                data['expectedResult'],
-                data['tags'],
-                data.get('embedding'),
-                id,
-            ))
+            cursor.execute(UPDATE_TESTCASE, _update_params(id, data))
+            if content_changed:
+                # A re-embedded vector staged from the old content is stale now
+                cursor.execute("DELETE FROM embedding_staging WHERE testcaseId = ?", (id,))
             connection.commit()
             
             return self.get_testcase_by_id(id)
@@ -225,76 +642,110 @@ class DatabaseConnection:
             cursor.close()
             connection.close()
 
-    def bulk_create_testcases(self, testcases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Bulk create multiple test cases with best-effort strategy"""
-        results = []
+    def _execute_chunks(self, cursor: sqlite3.Cursor, statement: str, params: List[tuple],
+                        chunk_size: int) -> List[Optional[str]]:
+        """executemany in chunk_size chunks, each under a savepoint: a chunk containing
+        a failing row is rolled back and re-run row by row, so only the failing rows
+        are skipped. Returns each row's error (None when written)."""
+        errors: List[Optional[str]] = []
+        for start in range(0, len(params), chunk_size):
+            chunk = params[start:start + chunk_size]
+            cursor.execute("SAVEPOINT bulk_chunk")
+            try:
+                cursor.executemany(statement, chunk)
+                cursor.execute("RELEASE SAVEPOINT bulk_chunk")
+                errors.extend([None] * len(chunk))
+                continue
+            except sqlite3.Error:
+                cursor.execute("ROLLBACK TO SAVEPOINT bulk_chunk")
+                cursor.execute("RELEASE SAVEPOINT bulk_chunk")
+
+            for offset, row in enumerate(chunk):
+                try:
+                    cursor.execute(statement, row)
+                    errors.append(None)
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing testcase at index {start + offset}: {e}")
+                    errors.append(str(e))
+        return errors
+
+    def _bulk_write(self, statement: str, params: List[tuple], rows: List[Dict[str, Any]],
+                    chunk_size: int = None, after: Callable[[sqlite3.Cursor], None] = None) -> List[Dict[str, Any]]:
+        """Best-effort batched write of rows in one transaction; one result per row"""
         connection = self.get_connection()
         cursor = connection.cursor()
 
         try:
-            for index, data in enumerate(testcases):
-                try:
-                    cursor.execute("""
-                        INSERT INTO testcases (id, name, description, type, priority, steps, expectedResult, tags, embedding, aiGenerated, originalPrompt, aiConfidence, aiSuggestions, aiGenerationMethod, tokenUsage)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        data['id'],
-                        data['name'],
-                        data['description'],
-                        data.get('type', 'positive'),
-                        data.get('priority', 'medium'),
-                        data.get('steps', '[]'),
-                        data.get('expectedResult', ''),
-                        data.get('tags', '[]'),
-                        data.get('embedding'),
-                        1 if data.get('aiGenerated', False) else 0,
-                        data.get('originalPrompt'),
-                        data.get('aiConfidence'),
-                        data.get('aiSuggestions'),
-                        data.get('aiGenerationMethod'),
-                        data.get('tokenUsage'),
-                    ))
-                    results.append({
-                        'index': index,
-                        'success': True,
-                        'id': data['id'],
-                        'name': data['name'],
-                        'error': None
-                    })
-                except sqlite3.Error as e:
-                    logger.error(f"Error creating testcase at index {index}: {e}")
-                    results.append({
-                        'index': index,
-                        'success': False,
-                        'id': data.get('id'),
-                        'name': data.get('name'),
-                        'error': str(e)
-                    })
-            
+            cursor.execute("SAVEPOINT bulk_write")
+            errors = self._execute_chunks(cursor, statement, params, chunk_size or self.bulk_insert_chunk_size)
+            if after is not None:
+                after(cursor)
+            cursor.execute("RELEASE SAVEPOINT bulk_write")
             connection.commit()
         except sqlite3.Error as e:
-            logger.error(f"Bulk create error: {e}")
+            logger.error(f"Bulk write error: {e}")
             raise
         finally:
             cursor.close()
             connection.close()
 
-        return results
+        return [{
+            'index': index,
+            'success': error is None,
+            'id': data.get('id'),
+            'name': data.get('name'),
+            'error': error
+        } for index, (data, error) in enumerate(zip(rows, errors))]
+
+    def bulk_create_testcases(self, testcases: List[Dict[str, Any]], chunk_size: int = None) -> List[Dict[str, Any]]:
+        """Bulk create multiple test cases with best-effort strategy.
+        Rows are inserted with executemany, chunk_size (BULK_INSERT_CHUNK_SIZE) at a time;
+        each failure is reported at its index while every other row is kept."""
+        return self._bulk_write(INSERT_TESTCASE, [_insert_params(data) for data in testcases], testcases, chunk_size)
+
+    def bulk_update_testcases(self, testcases: List[Dict[str, Any]], content_changed_ids: List[str],
+                              chunk_size: int = None) -> List[Dict[str, Any]]:
+        """Bulk update existing test cases with best-effort strategy (see bulk_create_testcases).
+        Staged re-embeddings of content_changed_ids are discarded."""
+        def discard_staged(cursor):
+            for chunk in _chunks(content_changed_ids):
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(f"DELETE FROM embedding_staging WHERE testcaseId IN ({placeholders})", chunk)
 
-    def get_test_cases_for_embedding(self) -> List[Dict[str, Any]]:
-        """Get all test cases that have embeddings for semantic search"""
+        params = [_update_params(data['id'], data) for data in testcases]
+        return self._bulk_write(UPDATE_TESTCASE, params, testcases, chunk_size, after=discard_staged)
+
+    def get_testcases_by_ids(self, ids: List[str]) -> List[Dict[str, Any]]:
+        """Get the test cases with the given ids (missing ids are skipped)"""
         connection = self.get_connection()
         cursor = connection.cursor()
 
-        query = """
-        SELECT id, name, description, type, priority, steps, expectedResult, tags, embedding, createdAt, updatedAt
-        FROM testcases
-        WHERE embedding IS NOT NULL AND embedding != ''
-        """
+        try:
+            rows = []
+            for chunk in _chunks(ids):
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(f"SELECT * FROM testcases WHERE id IN ({placeholders})", chunk)
+                rows.extend(cursor.fetchall())
+            return rows
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _stream(self, query: str, params: tuple = ()) -> Iterator[Dict[str, Any]]:
+        """Yield query rows a chunk at a time instead of materializing the whole result"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
 
         try:
-            cursor.execute(query)
-            return cursor.fetchall()
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(self.fetch_chunk_size)
+                if not rows:
+                    break
+                yield from rows
         except sqlite3.Error as e:
             logger.error(f"Database query error: {e}")
             raise
@@ -302,6 +753,14 @@ class DatabaseConnection:
             cursor.close()
             connection.close()
 
+    def get_test_cases_for_embedding(self) -> Iterator[Dict[str, Any]]:
+        """Stream all test cases that have embeddings for semantic search"""
+        return self._stream("""
+            SELECT id, name, description, type, priority, steps, expectedResult, tags, embedding, embeddingModel, createdAt, updatedAt
+            FROM testcases
+            WHERE embedding IS NOT NULL AND embedding != ''
+        """)
+
     def get_test_case_count(self) -> int:
         """Get total count of test cases"""
         connection = self.get_connection()
@@ -334,6 +793,21 @@ class DatabaseConnection:
             cursor.close()
             connection.close()
 
+    def get_data_versions(self) -> Dict[str, int]:
+        """Write counters of the test case and reference tables, and the database epoch"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("SELECT name, version FROM data_versions")
+            return {row['name']: row['version'] for row in cursor.fetchall()}
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
     # ==================== REFERENCE OPERATIONS ====================
 
     def get_reference_counts(self, testcase_id: str) -> Dict[str, int]:
@@ -382,29 +856,8 @@ class DatabaseConnection:
         cursor = connection.cursor()
 
         try:
-            cursor.execute("""
-                SELECT r.id, r.targetId, r.similarityScore, r.referenceType,
-                       t.id as target_id, t.name as target_name, t.type as target_type, t.priority as target_priority
-                FROM testcase_references r
-                JOIN testcases t ON r.targetId = t.id
-                WHERE r.sourceId = ?
-            """, (testcase_id,))
-            
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    'id': row['id'],
-                    'targetId': row['targetId'],
-                    'similarityScore': row['similarityScore'],
-                    'referenceType': row['referenceType'],
-                    'target': {
-                        'id': row['target_id'],
-                        'name': row['target_name'],
-                        'type': row['target_type'],
-                        'priority': row['target_priority'],
-                    }
-                })
-            return results
+            cursor.execute(OUTGOING_REFERENCES.format(join='JOIN'), (testcase_id,))
+            return [_outgoing_reference(row) for row in cursor.fetchall()]
         except sqlite3.Error as e:
             logger.error(f"Database query error: {e}")
             raise
@@ -418,29 +871,8 @@ class DatabaseConnection:
         cursor = connection.cursor()
 
         try:
-            cursor.execute("""
-                SELECT r.id, r.sourceId, r.similarityScore, r.referenceType,
-                       t.id as source_id, t.name as source_name, t.type as source_type, t.priority as source_priority
-                FROM testcase_references r
-                JOIN testcases t ON r.sourceId = t.id
-                WHERE r.targetId = ?
-            """, (testcase_id,))
-            
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    'id': row['id'],
-                    'sourceId': row['sourceId'],
-                    'similarityScore': row['similarityScore'],
-                    'referenceType': row['referenceType'],
-                    'source': {
-                        'id': row['source_id'],
-                        'name': row['source_name'],
-                        'type': row['source_type'],
-                        'priority': row['source_priority'],
-                    }
-                })
-            return results
+            cursor.execute(INCOMING_REFERENCES.format(join='JOIN'), (testcase_id,))
+            return [_incoming_reference(row) for row in cursor.fetchall()]
         except sqlite3.Error as e:
             logger.error(f"Database query error: {e}")
             raise
@@ -454,31 +886,57 @@ class DatabaseConnection:
         cursor = connection.cursor()
 
         try:
-            cursor.execute("""
-                SELECT t.id, t.name, t.type, t.priority, t.createdAt, t.aiGenerated,
-                       r.id as ref_id, r.referenceType, r.similarityScore, r.createdAt as ref_createdAt
-                FROM testcase_references r
-                JOIN testcases t ON r.sourceId = t.id
-                WHERE r.targetId = ?
-            """, (testcase_id,))
-            
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    'id': row['id'],
-                    'name': row['name'],
-                    'type': row['type'],
-                    'priority': row['priority'],
-                    'createdAt': row['createdAt'] if row['createdAt'] else None,
-                    'aiGenerated': bool(row['aiGenerated']),
-                    'referenceInfo': {
-                        'id': row['ref_id'],
-                        'referenceType': row['referenceType'],
-                        'similarityScore': row['similarityScore'],
-                        'createdAt': row['ref_createdAt'] if row['ref_createdAt'] else None,
-                    }
-                })
-            return results
+            cursor.execute(INCOMING_REFERENCES.format(join='JOIN'), (testcase_id,))
+            return [_derived_testcase(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_testcase_detail(self, testcase_id: str) -> Optional[Dict[str, Any]]:
+        """A test case with everything GET /api/testcases/<id>/full shows, read in one
+        transaction on one connection so the parts are a consistent snapshot: the row,
+        references (as get_references), referencedBy and derivedTestCases (as
+        get_referenced_by and get_derived_testcases) and counts (as get_reference_counts).
+        Three queries instead of nine; the incoming join runs once for both of its lists
+        and the counts are taken from the joined rows. None if the test case does not exist."""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            began = not connection.in_transaction
+            if began:
+                cursor.execute("BEGIN")
+            cursor.execute("SELECT * FROM testcases WHERE id = ?", (testcase_id,))
+            testcase = cursor.fetchone()
+            if testcase is None:
+                return None
+
+            # LEFT JOINs keep references whose other end is missing: counted, but not listed
+            cursor.execute(OUTGOING_REFERENCES.format(join='LEFT JOIN'), (testcase_id,))
+            outgoing = cursor.fetchall()
+
+            cursor.execute(INCOMING_REFERENCES.format(join='LEFT JOIN'), (testcase_id,))
+            incoming = cursor.fetchall()
+            if began:
+                connection.commit()
+
+            sources = [row for row in incoming if row['source_id'] is not None]
+            return {
+                'testcase': testcase,
+                'references': [_outgoing_reference(row) for row in outgoing if row['target_id'] is not None],
+                'referencedBy': [_incoming_reference(row) for row in sources],
+                'derivedTestCases': [_derived_testcase(row) for row in sources],
+                'counts': {
+                    'references_count': len(outgoing),
+                    'referenced_by_count': len(incoming),
+                    'rag_references_count': sum(row['referenceType'] == 'rag_retrieval' for row in outgoing),
+                    'manual_references_count': sum(row['referenceType'] == 'manual' for row in outgoing),
+                    'derived_from_count': sum(row['referenceType'] == 'semantic_search' for row in outgoing),
+                },
+            }
         except sqlite3.Error as e:
             logger.error(f"Database query error: {e}")
             raise
@@ -524,3 +982,621 @@ class DatabaseConnection:
         finally:
             cursor.close()
             connection.close()
+
+    # ==================== EMBEDDING MODEL OPERATIONS ====================
+
+    def init_embedding_model(self, model_id: str) -> str:
+        """Return the model the stored embeddings belong to, recording model_id if none is yet"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("SELECT value FROM settings WHERE key = 'embedding_model'")
+            row = cursor.fetchone()
+            if row:
+                return row['value']
+
+            # Embeddings stored before tagging were made with the configured model
+            cursor.execute("INSERT INTO settings (key, value) VALUES ('embedding_model', ?)", (model_id,))
+            cursor.execute("""
+                UPDATE testcases SET embeddingModel = ?
+                WHERE embeddingModel IS NULL AND embedding IS NOT NULL AND embedding != ''
+            """, (model_id,))
+            connection.commit()
+            return model_id
+        except sqlite3.Error as e:
+            connection.rollback()
+            logger.error(f"Database update error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_embedding_progress(self, model_id: str) -> Dict[str, int]:
+        """Count rows already staged for model_id and rows still to re-embed"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("SELECT COUNT(*) as count FROM embedding_staging WHERE embeddingModel = ?", (model_id,))
+            staged = cursor.fetchone()['count']
+            cursor.execute("""
+                SELECT COUNT(*) as count FROM testcases t
+                WHERE t.embeddingModel IS NOT ?
+                AND NOT EXISTS (SELECT 1 FROM embedding_staging s WHERE s.testcaseId = t.id AND s.embeddingModel = ?)
+            """, (model_id, model_id))
+            return {'staged': staged, 'remaining': cursor.fetchone()['count']}
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_unstaged_testcases(self, model_id: str, after_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Next rows (by id) whose embedding is not from model_id and not re-embedded yet"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("""
+                SELECT t.id, t.name, t.description, t.tags
+                FROM testcases t
+                WHERE t.id > ? AND t.embeddingModel IS NOT ?
+                AND NOT EXISTS (SELECT 1 FROM embedding_staging s WHERE s.testcaseId = t.id AND s.embeddingModel = ?)
+                ORDER BY t.id
+                LIMIT ?
+            """, (after_id, model_id, model_id, limit))
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def stage_embeddings(self, model_id: str, rows: List[Dict[str, Any]], embeddings: List[str]) -> int:
+        """Stage re-embedded vectors; rows whose content changed since they were read are skipped"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.executemany("""
+                INSERT OR REPLACE INTO embedding_staging (testcaseId, embeddingModel, embedding)
+                SELECT id, ?, ? FROM testcases
+                WHERE id = ? AND name = ? AND description = ? AND tags IS ?
+            """, [
+                (model_id, embedding, row['id'], row['name'], row['description'], row['tags'])
+                for row, embedding in zip(rows, embeddings)
+            ])
+            staged = cursor.rowcount
+            connection.commit()
+            return staged
+        except sqlite3.Error as e:
+            connection.rollback()
+            logger.error(f"Database insert error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def clear_embedding_staging(self, keep_model_id: str):
+        """Drop staged vectors of an abandoned re-embedding run"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("DELETE FROM embedding_staging WHERE embeddingModel != ?", (keep_model_id,))
+            connection.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Database delete error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def activate_staged_embeddings(self, model_id: str) -> bool:
+        """Swap every staged vector in and make model_id current in one transaction.
+        Returns False (changing nothing) if some row still lacks a vector from model_id."""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            # Take the write lock first so no row can change between the check and the swap
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("""
+                SELECT COUNT(*) as count FROM testcases t
+                WHERE t.embeddingModel IS NOT ?
+                AND NOT EXISTS (SELECT 1 FROM embedding_staging s WHERE s.testcaseId = t.id AND s.embeddingModel = ?)
+            """, (model_id, model_id))
+            if cursor.fetchone()['count']:
+                connection.rollback()
+                return False
+
+            cursor.execute("""
+                UPDATE testcases
+                SET embedding = (SELECT s.embedding FROM embedding_staging s WHERE s.testcaseId = testcases.id),
+                    embeddingModel = ?
+                WHERE id IN (SELECT testcaseId FROM embedding_staging WHERE embeddingModel = ?)
+            """, (model_id, model_id))
+            cursor.execute("DELETE FROM embedding_staging")
+            cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('embedding_model', ?)", (model_id,))
+            connection.commit()
+            return True
+        except sqlite3.Error as e:
+            connection.rollback()
+            logger.error(f"Database update error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    # ==================== SIMILARITY GRAPH OPERATIONS ====================
+
+    def get_embeddings(self) -> Iterator[Dict[str, Any]]:
+        """Stream id and embedding of every embedded test case"""
+        return self._stream("SELECT id, embedding FROM testcases WHERE embedding IS NOT NULL AND embedding != ''")
+
+    def get_embeddings_by_ids(self, ids: List[str]) -> List[Dict[str, Any]]:
+        """id and embedding of the given test cases that have one"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            rows = []
+            for chunk in _chunks(ids):
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(f"""
+                    SELECT id, embedding FROM testcases
+                    WHERE id IN ({placeholders}) AND embedding IS NOT NULL AND embedding != ''
+                """, chunk)
+                rows.extend(cursor.fetchall())
+            return rows
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_embedding_change_seq(self) -> int:
+        """Sequence number of the latest logged embedding change (0 before the first)"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'embedding_changes'")
+            result = cursor.fetchone()
+            return result['seq'] if result else 0
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_embedding_changes(self, after_seq: int, through_seq: int) -> List[str]:
+        """Distinct ids of the test cases whose embedding changed in (after_seq, through_seq]"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("""
+                SELECT DISTINCT testcaseId FROM embedding_changes WHERE seq > ? AND seq <= ?
+            """, (after_seq, through_seq))
+            return [row['testcaseId'] for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def prune_embedding_changes(self, through_seq: int):
+        """Drop logged changes up to through_seq; readers behind it must reload"""
+        if through_seq <= self.get_embedding_changes_pruned_through():
+            return
+
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("DELETE FROM embedding_changes WHERE seq <= ?", (through_seq,))
+            cursor.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES ('embedding_changes_pruned_through', ?)",
+                (str(through_seq),)
+            )
+            connection.commit()
+        except sqlite3.Error as e:
+            connection.rollback()
+            logger.error(f"Database delete error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_embedding_changes_pruned_through(self) -> int:
+        value = self.get_setting('embedding_changes_pruned_through')
+        return int(value) if value is not None else 0
+
+    def get_setting(self, key: str) -> Optional[str]:
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
+            result = cursor.fetchone()
+            return result['value'] if result else None
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def set_setting(self, key: str, value: str):
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+            connection.commit()
+        except sqlite3.Error as e:
+            connection.rollback()
+            logger.error(f"Database update error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_neighbor_graph_size(self) -> int:
+        """Number of test cases that have a stored neighbour list"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("SELECT COUNT(DISTINCT sourceId) as count FROM testcase_neighbors")
+            result = cursor.fetchone()
+            return result['count'] if result else 0
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_neighbors(self, testcase_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Get the precomputed nearest neighbours of a test case"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("""
+                SELECT n.rank, n.similarity, t.id, t.name, t.type, t.priority
+                FROM testcase_neighbors n
+                JOIN testcases t ON n.neighborId = t.id
+                WHERE n.sourceId = ?
+                ORDER BY n.rank
+                LIMIT ?
+            """, (testcase_id, limit))
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_neighbor_sources(self, neighbor_ids: List[str]) -> List[str]:
+        """Get the test cases whose neighbour list contains any of neighbor_ids"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            sources = set()
+            for chunk in _chunks(neighbor_ids):
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(f"SELECT DISTINCT sourceId FROM testcase_neighbors WHERE neighborId IN ({placeholders})", chunk)
+                sources.update(row['sourceId'] for row in cursor.fetchall())
+            return list(sources)
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_neighbor_thresholds(self) -> List[tuple]:
+        """Get (sourceId, neighbour count, lowest similarity) for every stored neighbour list"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("""
+                SELECT sourceId, COUNT(*) as count, MIN(similarity) as min_similarity
+                FROM testcase_neighbors
+                GROUP BY sourceId
+            """)
+            return [(row['sourceId'], row['count'], row['min_similarity']) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_neighbor_lists(self, source_ids: List[str]) -> Dict[str, List[tuple]]:
+        """Get the stored (neighborId, similarity) lists for the given test cases"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            lists = {}
+            for chunk in _chunks(source_ids):
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(f"""
+                    SELECT sourceId, neighborId, similarity
+                    FROM testcase_neighbors
+                    WHERE sourceId IN ({placeholders})
+                    ORDER BY sourceId, rank
+                """, chunk)
+                for row in cursor.fetchall():
+                    lists.setdefault(row['sourceId'], []).append((row['neighborId'], row['similarity']))
+            return lists
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def replace_neighbors(self, graph: Dict[str, List[tuple]]):
+        """Replace the neighbour lists of the given test cases in one transaction"""
+        if not graph:
+            return
+
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            for chunk in _chunks(list(graph)):
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(f"DELETE FROM testcase_neighbors WHERE sourceId IN ({placeholders})", chunk)
+            cursor.executemany(
+                "INSERT INTO testcase_neighbors (sourceId, neighborId, rank, similarity) VALUES (?, ?, ?, ?)",
+                _neighbor_rows(graph)
+            )
+            connection.commit()
+        except sqlite3.Error as e:
+            connection.rollback()
+            logger.error(f"Database update error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def replace_neighbor_graph(self, graph: Dict[str, List[tuple]]):
+        """Replace the whole kNN graph in one transaction"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("DELETE FROM testcase_neighbors")
+            cursor.executemany(
+                "INSERT INTO testcase_neighbors (sourceId, neighborId, rank, similarity) VALUES (?, ?, ?, ?)",
+                _neighbor_rows(graph)
+            )
+            connection.commit()
+        except sqlite3.Error as e:
+            connection.rollback()
+            logger.error(f"Database update error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    # ==================== JOB OPERATIONS ====================
+
+    def create_job(self, job_id: str, job_type: str, payload: str) -> Dict[str, Any]:
+        """Queue a job; payload is serialized JSON"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("INSERT INTO jobs (id, type, payload) VALUES (?, ?, ?)", (job_id, job_type, payload))
+            connection.commit()
+            return self.get_job(job_id)
+        except sqlite3.Error as e:
+            logger.error(f"Database insert error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_job(self, job_id: str, with_result: bool = False) -> Optional[Dict[str, Any]]:
+        """Get a job's status (and its result and payload when with_result)"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            columns = JOB_COLUMNS + (', result, payload' if with_result else '')
+            cursor.execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,))
+            return cursor.fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def list_jobs(self, state: str = None, job_type: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recently submitted jobs first, optionally filtered by state and type"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            conditions, params = [], []
+            if state:
+                conditions.append("state = ?")
+                params.append(state)
+            if job_type:
+                conditions.append("type = ?")
+                params.append(job_type)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            cursor.execute(f"SELECT {JOB_COLUMNS} FROM jobs {where} ORDER BY rowid DESC LIMIT ?", (*params, limit))
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def claim_job(self, limits: Dict[str, int], owner: str) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running; returns it with its payload.
+        Only types with fewer running jobs than their limit ({type: limit}) are claimed.
+        Running jobs are counted in the table, so the limits hold across processes."""
+        if not limits:
+            return None
+
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            values = ', '.join('(?, ?)' for _ in limits)
+            cursor.execute(f"""
+                WITH limits (type, maxRunning) AS (VALUES {values})
+                UPDATE jobs SET state = 'running', owner = ?, startedAt = CURRENT_TIMESTAMP, updatedAt = CURRENT_TIMESTAMP
+                WHERE id = (
+                    SELECT q.id FROM jobs q JOIN limits l ON l.type = q.type
+                    WHERE q.state = 'queued'
+                      AND (SELECT COUNT(*) FROM jobs r WHERE r.state = 'running' AND r.type = q.type) < l.maxRunning
+                    ORDER BY q.rowid LIMIT 1
+                )
+                RETURNING {JOB_COLUMNS}, payload
+            """, (*(value for item in limits.items() for value in item), owner))
+            job = cursor.fetchone()
+            connection.commit()
+            return job
+        except sqlite3.Error as e:
+            connection.rollback()
+            logger.error(f"Database update error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def update_job_progress(self, job_id: str, progress: str) -> bool:
+        """Record a running job's progress (serialized JSON); returns whether cancellation was requested"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("""
+                UPDATE jobs SET progress = ?, updatedAt = CURRENT_TIMESTAMP WHERE id = ?
+                RETURNING cancelRequested
+            """, (progress, job_id))
+            row = cursor.fetchone()
+            connection.commit()
+            return bool(row and row['cancelRequested'])
+        except sqlite3.Error as e:
+            connection.rollback()
+            logger.error(f"Database update error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def finish_job(self, job_id: str, state: str, result: str = None, error: str = None):
+        """Record a job's outcome; the payload is no longer needed and is dropped"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("""
+                UPDATE jobs SET state = ?, result = ?, error = ?, payload = NULL,
+                    finishedAt = CURRENT_TIMESTAMP, updatedAt = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (state, result, error, job_id))
+            connection.commit()
+        except sqlite3.Error as e:
+            connection.rollback()
+            logger.error(f"Database update error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def cancel_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job, or ask a running one to stop at its next progress report"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("""
+                UPDATE jobs SET state = 'cancelled', payload = NULL, finishedAt = CURRENT_TIMESTAMP, updatedAt = CURRENT_TIMESTAMP
+                WHERE id = ? AND state = 'queued'
+            """, (job_id,))
+            cursor.execute("""
+                UPDATE jobs SET cancelRequested = 1, updatedAt = CURRENT_TIMESTAMP
+                WHERE id = ? AND state = 'running'
+            """, (job_id,))
+            connection.commit()
+            return self.get_job(job_id)
+        except sqlite3.Error as e:
+            connection.rollback()
+            logger.error(f"Database update error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def has_queued_job(self, job_type: str) -> bool:
+        """Whether a job of job_type is waiting to run"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("SELECT 1 FROM jobs WHERE state = 'queued' AND type = ? LIMIT 1", (job_type,))
+            return cursor.fetchone() is not None
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def get_running_job_owners(self) -> List[Dict[str, Any]]:
+        """id and owner of every running job"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("SELECT id, owner FROM jobs WHERE state = 'running'")
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Database query error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+    def delete_finished_jobs(self, older_than_days: float) -> int:
+        """Delete jobs that finished more than older_than_days ago"""
+        connection = self.get_connection()
+        cursor = connection.cursor()
+
+        try:
+            cursor.execute("""
+                DELETE FROM jobs
+                WHERE state IN ('succeeded', 'failed', 'cancelled') AND finishedAt < datetime('now', ?)
+            """, (f"-{older_than_days} days",))
+            connection.commit()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            connection.rollback()
+            logger.error(f"Database delete error: {e}")
+            raise
+        finally:
+            cursor.close()
+            connection.close()
@@ -0,0 +1,47 @@
+"""
+Streaming loader for stored embeddings.
+Decodes each row's JSON embedding straight into a preallocated float32 matrix
+while rows are streamed from the database, so neither the full result set
+nor per-row Python float lists are held at once: peak memory is the matrix
+plus the (embedding-free) rows the caller keeps.
+"""
+
+import json
+from typing import Iterable, Dict, Any, List, Tuple, Callable, Optional
+
+import numpy as np
+
+
+def load_embedding_matrix(rows: Iterable[Dict[str, Any]], dimension: int, capacity: int = 0,
+                          accept: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                          keep: Tuple[str, ...] = None) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """L2-normalized matrix of the valid embeddings in rows, and the matching rows without
+    their embedding (only the `keep` columns if given). Grows past `capacity` if needed."""
+    matrix = np.empty((max(capacity, 1), dimension), dtype=np.float32)
+    kept = []
+
+    for row in rows:
+        if accept is not None and not accept(row):
+            continue
+        try:
+            vector = json.loads(row['embedding'])
+        except (json.JSONDecodeError, KeyError, TypeError):
+            continue
+        if not vector or len(vector) != dimension:
+            continue
+
+        if len(kept) == len(matrix):
+            grown = np.empty((2 * len(matrix), dimension), dtype=np.float32)
+            grown[:len(kept)] = matrix
+            matrix = grown
+        matrix[len(kept)] = vector
+        if keep is not None:
+            kept.append({column: row[column] for column in keep})
+        else:
+            kept.append({column: value for column, value in row.items() if column != 'embedding'})
+
+    matrix = matrix[:len(kept)]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix, kept
@@ -9,6 +9,8 @@ import logging
 from typing import List, Dict, Any, Optional
 import os
 
+from metrics import stage_timer, gemini_requests_total, record_token_usage
+
 logger = logging.getLogger(__name__)
 
 # Try to import google.generativeai, but don't fail if not available
@@ -33,7 +35,14 @@ class GeminiService:
         if self._api_key is None:
             self._api_key = os.getenv('GEMINI_API_KEY')
             if self._api_key and not self._configured and GEMINI_AVAILABLE:
-                genai.configure(api_key=self._api_key)
+                endpoint = os.getenv('GEMINI_API_ENDPOINT')
+                if endpoint:
+                    # e.g. a local stand-in for load tests; REST is the only transport that accepts http://
+                    genai.configure(api_key=self._api_key, transport='rest',
+                                    client_options={'api_endpoint': endpoint})
+                    logger.info(f"Gemini requests routed to {endpoint}")
+                else:
+                    genai.configure(api_key=self._api_key)
                 self._configured = True
                 logger.info("Gemini AI configured successfully")
             elif not self._api_key:
@@ -76,11 +85,12 @@ class GeminiService:
                 logger.info(f"Performing RAG retrieval for prompt: {prompt[:50]}...")
 
                 try:
-                    search_results = self.ai_service.semantic_search(
-                        prompt,
-                        min_similarity=rag_similarity_threshold,
-                        limit=max_rag_references
-                    )
+                    with stage_timer('generate', 'retrieval'):
+                        search_results = self.ai_service.semantic_search(
+                            prompt,
+                            min_similarity=rag_similarity_threshold,
+                            limit=max_rag_references
+                        )
 
                     if search_results:
                         generation_method = "rag"
@@ -129,10 +139,16 @@ class GeminiService:
                 user_prompt += f"\n\nPreferred priority: {preferred_priority}"
 
             # Generate content
-            response = model.generate_content([
-                {"text": system_prompt},
-                {"text": user_prompt}
-            ])
+            try:
+                with stage_timer('generate', 'gemini'):
+                    response = model.generate_content([
+                        {"text": system_prompt},
+                        {"text": user_prompt}
+                    ])
+                gemini_requests_total.labels('success').inc()
+            except Exception:
+                gemini_requests_total.labels('error').inc()
+                raise
 
             response_text = response.text
 
@@ -146,17 +162,19 @@ class GeminiService:
                         'candidates_token_count': getattr(usage, 'candidates_token_count', None),
                         'total_token_count': getattr(usage, 'total_token_count', None),
                     }
+                    record_token_usage(token_usage)
                     logger.info(f"Token usage - Total: {token_usage.get('total_token_count')}")
             except Exception as token_error:
                 logger.warning(f"Could not retrieve token usage: {token_error}")
 
             # Parse the JSON response
             try:
-                json_match = re.search(r'\{[\s\S]*\}', response_text)
-                if not json_match:
-                    raise ValueError('No valid JSON found in AI response')
+                with stage_timer('generate', 'parse'):
+                    json_match = re.search(r'\{[\s\S]*\}', response_text)
+                    if not json_match:
+                        raise ValueError('No valid JSON found in AI response')
 
-                ai_response = json.loads(json_match.group())
+                    ai_response = json.loads(json_match.group())
             except (json.JSONDecodeError, ValueError) as parse_error:
                 logger.error(f"Failed to parse AI response: {response_text}")
                 raise Exception("Invalid response from AI service")
@@ -0,0 +1,247 @@
+"""
+Background jobs for long operations (bulk creation, AI generation).
+Submitted jobs are stored in the jobs table and picked up by a pool of
+JOB_WORKERS threads, so a large import no longer ties up a request thread.
+Each job type has a concurrency limit (JOB_CONCURRENCY, e.g.
+"bulk_create=1,generate_and_save=2") that keeps background work from
+crowding out interactive requests; running jobs are counted in the table
+when claiming, so the limit holds across every process sharing the
+database. Queued jobs survive restarts; jobs running in a process that has
+gone away are marked failed, because their partial work is already
+committed and re-running them could duplicate it.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, List, Optional
+
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATES = ('succeeded', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job was cancelled. Handlers that commit work
+    as they go set `result` to what was done before re-raising; it is stored as the
+    cancelled job's result."""
+
+    def __init__(self, result: Any = None):
+        super().__init__()
+        self.result = result
+
+
+@dataclass
+class JobType:
+    run: Callable[[Dict[str, Any], 'JobContext'], Any]
+    # Raises ValueError for payloads that should be rejected at submission
+    validate: Optional[Callable[[Dict[str, Any]], None]] = None
+    concurrency: int = 1
+
+
+class JobContext:
+    """Handed to a running handler for progress reports and cancellation checks"""
+
+    def __init__(self, db, job_id: str):
+        self.db = db
+        self.job_id = job_id
+
+    def progress(self, **progress):
+        """Record progress; raises JobCancelled if the job was cancelled meanwhile.
+        Handlers should call this between units of work (e.g. per batch)."""
+        if self.db.update_job_progress(self.job_id, dumps(progress).decode('utf-8')):
+            raise JobCancelled()
+
+
+def _parse_limits(value: str) -> Dict[str, int]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        job_type, _, limit = item.partition('=')
+        if not limit.strip().isdigit() or int(limit) < 1:
+            raise ValueError(f"Invalid JOB_CONCURRENCY entry: {item!r} (expected type=N with N >= 1)")
+        limits[job_type.strip()] = int(limit)
+    return limits
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """SQLite-backed job queue with a worker thread pool and per-type limits"""
+
+    def __init__(self, db, workers: int = None, poll_interval: float = None):
+        self.db = db
+        self.workers = workers or int(os.getenv('JOB_WORKERS', '2'))
+        # Jobs submitted by other processes sharing the database are seen within this delay
+        self.poll_interval = poll_interval or float(os.getenv('JOB_POLL_INTERVAL', '1.0'))
+        self.retention_days = float(os.getenv('JOB_RETENTION_DAYS', '7'))
+        # Idle workers fail the running jobs of dead processes at most this often,
+        # so a crashed process does not hold its types' concurrency slots
+        self.recover_interval = float(os.getenv('JOB_RECOVER_INTERVAL', '60'))
+        self._recovered_at = 0.0
+        self._limits = _parse_limits(os.getenv('JOB_CONCURRENCY', ''))
+        self._types: Dict[str, JobType] = {}
+        # Jobs running in this process (for stats; limits are enforced when claiming)
+        self._running: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._stats = {'succeeded': 0, 'failed': 0, 'cancelled': 0}
+
+    def register(self, job_type: str, run: Callable[[Dict[str, Any], JobContext], Any],
+                 validate: Callable[[Dict[str, Any]], None] = None, concurrency: int = 1):
+        """Add a job type; JOB_CONCURRENCY overrides its concurrency limit"""
+        self._types[job_type] = JobType(run, validate, self._limits.get(job_type, concurrency))
+        self._running.setdefault(job_type, 0)
+
+    # ==================== SUBMISSION ====================
+
+    def submit(self, job_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a job; raises ValueError for unknown types or invalid payloads"""
+        if job_type not in self._types:
+            raise ValueError(f"Unknown job type: {job_type}. Available: {', '.join(sorted(self._types))}")
+        if not isinstance(payload, dict):
+            raise ValueError("Job payload must be a JSON object")
+        if self._types[job_type].validate:
+            self._types[job_type].validate(payload)
+
+        job = self.db.create_job(f"job_{uuid.uuid4().hex}", job_type, dumps(payload).decode('utf-8'))
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.db.cancel_job(job_id)
+
+    # ==================== WORKERS ====================
+
+    def start(self):
+        """Recover jobs of dead processes, prune old ones and start the workers"""
+        if self._threads:
+            return
+        self.recover()
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} job workers (limits: {self.get_stats()['limits']})")
+
+    def stop(self, timeout: float = None):
+        """Stop the workers after their current job"""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def recover(self, startup: bool = True):
+        """Fail running jobs whose process is gone. At startup this process's own pid
+        counts as gone too (a restarted process may reuse its pid)."""
+        pid = os.getpid()
+        self._recovered_at = time.monotonic()
+        for job in self.db.get_running_job_owners():
+            owner = int(job['owner']) if (job['owner'] or '').isdigit() else None
+            if owner == pid and not startup:
+                continue
+            if owner is None or owner == pid or not _process_alive(owner):
+                self.db.finish_job(job['id'], 'failed', error='Interrupted: the worker process stopped')
+                logger.warning(f"Job {job['id']} was interrupted by a stopped process")
+        if startup and self.retention_days > 0:
+            self.db.delete_finished_jobs(self.retention_days)
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        limits = {job_type: spec.concurrency for job_type, spec in self._types.items()}
+        job = self.db.claim_job(limits, str(os.getpid()))
+        if job:
+            with self._lock:
+                self._running[job['type']] += 1
+        return job
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                logger.error(f"Failed to claim a job: {e}")
+                job = None
+            if job is None:
+                if time.monotonic() - self._recovered_at > self.recover_interval:
+                    try:
+                        self.recover(startup=False)
+                    except Exception as e:
+                        logger.error(f"Failed to recover interrupted jobs: {e}")
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+
+            try:
+                self._run(job)
+            finally:
+                with self._wakeup:
+                    self._running[job['type']] -= 1
+                    # A slot of this type is free again
+                    self._wakeup.notify_all()
+
+    def _run(self, job: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            result = self._types[job['type']].run(json.loads(job['payload']), JobContext(self.db, job['id']))
+            state, result, error = 'succeeded', dumps(result).decode('utf-8'), None
+        except JobCancelled as e:
+            state, error = 'cancelled', None
+            result = dumps(e.result).decode('utf-8') if e.result is not None else None
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({job['type']}) failed: {e}")
+            state, result, error = 'failed', None, str(e)
+
+        try:
+            self.db.finish_job(job['id'], state, result, error)
+        except Exception as e:
+            logger.error(f"Failed to record the outcome of job {job['id']}: {e}")
+            return
+        with self._lock:
+            self._stats[state] += 1
+        logger.info(f"Job {job['id']} ({job['type']}) {state} in {time.perf_counter() - started:.2f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'workers': len(self._threads),
+                'limits': {job_type: spec.concurrency for job_type, spec in self._types.items()},
+                'running': dict(self._running),
+                **self._stats,
+            }
+
+
+def serialize_job(job: Dict[str, Any], with_result: bool = False) -> Dict[str, Any]:
+    """Job row as returned by the API"""
+    data = {
+        'id': job['id'],
+        'type': job['type'],
+        'state': job['state'],
+        'progress': json.loads(job['progress']) if job.get('progress') else None,
+        'error': job.get('error'),
+        'cancelRequested': bool(job.get('cancelRequested')),
+        'createdAt': job.get('createdAt'),
+        'startedAt': job.get('startedAt'),
+        'finishedAt': job.get('finishedAt'),
+    }
+    if with_result:
+        data['result'] = json.loads(job['result']) if job.get('result') else None
+    return data
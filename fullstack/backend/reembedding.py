@@ -0,0 +1,139 @@
+"""
+Background re-embedding after MODEL_NAME or EMBEDDING_DIMENSION changes.
+Every stored embedding is tagged with the model that produced it. When the
+configured model differs from the stored one, searches keep using the stored
+model while this job encodes the test cases in throttled batches into
+embedding_staging; once every row has a new vector the staged vectors and the
+serving model are switched over together. Progress lives in the staging
+table, so a stopped or restarted job resumes where it left off.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Callable, Optional
+
+from ai_service import embedding_text
+
+logger = logging.getLogger(__name__)
+
+
+class ReembeddingJob:
+    """Re-embeds stale rows in the background and switches models when complete"""
+
+    def __init__(self, db, ai_service, on_complete: Optional[Callable[[], None]] = None,
+                 batch_size: int = None, batch_delay: float = None):
+        self.db = db
+        self.ai_service = ai_service
+        # Called after the switch, e.g. to rebuild indexes derived from the embeddings
+        self.on_complete = on_complete
+        self.batch_size = batch_size or int(os.getenv('REEMBED_BATCH_SIZE', '64'))
+        # Pause between batches so re-embedding does not starve request handling
+        self.batch_delay = batch_delay if batch_delay is not None else float(os.getenv('REEMBED_BATCH_DELAY_MS', '100')) / 1000
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._status = {
+            'state': 'idle',
+            'target_model': None,
+            'processed': 0,
+            'batches': 0,
+            'started_at': None,
+            'finished_at': None,
+            'error': None,
+        }
+
+    def prepare(self) -> bool:
+        """Serve the stored model if it is not the configured one; True if rows need re-embedding"""
+        configured = self.ai_service.model_id
+        stored = self.db.init_embedding_model(configured)
+        if stored != configured:
+            self.ai_service.serve_stored_model(stored)
+        return self.db.get_embedding_progress(configured)['remaining'] > 0
+
+    def start(self) -> bool:
+        """Start (or resume) the job; False if it is already running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            target_model, _ = self.ai_service.reembedding_target()
+            self._status.update(state='running', target_model=target_model, processed=0, batches=0,
+                                started_at=time.time(), finished_at=None, error=None)
+            self._thread = threading.Thread(target=self._run, name='reembedding', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self, timeout: float = None):
+        """Stop after the current batch; staged vectors are kept for the next start"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _set(self, **changes):
+        with self._lock:
+            self._status.update(changes)
+
+    def _run(self):
+        try:
+            self._set(state=self._reembed())
+        except Exception as e:
+            logger.error(f"Re-embedding failed: {e}")
+            self._set(state='failed', error=str(e))
+        self._set(finished_at=time.time())
+
+    def _reembed(self) -> str:
+        model_id, model = self.ai_service.reembedding_target()
+        self.db.clear_embedding_staging(model_id)
+        logger.info(f"Re-embedding test cases with {model_id}: {self.db.get_embedding_progress(model_id)}")
+
+        after_id = ''
+        while not self._stop.is_set():
+            rows = self.db.get_unstaged_testcases(model_id, after_id, self.batch_size)
+            if rows:
+                texts = [embedding_text(row['name'], row['description'], row['tags']) for row in rows]
+                vectors = model.encode(texts)
+                staged = self.db.stage_embeddings(model_id, rows, [json.dumps(vector.tolist()) for vector in vectors])
+                after_id = rows[-1]['id']
+                with self._lock:
+                    self._status['processed'] += staged
+                    self._status['batches'] += 1
+                self._stop.wait(self.batch_delay)
+                continue
+
+            if after_id:
+                # Sweep again from the start for rows created or edited behind the cursor
+                after_id = ''
+                continue
+
+            changed = self.ai_service.model_id != model_id or self.db.get_embedding_progress(model_id)['staged'] > 0
+            if self.db.activate_staged_embeddings(model_id):
+                self.ai_service.activate_target_model()
+                logger.info(f"Re-embedding complete, switched to {model_id}")
+                if changed and self.on_complete is not None:
+                    self.on_complete()
+                # Writes that raced the switch were tagged with the previous model
+                if self.db.get_embedding_progress(model_id)['remaining'] == 0:
+                    return 'completed'
+        return 'stopped'
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            status = dict(self._status)
+
+        if status['target_model']:
+            progress = self.db.get_embedding_progress(status['target_model'])
+            status.update(progress)
+            total = progress['staged'] + progress['remaining']
+            status['progress'] = round(progress['staged'] / total, 4) if total else 1.0
+            if status['state'] == 'running' and status['started_at']:
+                elapsed = time.time() - status['started_at']
+                rate = status['processed'] / elapsed if elapsed > 0 else 0.0
+                status['rows_per_second'] = round(rate, 2)
+                status['eta_seconds'] = round(progress['remaining'] / rate, 1) if rate > 0 else None
+        status['serving_model'] = self.ai_service.model_id
+        return status
@@ -0,0 +1,184 @@
+"""
+Fast JSON response path for large list and search responses.
+Encodes with orjson when it is installed (stdlib json otherwise) and caches
+each test case's serialized JSON object, keyed by id and updatedAt, so list
+responses are assembled from byte fragments instead of re-decoding steps and
+tags and re-encoding every row on every request.
+"""
+
+import base64
+import binascii
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Tuple
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _default(value):
+    """Encode values neither encoder handles natively (numpy scalars, datetimes with the stdlib)"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def serialize_testcase(testcase):
+    """Convert database testcase to JSON serializable dict"""
+    if not testcase:
+        return None
+    
+    result = {
+        'id': testcase['id'],
+        'name': testcase['name'],
+        'description': testcase['description'],
+        'type': testcase['type'],
+        'priority': testcase['priority'],
+        'steps': json.loads(testcase['steps']) if isinstance(testcase['steps'], str) else testcase['steps'],
+        'expectedResult': testcase['expectedResult'],
+        'tags': json.loads(testcase['tags']) if isinstance(testcase['tags'], str) else testcase['tags'],
+        'aiGenerated': bool(testcase.get('aiGenerated', False)),
+        'originalPrompt': testcase.get('originalPrompt'),
+        'aiConfidence': testcase.get('aiConfidence'),
+        'aiSuggestions': testcase.get('aiSuggestions'),
+        'aiGenerationMethod': testcase.get('aiGenerationMethod'),
+        'tokenUsage': json.loads(testcase['tokenUsage']) if testcase.get('tokenUsage') and isinstance(testcase['tokenUsage'], str) else testcase.get('tokenUsage'),
+        'createdAt': testcase.get('createdAt'),  # SQLite returns as string already
+        'updatedAt': testcase.get('updatedAt'),  # SQLite returns as string already
+    }
+    return result
+
+
+def project_testcase(testcase, fields: List[str]) -> Dict[str, Any]:
+    """The requested serialize_testcase() fields of a column-projected row"""
+    result = {}
+    for field in fields:
+        value = testcase.get(field)
+        if field in ('steps', 'tags', 'tokenUsage') and value and isinstance(value, str):
+            value = json.loads(value)
+        elif field == 'aiGenerated':
+            value = bool(value)
+        result[field] = value
+    return result
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque pagination token for the (createdAt, id) of a page's last row"""
+    return base64.urlsafe_b64encode(dumps([row['createdAt'], row['id']])).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Tuple[str, str]:
+    """(createdAt, id) of an encode_cursor() token; ValueError when malformed"""
+    try:
+        created_at, testcase_id = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError('Invalid cursor')
+    if not isinstance(created_at, str) or not isinstance(testcase_id, str):
+        raise ValueError('Invalid cursor')
+    return created_at, testcase_id
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    """Flask response for payload, skipping jsonify's pretty-printing and key sorting"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def raw_json_response(body: bytes, status: int = 200) -> Response:
+    """Flask response for an already serialized JSON body"""
+    return Response(body, status=status, mimetype='application/json')
+
+
+def extend_fragment(fragment: bytes, extra: Dict[str, Any]) -> bytes:
+    """Append the keys of extra to a serialized JSON object"""
+    if not extra:
+        return fragment
+    if fragment == b'{}':
+        return dumps(extra)
+    return fragment[:-1] + b',' + dumps(extra)[1:]
+
+
+def join_fragments(fragments: List[bytes]) -> bytes:
+    """Serialized JSON array of serialized JSON values"""
+    return b'[' + b','.join(fragments) + b']'
+
+
+class RowFragmentCache:
+    """LRU cache of serialized test case objects, keyed by (id, updatedAt)"""
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or int(os.getenv('ROW_FRAGMENT_CACHE_SIZE', '20000'))
+        self._fragments: 'OrderedDict[tuple, bytes]' = OrderedDict()
+        # updatedAt has second resolution: edits bump the key too, but callers
+        # that change a row also invalidate its id explicitly
+        self._keys: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        # Bumped by invalidate(): a fragment built from a row read before then is not cached
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, row: Dict[str, Any], serialize: Callable[[Dict[str, Any]], Any]) -> bytes:
+        """Serialized serialize(row), reusing the cached bytes while the row is unchanged"""
+        key = (row['id'], row.get('updatedAt'))
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self._hits += 1
+                return fragment
+            self._misses += 1
+            generation = self._generation
+
+        fragment = dumps(serialize(row))
+        with self._lock:
+            if generation != self._generation:
+                return fragment
+            stale = self._keys.get(row['id'])
+            if stale is not None and stale != key:
+                self._fragments.pop(stale, None)
+            self._fragments[key] = fragment
+            self._keys[row['id']] = key
+            while len(self._fragments) > self.max_size:
+                evicted, _ = self._fragments.popitem(last=False)
+                if self._keys.get(evicted[0]) == evicted:
+                    del self._keys[evicted[0]]
+        return fragment
+
+    def invalidate(self, testcase_id: str):
+        with self._lock:
+            self._generation += 1
+            key = self._keys.pop(testcase_id, None)
+            if key is not None:
+                self._fragments.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'size': len(self._fragments),
+                'max_size': self.max_size,
+                'cache_hits': self._hits,
+                'cache_misses': self._misses,
+                'encoder': 'orjson' if orjson is not None else 'json',
+            }
+
+
+# Shared by every request handler
+row_fragments = RowFragmentCache()
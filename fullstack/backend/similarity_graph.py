@@ -0,0 +1,229 @@
+"""
+Precomputed k-nearest-neighbour graph for "similar test cases".
+Builds the top-k neighbour lists in batch and keeps them up to date
+incrementally when embeddings are added, changed or removed, so the
+detail page only needs a single indexed lookup.
+
+Writes never touch the graph themselves: triggers log every embedding change
+(embedding_changes) and a background job (app.py, "similarity_graph") catches
+the graph up from the log. The job scores only the changed vectors against a
+resident, normalized matrix that is itself synced from the log, so neither
+requests nor the job rescan and decode the corpus; the graph records the log
+position it reflects in the knn_graph_seq setting.
+"""
+
+import logging
+import os
+import threading
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from embedding_matrix import load_embedding_matrix
+
+logger = logging.getLogger(__name__)
+
+GRAPH_SEQ_SETTING = 'knn_graph_seq'
+
+
+class SimilarityGraph:
+    """Maintains the persisted kNN graph stored in testcase_neighbors"""
+
+    def __init__(self, db, embedding_dimension: int = None, k: int = None):
+        self.db = db
+        self.embedding_dimension = embedding_dimension or int(os.getenv('EMBEDDING_DIMENSION', '384'))
+        self.k = k or int(os.getenv('KNN_NEIGHBORS', '10'))
+        # Rows scored per block during a full build (bounds memory to block_size x N);
+        # more changes than this since the last update are applied with a rebuild
+        self.block_size = int(os.getenv('KNN_BUILD_BLOCK_SIZE', '1024'))
+        # Logged changes kept behind the graph, so other processes' matrices can catch up
+        self.change_log_retention = int(os.getenv('KNN_CHANGE_LOG_RETENTION', '100000'))
+        self._lock = threading.RLock()
+        self._reset()
+
+    # ==================== RESIDENT MATRIX ====================
+
+    def _reset(self):
+        self._matrix = np.zeros((0, self.embedding_dimension), dtype=np.float32)
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        # Change log position the matrix reflects (None: not loaded)
+        self._seq = None
+
+    def _load(self):
+        """Load all valid embeddings into the resident matrix (streamed, preallocated)"""
+        # Read first: changes logged while streaming are applied again on the next sync
+        seq = self.db.get_embedding_change_seq()
+        matrix, rows = load_embedding_matrix(self.db.get_embeddings(), self.embedding_dimension,
+                                             capacity=self.db.get_embedded_test_case_count(), keep=('id',))
+        self._matrix = matrix
+        self._ids = [row['id'] for row in rows]
+        self._positions = {tc_id: i for i, tc_id in enumerate(self._ids)}
+        self._seq = seq
+
+    def _upsert(self, tc_id: str, vector: np.ndarray):
+        position = self._positions.get(tc_id)
+        if position is None:
+            size = len(self._ids)
+            if size == len(self._matrix):
+                grown = np.zeros((max(1024, 2 * size), self.embedding_dimension), dtype=np.float32)
+                grown[:size] = self._matrix[:size]
+                self._matrix = grown
+            position = self._positions[tc_id] = size
+            self._ids.append(tc_id)
+        self._matrix[position] = vector
+
+    def _remove(self, tc_id: str):
+        """Swap the last row into the freed slot so the matrix stays dense"""
+        position = self._positions.pop(tc_id, None)
+        if position is None:
+            return
+        last = len(self._ids) - 1
+        if position != last:
+            moved = self._ids[last]
+            self._matrix[position] = self._matrix[last]
+            self._ids[position] = moved
+            self._positions[moved] = position
+        self._ids.pop()
+
+    def _sync(self) -> int:
+        """Bring the resident matrix up to the change log; returns the position it reflects"""
+        if self._seq is None or self._seq < self.db.get_embedding_changes_pruned_through():
+            self._load()
+            return self._seq
+
+        seq = self.db.get_embedding_change_seq()
+        if seq > self._seq:
+            changed = self.db.get_embedding_changes(self._seq, seq)
+            vectors, rows = load_embedding_matrix(self.db.get_embeddings_by_ids(changed),
+                                                  self.embedding_dimension, capacity=len(changed), keep=('id',))
+            valid = {row['id']: vector for row, vector in zip(rows, vectors)}
+            for tc_id in changed:
+                if tc_id in valid:
+                    self._upsert(tc_id, valid[tc_id])
+                else:
+                    # Deleted, cleared or invalid
+                    self._remove(tc_id)
+            self._seq = seq
+        return self._seq
+
+    def _view(self) -> Tuple[List[str], np.ndarray]:
+        return self._ids, self._matrix[:len(self._ids)]
+
+    # ==================== SCORING ====================
+
+    def _top_k(self, ids: List[str], scores: np.ndarray) -> List[Tuple[str, float]]:
+        """Return the k best (id, similarity) pairs from a score vector"""
+        k = min(self.k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    def _row_neighbors(self, ids: List[str], matrix: np.ndarray, row: int) -> List[Tuple[str, float]]:
+        """Compute the neighbour list of a single row with a full scan"""
+        scores = matrix @ matrix[row]
+        scores[row] = -np.inf
+        return self._top_k(ids, scores)
+
+    def build(self) -> Dict[str, Any]:
+        """Rebuild the whole graph in batch from a freshly loaded matrix"""
+        with self._lock:
+            self._load()
+            ids, matrix = self._view()
+            graph = {}
+
+            for start in range(0, len(ids), self.block_size):
+                block = matrix[start:start + self.block_size] @ matrix.T
+                for offset, scores in enumerate(block):
+                    scores[start + offset] = -np.inf
+                    graph[ids[start + offset]] = self._top_k(ids, scores)
+
+            self.db.replace_neighbor_graph(graph)
+            self.db.set_setting(GRAPH_SEQ_SETTING, str(self._seq))
+            logger.info(f"Built kNN graph for {len(graph)} test cases (k={self.k})")
+            return {'testCases': len(graph), 'k': self.k}
+
+    def update(self) -> Dict[str, Any]:
+        """Catch the graph up with the embedding changes logged since its last update
+        (built from scratch the first time, or when too many changed)"""
+        with self._lock:
+            graph_seq = self.db.get_setting(GRAPH_SEQ_SETTING)
+            if graph_seq is None or int(graph_seq) < self.db.get_embedding_changes_pruned_through():
+                return self.build()
+
+            seq = self._sync()
+            changed = self.db.get_embedding_changes(int(graph_seq), seq) if seq > int(graph_seq) else []
+            if len(changed) > self.block_size:
+                return self.build()
+
+            updated = self._refresh(changed)
+            self.db.set_setting(GRAPH_SEQ_SETTING, str(seq))
+            if seq > self.change_log_retention:
+                self.db.prune_embedding_changes(seq - self.change_log_retention)
+            return {'changed': len(changed), 'updated': updated, 'k': self.k}
+
+    def _refresh(self, changed_ids: List[str]) -> int:
+        """Update the neighbour lists affected by changed_ids (the matrix is synced);
+        returns the number of lists rewritten"""
+        ids, matrix = self._view()
+        positions = self._positions
+        changed = [positions[tc_id] for tc_id in changed_ids if tc_id in positions]
+        scores = matrix @ matrix[changed].T if changed else np.zeros((len(ids), 0), dtype=np.float32)
+        updates = {}
+
+        # Changed rows get a freshly computed neighbour list; removed ones lose theirs
+        for column, row in enumerate(changed):
+            row_scores = scores[:, column].copy()
+            row_scores[row] = -np.inf
+            updates[ids[row]] = self._top_k(ids, row_scores)
+        removed = [tc_id for tc_id in changed_ids if tc_id not in positions]
+        for tc_id in removed:
+            updates[tc_id] = []
+
+        # Rows that pointed at a changed row hold a stale score: recompute them
+        for source_id in self.db.get_neighbor_sources(changed_ids):
+            if source_id in updates or source_id not in positions:
+                continue
+            updates[source_id] = self._row_neighbors(ids, matrix, positions[source_id])
+
+        # Remaining rows only change if a changed row beats their current k-th neighbour.
+        # Short lists (a neighbour was deleted and cascaded away, or the row was scored
+        # when the corpus was smaller; a missing list is an empty one) are recomputed.
+        full = min(self.k, len(ids) - 1)
+        thresholds = np.full(len(ids), np.inf, dtype=np.float32)
+        short = set(positions) - set(updates) if full > 0 else set()
+        for source_id, count, min_similarity in self.db.get_neighbor_thresholds():
+            if count >= full:
+                short.discard(source_id)
+                if source_id in positions:
+                    thresholds[positions[source_id]] = min_similarity if count >= self.k else -np.inf
+        for source_id in short:
+            updates[source_id] = self._row_neighbors(ids, matrix, positions[source_id])
+
+        if changed:
+            beats = scores > thresholds[:, None]
+            beats[changed, np.arange(len(changed))] = False
+            candidates = [ids[row] for row in np.flatnonzero(beats.any(axis=1)) if ids[row] not in updates]
+
+            current = self.db.get_neighbor_lists(candidates)
+            for source_id in candidates:
+                row = positions[source_id]
+                merged = dict(current.get(source_id, []))
+                for column in np.flatnonzero(beats[row]):
+                    merged[ids[changed[column]]] = float(scores[row, column])
+                best = sorted(merged.items(), key=lambda item: item[1], reverse=True)
+                updates[source_id] = best[:self.k]
+
+        self.db.replace_neighbors(updates)
+        if updates:
+            logger.info(f"Refreshed kNN graph for {len(changed_ids)} changed and "
+                        f"{len(updates) - len(changed_ids)} affected test cases")
+        return len(updates)
+
+    def get_similar(self, testcase_id: str, limit: int = None) -> List[Dict[str, Any]]:
+        """Get the precomputed neighbours of a test case (a lookup only: test cases without
+        an embedding, or not yet reached by the background update, have none)"""
+        limit = min(limit or self.k, self.k)
+        return self.db.get_neighbors(testcase_id, limit)
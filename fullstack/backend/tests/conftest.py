@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+from database import DatabaseConnection
+
+
+@pytest.fixture
+def make_db(tmp_path, monkeypatch):
+    """Factory for a DatabaseConnection on a fresh database file in tmp_path, seeded with
+    `count` test cases tc00, tc01, ... (created in that order). Calling it again opens
+    another connection object on the same file."""
+
+    def make(count=0):
+        monkeypatch.setenv('DB_PATH', str(tmp_path / 'test.db'))
+        db = DatabaseConnection()
+        for i in range(count):
+            db.create_testcase({
+                'id': f'tc{i:02d}',
+                'name': f'case {i}',
+                'description': 'd',
+                'steps': json.dumps([{'step': 'open', 'expectedResult': 'opened'}]),
+                'expectedResult': '',
+                'tags': json.dumps(['auth']),
+            })
+        return db
+
+    return make
@@ -0,0 +1,121 @@
+import io
+import itertools
+import json
+
+import ai_service as ai_mod
+from bulk_import import create_testcases, import_testcases, update_testcases, read_ndjson, read_csv
+from database import TESTCASE_COLUMNS
+from tests.test_reembedding import FakeEncoder
+
+
+def test_bulk_create_reports_each_failure_at_its_index(make_db, monkeypatch):
+    monkeypatch.setenv('EMBEDDING_DIMENSION', '3')
+    monkeypatch.setenv('EMBEDDING_BATCH_SIZE', '2')
+    db = make_db()
+    db.bulk_insert_chunk_size = 3
+    encoder = FakeEncoder('model', 3)
+    svc = ai_mod.AIService(model=encoder)
+
+    items = [{'name': f'case {i}', 'description': 'd', 'tags': ['auth']} for i in range(7)]
+    items[1]['type'] = 'invalid'
+    items[4]['priority'] = 'urgent'
+    del items[5]['name']
+    counter = itertools.count()
+    results = create_testcases(db, svc, items, lambda: f'tc{next(counter):02d}')
+
+    assert [r['index'] for r in results] == list(range(7))
+    assert [r['success'] for r in results] == [True, False, True, True, False, False, True]
+    assert 'CHECK constraint' in results[1]['error'] and 'CHECK constraint' in results[4]['error']
+    assert results[5]['error'].startswith('Invalid test case')
+    # Six prepared rows in batches of two
+    assert encoder.batches == 3
+
+    stored = {tc['name']: tc for tc in db.list_testcases(TESTCASE_COLUMNS, with_counts=False)}
+    assert set(stored) == {'case 0', 'case 2', 'case 3', 'case 6'}
+    expected, model_id = svc.generate_tagged_embedding(ai_mod.embedding_text('case 3', 'd', ['auth']))
+    assert json.loads(stored['case 3']['embedding']) == expected
+    assert stored['case 3']['embeddingModel'] == model_id
+
+
+def make_import(make_db, monkeypatch):
+    monkeypatch.setenv('EMBEDDING_DIMENSION', '3')
+    counter = itertools.count()
+    return make_db(), ai_mod.AIService(model=FakeEncoder('model', 3)), lambda: f'tc{next(counter):02d}'
+
+
+def test_import_streams_records_in_batches(make_db, monkeypatch):
+    db, svc, new_id = make_import(make_db, monkeypatch)
+    pulled = []
+
+    def records():
+        for i in range(5):
+            pulled.append(i)
+            yield {'name': f'case {i}', 'description': 'd'}
+
+    created = []
+    events = import_testcases(db, svc, records(), new_id, batch_size=2, on_batch=created.append)
+
+    # Only one batch is read ahead of the progress it reports
+    first = next(events)
+    assert (first['processed'], len(pulled), created) == (2, 2, [['tc00', 'tc01']])
+    rest = list(events)
+    assert [e['processed'] for e in rest] == [4, 5, 5]
+    assert rest[-1] == {'event': 'complete', 'processed': 5, 'succeeded': 5, 'failed': 0}
+
+
+def test_import_readers_report_bad_records_at_their_index(make_db, monkeypatch):
+    db, svc, new_id = make_import(make_db, monkeypatch)
+    ndjson = io.StringIO('{"name": "a", "description": "d", "tags": ["x"]}\n\nnot json\n[1]\n{"name": "b"}\n')
+    events = list(import_testcases(db, svc, read_ndjson(ndjson), new_id, batch_size=3))
+
+    failures = [f for e in events if e['event'] == 'progress' for f in e['failures']]
+    assert [(f['index'], f['error'].split(':')[0]) for f in failures] == [
+        (1, 'Line 3'), (2, 'Line 4'), (3, 'Invalid test case')]
+    assert events[-1]['succeeded'] == 1
+
+    rows = io.StringIO('name,description,tags,steps,extra\n'
+                       'c,"two\nlines","smoke, ui","[{""step"": ""open"", ""expectedResult"": ""ok""}]",z\n'
+                       'd,d,,open the page,\n')
+    events = list(import_testcases(db, svc, read_csv(rows), new_id))
+    assert [f['error'] for f in events[0]['failures']] == ['Line 4: steps must be a JSON array']
+    stored = {tc['name']: tc for tc in db.list_testcases(TESTCASE_COLUMNS, with_counts=False)}
+    assert json.loads(stored['c']['tags']) == ['smoke', 'ui']
+    assert stored['c']['description'] == 'two\nlines'
+    assert json.loads(stored['c']['steps'])[0]['step'] == 'open'
+
+
+def test_updates_reencode_only_changed_text(make_db, monkeypatch):
+    db, svc, new_id = make_import(make_db, monkeypatch)
+    encoder = svc.model
+    items = [{'name': f'case {i}', 'description': 'd', 'tags': ['auth']} for i in range(3)]
+    create_testcases(db, svc, items, new_id)
+    # Stored before hashes were kept: hashed from its fields
+    embedding, model_id = svc.generate_tagged_embedding(ai_mod.embedding_text('legacy', 'd', []))
+    db.create_testcase({'id': 'legacy', 'name': 'legacy', 'description': 'd',
+                        'embedding': json.dumps(embedding), 'embeddingModel': model_id})
+    before = {tc['id']: tc for tc in db.list_testcases(TESTCASE_COLUMNS, with_counts=False)}
+    batches = encoder.batches
+
+    results = update_testcases(db, svc, [
+        {'id': 'tc00', 'priority': 'high', 'steps': [{'step': 'x', 'expectedResult': 'y'}]},
+        {'id': 'tc01', 'name': 'renamed', 'tags': ['billing']},
+        {'id': 'tc02', 'priority': 'urgent'},
+        {'id': 'legacy', 'type': 'negative'},
+        {'id': 'missing', 'name': 'x'},
+        {'id': 'tc00', 'name': 'again'},
+    ])
+
+    assert [(r['success'], r['reembedded']) for r in results] == [
+        (True, False), (True, True), (False, False), (True, False), (False, False), (False, False)]
+    assert 'CHECK constraint' in results[2]['error']
+    assert [r['error'] for r in results[4:]] == ['Test case not found', 'Duplicate test case id in request']
+    assert encoder.batches == batches + 1
+
+    after = {tc['id']: tc for tc in db.list_testcases(TESTCASE_COLUMNS, with_counts=False)}
+    assert after['tc00']['priority'] == 'high'
+    assert after['tc00']['embedding'] == before['tc00']['embedding']
+    assert after['legacy']['embedding'] == before['legacy']['embedding']
+    assert after['tc01']['embedding'] != before['tc01']['embedding']
+    text = ai_mod.embedding_text('renamed', 'd', ['billing'])
+    assert json.loads(after['tc01']['embedding']) == svc.generate_tagged_embedding(text)[0]
+    assert after['tc01']['embeddingHash'] == ai_mod.embedding_hash(text)
@@ -0,0 +1,69 @@
+import importlib
+import sys
+
+import pytest
+
+import ai_service as ai_mod
+from tests.test_reembedding import FakeEncoder
+
+
+@pytest.fixture
+def client(make_db, monkeypatch):
+    monkeypatch.setenv('JOB_WORKERS_ENABLED', 'false')
+    monkeypatch.setenv('REEMBED_ON_STARTUP', 'false')
+    monkeypatch.setenv('EMBEDDING_DIMENSION', '3')
+    monkeypatch.setattr(ai_mod, 'SentenceTransformer', lambda name: FakeEncoder(name, 3))
+    make_db(3)
+    sys.modules.pop('app', None)
+    app_mod = importlib.import_module('app')
+    try:
+        yield app_mod.app.test_client()
+    finally:
+        sys.modules.pop('app', None)
+
+
+def revalidate(client, url, etag):
+    return client.get(url, headers={'If-None-Match': f'"{etag}"'})
+
+
+@pytest.mark.parametrize('url', ['/api/testcases', '/api/testcases?limit=2', '/api/testcases/tc00',
+                                 '/api/testcases/tc00/full'])
+def test_unchanged_reads_revalidate_with_304(client, url):
+    first = client.get(url)
+    etag, _ = first.get_etag()
+    assert first.status_code == 200 and etag
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    cached = revalidate(client, url, etag)
+    assert (cached.status_code, cached.data) == (304, b'')
+    assert cached.get_etag()[0] == etag
+    assert revalidate(client, url, 'other').status_code == 200
+
+
+def test_writes_change_the_etag(client):
+    urls = ['/api/testcases', '/api/testcases/tc01', '/api/testcases/tc01/full']
+    etags = {url: client.get(url).get_etag()[0] for url in urls}
+    # Each URL has its own tag
+    assert len(set(etags.values())) == len(urls)
+
+    assert client.patch('/api/testcases/tc01', json={'priority': 'high'}).status_code == 200
+    for url in urls:
+        response = revalidate(client, url, etags[url])
+        assert response.status_code == 200, url
+        assert response.get_etag()[0] != etags[url]
+    assert client.get('/api/testcases/tc01').get_json()['priority'] == 'high'
+
+    # Reference writes count too: the detail page lists them
+    etag = client.get('/api/testcases/tc01/full').get_etag()[0]
+    assert client.post('/api/testcases/tc00/reference/tc01').status_code == 201
+    response = revalidate(client, '/api/testcases/tc01/full', etag)
+    assert response.status_code == 200
+    assert [r['sourceId'] for r in response.get_json()['referencedBy']] == ['tc00']
+
+
+@pytest.mark.parametrize('url', ['/api/testcases/missing', '/api/testcases/missing/full'])
+def test_missing_test_cases_get_no_etag(client, url):
+    response = client.get(url)
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+    assert revalidate(client, url, 'anything').status_code == 404
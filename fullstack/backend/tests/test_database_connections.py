@@ -0,0 +1,66 @@
+import json
+import threading
+
+
+def insert(connection, testcase_id):
+    connection.execute(
+        "INSERT INTO testcases (id, name, description, expectedResult, tags) VALUES (?, ?, 'd', '', ?)",
+        (testcase_id, testcase_id, json.dumps([])),
+    )
+
+
+def test_threads_reuse_one_wal_connection(make_db):
+    db = make_db()
+
+    first = db.get_connection()
+    first.close()
+    second = db.get_connection()
+    assert second._connection is first._connection
+    assert second.execute("PRAGMA journal_mode").fetchone()['journal_mode'] == 'wal'
+    assert second.execute("PRAGMA synchronous").fetchone()['synchronous'] == 1  # NORMAL
+    second.close()
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.get_connection()._connection))
+    thread.start()
+    thread.join()
+    assert other[0] is not first._connection
+    assert db.get_connection_stats()['connections_opened'] == 2
+
+
+def test_outermost_close_discards_uncommitted_work(make_db):
+    db = make_db()
+
+    outer = db.get_connection()
+    insert(outer, 'tc1')
+    # A nested call on the same thread must not roll back the caller's transaction
+    assert db.get_testcase_by_id('tc1')['id'] == 'tc1'
+    outer.commit()
+
+    insert(outer, 'tc2')
+    outer.close()
+
+    assert db.get_testcase_by_id('tc1') is not None
+    assert db.get_testcase_by_id('tc2') is None
+
+
+def test_concurrent_writers_do_not_fail(make_db):
+    db = make_db()
+    errors = []
+
+    def write(worker):
+        try:
+            for i in range(20):
+                db.create_testcase({'id': f'w{worker}-{i}', 'name': 'n', 'description': 'd', 'tags': '[]'})
+                db.list_testcases(limit=10)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(db.list_testcases(with_counts=False)) == 80
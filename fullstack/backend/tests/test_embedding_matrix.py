@@ -0,0 +1,32 @@
+import json
+
+import numpy as np
+
+from embedding_matrix import load_embedding_matrix
+
+
+def make_rows(vectors):
+    return [{'id': f"tc{i}", 'name': f"case {i}", 'embedding': json.dumps(v) if v is not None else None}
+            for i, v in enumerate(vectors)]
+
+
+def test_streams_valid_rows_into_normalized_matrix():
+    rows = make_rows([[3.0, 4.0], [1.0], None, [0.0, 0.0], [0.0, 2.0]])
+
+    matrix, kept = load_embedding_matrix(iter(rows), dimension=2, capacity=1)
+
+    # Wrong dimension and missing embeddings are skipped; the matrix grows past capacity
+    assert [row['id'] for row in kept] == ['tc0', 'tc3', 'tc4']
+    assert all('embedding' not in row for row in kept)
+    assert matrix.dtype == np.float32
+    np.testing.assert_allclose(matrix, [[0.6, 0.8], [0.0, 0.0], [0.0, 1.0]])
+
+
+def test_accept_and_keep_filter_rows_and_columns():
+    rows = make_rows([[1.0, 0.0], [0.0, 1.0]])
+
+    matrix, kept = load_embedding_matrix(rows, dimension=2, capacity=10,
+                                         accept=lambda row: row['id'] != 'tc0', keep=('id',))
+
+    assert kept == [{'id': 'tc1'}]
+    assert matrix.shape == (1, 2)
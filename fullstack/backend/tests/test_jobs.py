@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+
+import pytest
+
+from jobs import JobQueue, JobCancelled, FINISHED_STATES
+
+
+def make_queue(make_db, monkeypatch, **limits):
+    monkeypatch.setenv('JOB_CONCURRENCY', ','.join(f'{k}={v}' for k, v in limits.items()))
+    db = make_db()
+    return db, JobQueue(db, workers=3, poll_interval=0.05)
+
+
+def wait_for(db, job_id, states=FINISHED_STATES, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = db.get_job(job_id, with_result=True)
+        if job['state'] in states:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {job['state']}")
+
+
+def test_jobs_run_within_their_type_limit(make_db, monkeypatch):
+    db, queue = make_queue(make_db, monkeypatch, slow=1)
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def slow(payload, job):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        job.progress(step=1)
+        with lock:
+            active[0] -= 1
+        return {'doubled': payload['n'] * 2}
+
+    queue.register('slow', slow, concurrency=3)
+    queue.register('bad', lambda payload, job: 1 / 0)
+    with pytest.raises(ValueError):
+        queue.submit('missing', {})
+
+    jobs = [queue.submit('slow', {'n': i}) for i in range(3)] + [queue.submit('bad', {})]
+    queue.start()
+    try:
+        finished = [wait_for(db, job['id']) for job in jobs]
+    finally:
+        queue.stop(1)
+
+    # JOB_CONCURRENCY overrides the registered limit
+    assert peak[0] == 1
+    assert [job['state'] for job in finished] == ['succeeded'] * 3 + ['failed']
+    assert finished[2]['result'] == '{"doubled":4}'
+    assert 'division by zero' in finished[3]['error']
+    assert finished[0]['payload'] is None
+    assert queue.get_stats()['succeeded'] == 3
+
+
+def test_type_limit_holds_across_queues_sharing_the_database(make_db, monkeypatch):
+    db, first = make_queue(make_db, monkeypatch)
+    # A second process's queue over the same table
+    second = JobQueue(make_db(), workers=3, poll_interval=0.05)
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def slow(payload, job):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+
+    for queue in (first, second):
+        queue.register('slow', slow, concurrency=1)
+    # Both start before any job runs: startup recovery treats this pid's running jobs as stale
+    first.start()
+    second.start()
+    try:
+        jobs = [first.submit('slow', {}) for _ in range(4)]
+        finished = [wait_for(db, job['id']) for job in jobs]
+    finally:
+        first.stop(1)
+        second.stop(1)
+
+    assert [job['state'] for job in finished] == ['succeeded'] * 4
+    assert peak[0] == 1
+
+
+def test_cancel_queued_and_running_jobs(make_db, monkeypatch):
+    db, queue = make_queue(make_db, monkeypatch)
+    started = threading.Event()
+
+    def loop(payload, job):
+        done = 0
+        try:
+            while True:
+                job.progress(step='waiting')
+                done += 1
+                # Cancelled only once some work was recorded
+                started.set()
+                time.sleep(0.01)
+        except JobCancelled as e:
+            e.result = {'done': done}
+            raise
+
+    queue.register('loop', loop)
+    running, queued = queue.submit('loop', {}), queue.submit('loop', {})
+    queue.start()
+    try:
+        assert started.wait(5)
+        assert queue.cancel(queued['id'])['state'] == 'cancelled'
+        assert queue.cancel(running['id'])['cancelRequested'] == 1
+        cancelled = wait_for(db, running['id'])
+    finally:
+        queue.stop(1)
+    # Work done before the cancellation is reported
+    assert cancelled['state'] == 'cancelled' and json.loads(cancelled['result'])['done'] >= 1
+    assert db.get_job(running['id'])['progress'] == '{"step":"waiting"}'
+
+
+def test_restart_keeps_queued_jobs_and_fails_interrupted_ones(make_db, monkeypatch):
+    db, queue = make_queue(make_db, monkeypatch)
+    queue.register('echo', lambda payload, job: payload)
+    interrupted = queue.submit('echo', {'n': 1})
+    db.claim_job({'echo': 1}, '999999999')
+    queued = queue.submit('echo', {'n': 2})
+
+    restarted = JobQueue(db, workers=1, poll_interval=0.05)
+    restarted.register('echo', lambda payload, job: payload)
+    restarted.start()
+    try:
+        assert wait_for(db, queued['id'])['result'] == '{"n":2}'
+    finally:
+        restarted.stop(1)
+    job = db.get_job(interrupted['id'])
+    assert (job['state'], job['error']) == ('failed', 'Interrupted: the worker process stopped')
@@ -0,0 +1,66 @@
+import pytest
+
+from benchmarks.fake_gemini import FakeGeminiServer, FakeGeminiConfig
+from benchmarks.load_test import Operation, LoadState, parse_mix, run_load, FLASK_OPERATIONS
+from gemini_service import GeminiService, GEMINI_AVAILABLE
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    def start(**config):
+        server = FakeGeminiServer(FakeGeminiConfig(latency_ms=1, latency_sigma=0, seed=0, **config)).start()
+        monkeypatch.setenv('GEMINI_API_KEY', 'test-key')
+        monkeypatch.setenv('GEMINI_API_ENDPOINT', server.endpoint)
+        servers.append(server)
+        return server
+
+    servers = []
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.mark.skipif(not GEMINI_AVAILABLE, reason='google-generativeai not installed')
+def test_gemini_service_is_routed_to_the_fake(fake_gemini):
+    server = fake_gemini(output_tokens=120, output_tokens_sigma=0)
+
+    result = GeminiService().generate_test_case('password reset via email', use_rag=False)
+
+    assert result['name'] == 'Verify password reset via email'
+    assert result['steps']
+    assert result['tokenUsage']['candidates_token_count'] == 120
+    assert server.fake.get_stats()['requests'] == 1
+
+
+@pytest.mark.skipif(not GEMINI_AVAILABLE, reason='google-generativeai not installed')
+def test_injected_gemini_errors_surface_as_generation_failures(fake_gemini):
+    server = fake_gemini(error_rate=1.0, error_codes=[400])
+
+    with pytest.raises(Exception, match='Failed to generate test case'):
+        GeminiService().generate_test_case('checkout with expired card', use_rag=False)
+    assert server.fake.get_stats()['errors'] >= 1
+
+
+def test_run_load_reports_per_endpoint_latency_and_errors():
+    # The fake's own 404 for unknown paths doubles as an always-failing endpoint
+    operations = [
+        Operation('ok', 3, lambda s: ('GET', '/stats', None)),
+        Operation('missing', 1, lambda s: ('GET', '/nope', None)),
+    ]
+    with FakeGeminiServer(FakeGeminiConfig(latency_ms=1, latency_sigma=0)) as server:
+        report = run_load(server.endpoint, operations, LoadState(seed=1), rps=200, duration=0.5)
+
+    endpoints = report['endpoints']
+    assert report['total']['requests'] == 100
+    assert endpoints['ok']['error_rate'] == 0.0
+    assert endpoints['missing']['error_rate'] == 1.0
+    assert endpoints['missing']['status_codes'] == {'404': endpoints['missing']['requests']}
+    assert endpoints['ok']['p50_ms'] <= endpoints['ok']['p99_ms']
+
+
+def test_parse_mix_overrides_weights_and_rejects_unknown_operations():
+    mix = parse_mix('search=5,generate', FLASK_OPERATIONS)
+    assert [(op.name, op.weight) for op in mix] == [('search', 5.0), ('generate', 1.0)]
+
+    with pytest.raises(ValueError, match='Unknown operation'):
+        parse_mix('teleport=1', FLASK_OPERATIONS)
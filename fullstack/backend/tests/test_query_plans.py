@@ -0,0 +1,72 @@
+import sqlite3
+
+from database import DatabaseConnection, MIGRATIONS
+
+
+def full_scans(connection, statement):
+    """Plan lines reading a whole table (a materialized CTE or subquery may be scanned)"""
+    materialized, scans = set(), []
+    for row in connection.execute('EXPLAIN QUERY PLAN ' + statement):
+        detail = row['detail']
+        if detail.startswith(('MATERIALIZE ', 'CO-ROUTINE ')):
+            materialized.add(detail.split()[1])
+        elif detail.startswith('SCAN ') and 'USING' not in detail and detail.split()[1] not in materialized:
+            scans.append(detail)
+    return scans
+
+
+def test_hot_queries_use_indexes(make_db):
+    db = make_db(3)
+    db.create_reference('tc00', 'tc01', 'manual')
+    db.create_reference('tc02', 'tc01', 'semantic_search', 0.9)
+    statements = []
+    connection = db.get_connection()
+    connection.set_trace_callback(statements.append)
+
+    db.list_testcases(limit=50)
+    db.list_testcases(limit=50, after=('2999-01-01 00:00:00', 'z'))
+    db.get_testcase_by_id('tc00')
+    db.get_reference_counts('tc01')
+    db.get_references('tc00')
+    db.get_referenced_by('tc01')
+    db.get_derived_testcases('tc01')
+    db.get_neighbors('tc00', 10)
+    connection.set_trace_callback(None)
+
+    queries = [statement for statement in statements if statement.lstrip().upper().startswith(('SELECT', 'WITH'))]
+    assert len(queries) >= 12
+    for query in queries:
+        assert full_scans(connection, query) == [], query
+    connection.close()
+
+
+def test_migrations_upgrade_an_unversioned_database(tmp_path, monkeypatch):
+    # Schema of a database created before embeddings were tagged and migrations existed
+    path = tmp_path / 'old.db'
+    connection = sqlite3.connect(path)
+    connection.execute("""
+        CREATE TABLE testcases (
+            id TEXT PRIMARY KEY, name TEXT NOT NULL, description TEXT NOT NULL,
+            type TEXT NOT NULL DEFAULT 'positive', priority TEXT NOT NULL DEFAULT 'medium',
+            steps TEXT, expectedResult TEXT NOT NULL, tags TEXT, embedding TEXT,
+            aiGenerated INTEGER DEFAULT 0, originalPrompt TEXT, aiConfidence REAL, aiSuggestions TEXT,
+            aiGenerationMethod TEXT, tokenUsage TEXT,
+            createdAt TEXT DEFAULT CURRENT_TIMESTAMP, updatedAt TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    connection.execute("INSERT INTO testcases (id, name, description, expectedResult) VALUES ('old', 'n', 'd', '')")
+    connection.commit()
+    connection.close()
+
+    monkeypatch.setenv('DB_PATH', str(path))
+    db = DatabaseConnection()
+    # Running again is a no-op
+    db = DatabaseConnection()
+
+    connection = db.get_connection()
+    assert connection.execute("PRAGMA user_version").fetchone()['user_version'] == MIGRATIONS[-1][0]
+    indexes = {row['name'] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_testcases_created_id', 'idx_testcase_references_target',
+            'idx_testcase_references_source_type'} <= indexes
+    connection.close()
+    assert db.get_testcase_by_id('old')['embeddingModel'] is None
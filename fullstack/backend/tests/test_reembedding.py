@@ -0,0 +1,104 @@
+import json
+import zlib
+
+import numpy as np
+
+import ai_service as ai_mod
+from database import TESTCASE_COLUMNS
+from reembedding import ReembeddingJob
+
+
+class FakeEncoder:
+    """Deterministic per-text vectors; calls stop() after `stop_after` batch encodes"""
+
+    def __init__(self, name, dimension, stop_after=None, stop=None):
+        self.name = name
+        self.dimension = dimension
+        self.batches = 0
+        self.stop_after = stop_after
+        self.stop = stop
+
+    def _vector(self, text):
+        rng = np.random.default_rng(zlib.crc32(f"{self.name}|{text}".encode()))
+        return rng.normal(size=self.dimension).astype(np.float32)
+
+    def encode(self, texts):
+        if isinstance(texts, str):
+            return self._vector(texts)
+        self.batches += 1
+        if self.stop_after is not None and self.batches >= self.stop_after:
+            self.stop()
+        return np.stack([self._vector(text) for text in texts])
+
+
+def make_service(monkeypatch, model_name, dimension, encoder):
+    monkeypatch.setenv('MODEL_NAME', model_name)
+    monkeypatch.setenv('EMBEDDING_DIMENSION', str(dimension))
+    return ai_mod.AIService(model=encoder)
+
+
+def seed(db, svc, count):
+    for i in range(count):
+        name, description, tags = f'login case {i}', 'user logs in', ['auth']
+        embedding, model_id = svc.generate_tagged_embedding(ai_mod.embedding_text(name, description, tags))
+        db.create_testcase({
+            'id': f'tc{i:02d}',
+            'name': name,
+            'description': description,
+            'expectedResult': '',
+            'tags': json.dumps(tags),
+            'embedding': json.dumps(embedding),
+            'embeddingModel': model_id,
+        })
+
+
+def test_reembedding_serves_old_model_until_switch(make_db, monkeypatch):
+    monkeypatch.setattr(ai_mod, 'search_flight', ai_mod.SingleFlight())
+    db = make_db()
+
+    old = make_service(monkeypatch, 'old-model', 3, FakeEncoder('old-model', 3))
+    old.set_database(db)
+    assert ReembeddingJob(db, old).prepare() is False
+    seed(db, old, 5)
+    before = {tc['id']: tc['updatedAt'] for tc in db.list_testcases(TESTCASE_COLUMNS, with_counts=False)}
+
+    # Restart with a new model: searches keep using the stored one
+    monkeypatch.setattr(ai_mod, 'SentenceTransformer', lambda name: FakeEncoder(name, 3))
+    new = make_service(monkeypatch, 'new-model', 4, FakeEncoder('new-model', 4))
+    new.set_database(db)
+    job = ReembeddingJob(db, new, batch_size=2, batch_delay=0)
+    assert job.prepare() is True
+    new.target_model['model'].stop_after, new.target_model['model'].stop = 1, job._stop.set
+    assert new.model_id == 'old-model:3'
+    assert len(new.semantic_search('login case 1', min_similarity=-1.0, limit=10)) == 5
+
+    # First run stops after one batch; progress is kept in the staging table
+    job.start()
+    job._thread.join(5)
+    status = job.get_status()
+    assert status['state'] == 'stopped'
+    assert (status['staged'], status['remaining']) == (2, 3)
+    assert new.model_id == 'old-model:3'
+
+    # Editing a staged row invalidates its new vector
+    tc = db.get_testcase_by_id('tc00')
+    embedding, model_id = new.generate_tagged_embedding('edited')
+    db.update_testcase('tc00', {**tc, 'name': 'edited', 'embedding': json.dumps(embedding), 'embeddingModel': model_id})
+    assert db.get_embedding_progress('new-model:4') == {'staged': 1, 'remaining': 4}
+
+    new.target_model['model'].stop_after = None
+    job.start()
+    job._thread.join(5)
+    assert job.get_status()['state'] == 'completed'
+    assert new.model_id == 'new-model:4' and new.target_model is None
+
+    rows = db.list_testcases(TESTCASE_COLUMNS, with_counts=False)
+    assert {row['embeddingModel'] for row in rows} == {'new-model:4'}
+    assert all(len(json.loads(row['embedding'])) == 4 for row in rows)
+    # Re-embedding is not an edit
+    assert all(row['updatedAt'] == before[row['id']] for row in rows if row['id'] != 'tc00')
+    assert db.init_embedding_model('new-model:4') == 'new-model:4'
+
+    query = ai_mod.embedding_text('login case 3', 'user logs in', ['auth'])
+    results = new.semantic_search(query, min_similarity=-1.0, limit=1)
+    assert results[0]['testCase']['id'] == 'tc03'
@@ -0,0 +1,52 @@
+import pstats
+
+from metrics import stage_timer, start_request_trace, stop_request_trace, server_timing_header
+from profiling import RequestProfiler
+
+
+def test_stage_timings_are_traced_only_when_requested():
+    with stage_timer('search', 'encode'):
+        pass
+
+    trace = start_request_trace()
+    try:
+        with stage_timer('search', 'encode'):
+            pass
+        with stage_timer('search', 'similarity'):
+            pass
+        with stage_timer('search', 'encode'):
+            pass
+    finally:
+        stop_request_trace()
+
+    assert [name for name, _ in trace] == ['search.encode', 'search.similarity', 'search.encode']
+    header = server_timing_header([('search.encode', 0.001), ('search.similarity', 0.002), ('search.encode', 0.003)], 0.01)
+    assert header == 'search.encode;dur=4.00, search.similarity;dur=2.00, total;dur=10.00'
+
+
+def test_profiler_writes_one_profile_per_armed_request(tmp_path):
+    profiler = RequestProfiler(output_dir=str(tmp_path))
+    assert profiler.start() is None
+
+    profiler.arm(2)
+    for _ in range(3):
+        session = profiler.start()
+        sum(range(1000))
+        profiler.finish(session, 'GET_/api/testcases/<testcase_id>')
+
+    status = profiler.get_status()
+    assert (status['remaining'], status['profiled']) == (0, 2)
+    assert len(list(tmp_path.glob('GET_api_testcases_testcase_id-*.prof'))) == 2
+    pstats.Stats(status['recent_files'][0])
+
+
+def test_profiler_skips_requests_while_busy(tmp_path):
+    profiler = RequestProfiler(output_dir=str(tmp_path))
+    profiler.arm(5)
+
+    first = profiler.start()
+    assert profiler.start() is None
+    profiler.finish(first, 'search')
+
+    status = profiler.get_status()
+    assert (status['remaining'], status['profiled'], status['skipped_busy']) == (4, 1, 1)
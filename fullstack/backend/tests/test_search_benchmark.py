@@ -0,0 +1,29 @@
+from benchmarks.search_benchmark import run_benchmark, SyntheticCorpus
+
+
+def test_synthetic_corpus_follows_seed_schema():
+    corpus = SyntheticCorpus(50, 8, vectors='random')
+    rows = corpus.rows()
+
+    assert len(rows) == 50
+    assert rows[0]['id'] == 'tc_bench_00000000'
+    assert rows[0]['type'] in ('positive', 'negative')
+    assert rows[0]['priority'] in ('high', 'medium', 'low')
+    assert corpus.vectors.shape == (50, 8)
+
+
+def test_exact_engines_report_full_recall():
+    report = run_benchmark(scales=[300], engines=['current', 'matrix'], queries=10, k=5, dimension=16, warmup=1)
+    results = {r['engine']: r for r in report['results']}
+
+    assert set(results) == {'current', 'matrix'}
+    for result in results.values():
+        assert result['rows'] == 300
+        assert result['recall_at_5'] == 1.0
+        assert result['p50_ms'] <= result['p99_ms']
+        assert result['qps'] > 0
+
+
+def test_engines_above_their_row_limit_are_skipped():
+    report = run_benchmark(scales=[100], engines=['current'], queries=2, dimension=8, max_rows={'current': 50})
+    assert report['results'] == [{'engine': 'current', 'rows': 100, 'skipped': 'rows > max rows (50)'}]
@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+import ai_service as ai_mod
+from singleflight import SingleFlight
+
+
+class FakeDB:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def get_test_cases_for_embedding(self):
+        return self._rows
+
+
+def make_row(id_, embedding):
+    return {
+        'id': id_,
+        'name': 'tc',
+        'description': 'd',
+        'type': 'positive',
+        'priority': 'medium',
+        'steps': json.dumps([]),
+        'expectedResult': '',
+        'tags': json.dumps([]),
+        'embedding': json.dumps(embedding),
+        'createdAt': '2026-02-08 10:56:56',
+        'updatedAt': '2026-02-08 10:56:56',
+        'aiGenerated': 0,
+    }
+
+
+def test_singleflight_collapses_concurrent_calls():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('k', slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while flight.get_stats()['calls'] < 5:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert results == [42] * 5
+    assert len(calls) == 1
+    assert flight.get_stats() == {'calls': 5, 'executions': 1, 'coalesced': 4, 'in_flight': 0}
+
+
+def test_singleflight_propagates_errors_to_followers():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        release.wait(5)
+        raise ValueError('boom')
+
+    def call():
+        try:
+            flight.do('k', failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads:
+        t.start()
+    while flight.get_stats()['calls'] < 3:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert errors == ['boom'] * 3
+
+
+def test_coalesced_searches_respect_per_request_parameters(monkeypatch):
+    monkeypatch.setattr(ai_mod, 'search_flight', SingleFlight())
+    rows = [make_row(str(i), [1.0, i / 10.0]) for i in range(10)]
+    release = threading.Event()
+    encodes = []
+
+    def encode(q):
+        encodes.append(q)
+        release.wait(5)
+        return [1.0, 0.0]
+
+    svc = ai_mod.AIService.__new__(ai_mod.AIService)
+    svc.model = SimpleNamespace(encode=encode)
+    svc.embedding_dimension = 2
+    svc._db = FakeDB(rows)
+    svc.model_id = 'test:2'
+    svc._model_lock = threading.Lock()
+
+    params = {'a': (0.0, 3), 'b': (0.95, 10), 'c': (0.0, 10)}
+    results = {}
+
+    def search(name):
+        min_similarity, limit = params[name]
+        results[name] = svc.semantic_search('query', min_similarity=min_similarity, limit=limit)
+
+    threads = [threading.Thread(target=search, args=(name,)) for name in params]
+    for t in threads:
+        t.start()
+    while ai_mod.search_flight.get_stats()['calls'] < len(params):
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(encodes) == 1
+    assert [r['testCase']['id'] for r in results['a']] == ['0', '1', '2']
+    assert results['b'] and all(r['similarity'] >= 0.95 for r in results['b'])
+    assert len(results['c']) == 10
+
+
+def test_rank_matches_equals_a_full_sort():
+    rng = np.random.default_rng(0)
+    # Rounded scores give plenty of ties, including at the limit boundary
+    similarities = np.round(rng.random(500), 2).astype(np.float32)
+    for min_similarity, limit in [(0.0, 10), (0.5, 37), (0.9, 1000), (1.1, 5), (0.0, 0)]:
+        order = np.argsort(-similarities, kind='stable')
+        expected = [i for i in order if similarities[i] >= min_similarity][:limit]
+        assert list(ai_mod.rank_matches(similarities, min_similarity, limit)) == expected
@@ -1,5 +1,6 @@
 import datetime
 import json
+import threading
 from types import SimpleNamespace
 
 import ai_service as ai_mod
@@ -39,6 +40,8 @@ def make_service_with_rows(rows, embedding_dim=3):
     svc.model = SimpleNamespace(encode=lambda q: make_embedding(embedding_dim))
     svc.embedding_dimension = embedding_dim
     svc._db = FakeDB(rows)
+    svc.model_id = f'test:{embedding_dim}'
+    svc._model_lock = threading.Lock()
     return svc
 
 
@@ -0,0 +1,67 @@
+import json
+
+from serialization import RowFragmentCache, serialize_testcase, extend_fragment, join_fragments
+
+
+def make_row(id_, updated_at, name='tc'):
+    return {
+        'id': id_,
+        'name': name,
+        'description': 'd ü',
+        'type': 'positive',
+        'priority': 'medium',
+        'steps': json.dumps([{'step': 'open', 'expectedResult': 'opened'}]),
+        'expectedResult': '',
+        'tags': json.dumps(['auth']),
+        'embedding': json.dumps([0.1, 0.2]),
+        'aiGenerated': 0,
+        'createdAt': '2026-02-08 10:56:56',
+        'updatedAt': updated_at,
+    }
+
+
+def test_fragments_match_serialize_testcase():
+    cache = RowFragmentCache(max_size=10)
+    rows = [make_row('a', '2026-02-08 10:56:56'), make_row('b', '2026-02-08 10:56:57')]
+    counts = {'referencesCount': 2, 'derivedFromCount': 0}
+
+    body = join_fragments([extend_fragment(cache.get(row, serialize_testcase), counts) for row in rows])
+
+    assert json.loads(body) == [{**serialize_testcase(row), **counts} for row in rows]
+
+
+def test_fragment_cache_reuses_until_row_changes():
+    cache = RowFragmentCache(max_size=10)
+    calls = []
+
+    def serialize(row):
+        calls.append(row['id'])
+        return serialize_testcase(row)
+
+    row = make_row('a', '2026-02-08 10:56:56')
+    first = cache.get(row, serialize)
+    assert cache.get(dict(row), serialize) is first
+
+    # A newer updatedAt replaces the entry
+    edited = make_row('a', '2026-02-08 10:57:00', name='edited')
+    assert json.loads(cache.get(edited, serialize))['name'] == 'edited'
+
+    # Edits within the same second rely on explicit invalidation
+    cache.invalidate('a')
+    same_second = make_row('a', '2026-02-08 10:57:00', name='again')
+    assert json.loads(cache.get(same_second, serialize))['name'] == 'again'
+
+    assert calls == ['a', 'a', 'a']
+    stats = cache.get_stats()
+    assert (stats['size'], stats['cache_hits'], stats['cache_misses']) == (1, 1, 3)
+
+
+def test_fragment_cache_evicts_least_recently_used():
+    cache = RowFragmentCache(max_size=2)
+    rows = [make_row(id_, '2026-02-08 10:56:56') for id_ in 'abc']
+    for row in rows:
+        cache.get(row, serialize_testcase)
+
+    cache.get(rows[0], serialize_testcase)
+    assert cache.get_stats()['size'] == 2
+    assert cache.get_stats()['cache_misses'] == 4
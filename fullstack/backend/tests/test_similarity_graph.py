@@ -0,0 +1,115 @@
+import json
+
+import numpy as np
+
+from similarity_graph import SimilarityGraph
+
+
+def insert(db, id_, embedding):
+    db.create_testcase({
+        'id': id_,
+        'name': f'tc {id_}',
+        'description': 'd',
+        'expectedResult': '',
+        'embedding': json.dumps(embedding),
+    })
+
+
+def random_vectors(n, dim, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).tolist()
+
+
+def graph_snapshot(db, ids, k):
+    return {tc_id: [n['id'] for n in db.get_neighbors(tc_id, k)] for tc_id in ids}
+
+
+def test_build_returns_exact_top_k(make_db):
+    db = make_db()
+    insert(db, 'a', [1.0, 0.0, 0.0])
+    insert(db, 'b', [0.9, 0.1, 0.0])
+    insert(db, 'c', [0.0, 1.0, 0.0])
+    insert(db, 'd', [0.0, 0.0, 1.0])
+
+    graph = SimilarityGraph(db, embedding_dimension=3, k=2)
+    assert graph.build() == {'testCases': 4, 'k': 2}
+
+    neighbors = graph.get_similar('a')
+    assert [n['id'] for n in neighbors] == ['b', 'c']
+    assert neighbors[0]['rank'] == 1
+    assert neighbors[0]['similarity'] > neighbors[1]['similarity']
+
+
+def update_embedding(db, tc_id, embedding):
+    db.update_testcase(tc_id, {
+        'name': 'tc', 'description': 'd', 'type': 'positive', 'priority': 'medium',
+        'steps': '[]', 'expectedResult': '', 'tags': '[]',
+        'embedding': json.dumps(embedding),
+    })
+
+
+def test_incremental_updates_match_full_rebuild(make_db):
+    db = make_db()
+    vectors = random_vectors(40, 8)
+    ids = [f'tc{i}' for i in range(len(vectors))]
+    for tc_id, vector in zip(ids[:30], vectors[:30]):
+        insert(db, tc_id, vector)
+
+    graph = SimilarityGraph(db, embedding_dimension=8, k=5)
+    # The first update builds the graph
+    assert graph.update() == {'testCases': 30, 'k': 5}
+
+    # Add rows, change an embedding and delete a row; each update reads only the logged changes
+    for tc_id, vector in zip(ids[30:], vectors[30:]):
+        insert(db, tc_id, vector)
+    assert graph.update()['changed'] == 10
+    update_embedding(db, 'tc3', random_vectors(1, 8, seed=1)[0])
+    db.delete_testcase('tc7')
+    assert graph.update()['changed'] == 2
+
+    remaining = [tc_id for tc_id in ids if tc_id != 'tc7']
+    incremental = graph_snapshot(db, remaining, 5)
+
+    graph.build()
+    assert incremental == graph_snapshot(db, remaining, 5)
+
+
+def test_resident_matrices_follow_changes_made_elsewhere(make_db):
+    db = make_db()
+    vectors = random_vectors(20, 4, seed=2)
+    ids = [f'tc{i}' for i in range(len(vectors))]
+    for tc_id, vector in zip(ids[:10], vectors[:10]):
+        insert(db, tc_id, vector)
+    first = SimilarityGraph(db, embedding_dimension=4, k=3)
+    first.update()
+
+    # Another process's graph applies the next changes; this one catches up from the log
+    second = SimilarityGraph(db, embedding_dimension=4, k=3)
+    for tc_id, vector in zip(ids[10:15], vectors[10:15]):
+        insert(db, tc_id, vector)
+    second.update()
+    for tc_id, vector in zip(ids[15:], vectors[15:]):
+        insert(db, tc_id, vector)
+    update_embedding(db, 'tc0', random_vectors(1, 4, seed=3)[0])
+    assert first.update()['changed'] == 6
+    assert sorted(first._ids) == sorted(ids)
+
+    incremental = graph_snapshot(db, ids, 3)
+    SimilarityGraph(db, embedding_dimension=4, k=3).build()
+    assert incremental == graph_snapshot(db, ids, 3)
+
+
+def test_get_similar_is_a_lookup(make_db):
+    db = make_db()
+    insert(db, 'a', [1.0, 0.0])
+    insert(db, 'b', [0.8, 0.2])
+
+    graph = SimilarityGraph(db, embedding_dimension=2, k=3)
+    # Nothing is computed on read: lists appear once the background update has run
+    assert graph.get_similar('a') == []
+    graph.update()
+    assert [n['id'] for n in graph.get_similar('a')] == ['b']
+
+    # A test case without an embedding gets an empty list, from a lookup
+    db.create_testcase({'id': 'c', 'name': 'c', 'description': 'd', 'expectedResult': ''})
+    graph.update()
+    assert graph.get_similar('c') == []
@@ -0,0 +1,85 @@
+from serialization import encode_cursor, decode_cursor
+
+COUNT_KEYS = ('references_count', 'referenced_by_count', 'rag_references_count',
+              'manual_references_count', 'derived_from_count')
+
+
+def test_list_counts_match_per_row_counts(make_db):
+    db = make_db(5)
+    db.create_reference('tc00', 'tc01', 'rag_retrieval', 0.9)
+    db.create_reference('tc00', 'tc02', 'manual')
+    db.create_reference('tc00', 'tc03', 'semantic_search', 0.8)
+    db.create_reference('tc01', 'tc02', 'rag_retrieval', 0.7)
+    db.create_reference('tc03', 'tc02', 'manual')
+
+    rows = db.list_testcases()
+
+    assert len(rows) == 5
+    for row in rows:
+        counts = db.get_reference_counts(row['id'])
+        assert {key: row[key] for key in COUNT_KEYS} == counts
+    by_id = {row['id']: row for row in rows}
+    assert (by_id['tc00']['references_count'], by_id['tc02']['referenced_by_count']) == (3, 3)
+    assert by_id['tc04']['references_count'] == by_id['tc04']['referenced_by_count'] == 0
+
+
+def test_keyset_pages_cover_every_row_once(make_db):
+    db = make_db(7)
+    # Same createdAt for several rows: the id breaks ties
+    connection = db.get_connection()
+    connection.execute("UPDATE testcases SET createdAt = '2026-01-01 00:00:00' WHERE id IN ('tc01', 'tc02', 'tc03')")
+    connection.commit()
+    connection.close()
+
+    pages, after = [], None
+    while True:
+        page = db.list_testcases(columns=('name',), limit=3, after=after, with_counts=False)
+        if not page:
+            break
+        pages.append(page)
+        after = decode_cursor(encode_cursor(page[-1]))
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    listed = [row['id'] for page in pages for row in page]
+    assert listed == [row['id'] for row in db.list_testcases(with_counts=False)]
+    assert sorted(listed) == [f'tc{i:02d}' for i in range(7)]
+    # Projection reads only the requested columns (plus the keyset and cache keys)
+    assert set(pages[0][0]) == {'id', 'name', 'createdAt', 'updatedAt'}
+
+
+def test_data_versions_count_writes_to_each_table(make_db):
+    db = make_db(2)
+    versions = db.get_data_versions()
+    assert (versions['testcases'], versions['testcase_references']) == (2, 0)
+
+    db.create_reference('tc00', 'tc01', 'manual')
+    db.update_testcase('tc00', {'name': 'renamed', 'description': 'd', 'type': 'positive', 'priority': 'high',
+                                'steps': '[]', 'expectedResult': '', 'tags': '[]'})
+    after_writes = db.get_data_versions()
+    assert after_writes['testcases'] > versions['testcases']
+    assert after_writes['testcase_references'] == 1
+
+    # The cascaded reference delete counts too
+    db.delete_testcase('tc01')
+    after_delete = db.get_data_versions()
+    assert after_delete['testcases'] > after_writes['testcases']
+    assert after_delete['testcase_references'] == 2
+    assert after_delete['epoch'] == versions['epoch']
+
+
+def test_detail_matches_the_per_part_queries(make_db):
+    db = make_db(4)
+    db.create_reference('tc00', 'tc01', 'rag_retrieval', 0.9)
+    db.create_reference('tc00', 'tc02', 'manual')
+    db.create_reference('tc02', 'tc00', 'semantic_search', 0.8)
+    db.create_reference('tc03', 'tc00', 'manual')
+
+    detail = db.get_testcase_detail('tc00')
+
+    assert detail['testcase'] == db.get_testcase_by_id('tc00')
+    assert detail['references'] == db.get_references('tc00')
+    assert detail['referencedBy'] == db.get_referenced_by('tc00')
+    assert detail['derivedTestCases'] == db.get_derived_testcases('tc00')
+    assert detail['counts'] == db.get_reference_counts('tc00')
+    assert (len(detail['references']), len(detail['derivedTestCases'])) == (2, 2)
+    assert db.get_testcase_detail('missing') is None
@@ -12,6 +12,7 @@ async function loadTestCaseDetail() {
     try {
         const tc = await apiCall('/testcases/' + testCaseId + '/full');
         renderDetail(tc);
+        loadSimilarTestCases();
     } catch (error) {
         container.innerHTML = '<div class="empty-state"><h3>Error</h3><p>' + error.message + '</p><a href="/" class="btn btn-primary" style="margin-top: 1rem;">Back to List</a></div>';
     }
@@ -92,9 +93,36 @@ function renderDetail(tc) {
             '<h2 class="detail-section-title"><svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M15 7h3a5 5 0 0 1 5 5 5 5 0 0 1-5 5h-3m-6 0H6a5 5 0 0 1-5-5 5 5 0 0 1 5-5h3"></path><line x1="8" y1="12" x2="16" y2="12"></line></svg>Referenced By (' + ((tc.referencedBy?.length || 0) + (tc.derivedTestCases?.length || 0)) + ')</h2>' +
             '<div class="references-section">' + (referencedBy || '<p class="no-references">No other test cases reference this one.</p>') + '</div>' +
         '</div>' +
+    '</div>' +
+    
+    '<div class="detail-section">' +
+        '<h2 class="detail-section-title"><svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><circle cx="11" cy="11" r="8"></circle><line x1="21" y1="21" x2="16.65" y2="16.65"></line></svg>Similar Test Cases</h2>' +
+        '<div id="similar-container" class="references-section"><div class="loading">Loading similar test cases...</div></div>' +
     '</div>';
 }
 
+async function loadSimilarTestCases() {
+    const container = document.getElementById('similar-container');
+    
+    try {
+        const similar = await apiCall('/testcases/' + testCaseId + '/similar');
+        container.innerHTML = similar.map(item =>
+            '<a href="/detail/' + item.id + '" class="reference-item">' +
+                '<div>' +
+                    '<div class="reference-name">' + escapeHtml(item.name) + '</div>' +
+                    '<div class="reference-meta">' +
+                        '<span class="badge badge-type-' + item.type + '">' + item.type + '</span>' +
+                        '<span class="badge badge-priority-' + item.priority + '">' + item.priority + '</span>' +
+                    '</div>' +
+                '</div>' +
+                '<span class="similarity-badge">' + Math.round(item.similarity * 100) + '%</span>' +
+            '</a>'
+        ).join('') || '<p class="no-references">No similar test cases found.</p>';
+    } catch (error) {
+        container.innerHTML = '<p class="no-references">Failed to load similar test cases.</p>';
+    }
+}
+
 function renderReferenceItem(ref, type) {
     const item = type === 'target' ? ref.target : ref.source;
     const typeClass = ref.referenceType === 'manual' ? 'manual' : ref.referenceType === 'rag_retrieval' ? 'rag' : 'semantic';
@@ -0,0 +1,57 @@
+#!/bin/bash
+
+# Partitioned AI Service (scatter-gather) for local testing
+# Starts N AI service processes on consecutive ports; each indexes one hash
+# partition of the test cases and any of them can coordinate a search.
+#
+# Usage: ./scripts/start-ai-partitions.sh [partitions] [base_port]
+#   e.g. ./scripts/start-ai-partitions.sh 3 8001   -> ports 8001, 8002, 8003
+
+GREEN='\033[0;32m'
+YELLOW='\033[1;33m'
+CYAN='\033[0;36m'
+WHITE='\033[1;37m'
+RED='\033[0;31m'
+NC='\033[0m' # No Color
+
+PARTITIONS="${1:-3}"
+BASE_PORT="${2:-8001}"
+
+PROJECT_ROOT="$(cd "$(dirname "$0")/.." && pwd)"
+cd "$PROJECT_ROOT/ai"
+
+if [ ! -f ".env" ]; then
+    echo -e "${RED}❌ File ai/.env not found!${NC}"
+    echo -e "${YELLOW}📝 Copy ai/.env.example to ai/.env and configure it${NC}"
+    exit 1
+fi
+
+if [ -d "venv" ]; then
+    source venv/bin/activate
+fi
+
+PEERS=""
+for ((i=0; i<PARTITIONS; i++)); do
+    PEERS="${PEERS:+$PEERS,}http://127.0.0.1:$((BASE_PORT + i))"
+done
+
+PIDS=()
+cleanup() {
+    echo -e "\n${YELLOW}⏹  Stopping partitions...${NC}"
+    kill "${PIDS[@]}" 2>/dev/null
+    wait
+}
+trap cleanup INT TERM
+
+echo -e "${CYAN}🧩 Starting ${PARTITIONS} AI service partitions${NC}"
+for ((i=0; i<PARTITIONS; i++)); do
+    PORT=$((BASE_PORT + i))
+    PARTITION_COUNT="$PARTITIONS" PARTITION_INDEX="$i" PARTITION_PEERS="$PEERS" PORT="$PORT" \
+        python -m uvicorn main:app --host 127.0.0.1 --port "$PORT" &
+    PIDS+=($!)
+    echo -e "${WHITE}   • Partition $i:${NC} http://127.0.0.1:$PORT"
+done
+
+echo -e "${GREEN}✅ Search any partition, e.g.:${NC}"
+echo -e "${WHITE}   curl -X POST http://127.0.0.1:${BASE_PORT}/search -H 'Content-Type: application/json' -d '{\"query\": \"login\"}'${NC}"
+wait